@@ -0,0 +1,93 @@
+"""
+Caché versionada para cálculos de dashboards y reportes (cache-aside).
+
+Cada resultado se guarda bajo una clave que incluye la versión actual de los espacios de
+datos de los que depende (SUBSCRIPTIONS, PAYMENT_EVENTS, TRANSACTIONS, ...). Cuando
+cambian filas de esos modelos los signals llaman a bump(), la versión avanza y las
+claves antiguas dejan de leerse: no hay que adivinar tiempos de expiración y una entrada
+nunca se sirve desactualizada. Las entradas huérfanas las descarta el propio backend
+por antigüedad (LRU).
+
+Los resultados se guardan en la caché 'default' (por defecto en memoria local de cada
+proceso) y las versiones en la caché 'versions', que debe ser compartida por todos los
+procesos que escriben o leen: los workers web, el líder de run_scheduler y los comandos
+de gestión (generate_payment_events, reconcile_transactions, import_bank_statement, ...).
+Por defecto es una tabla de la base de datos (CACHE_VERSIONS_URL=dbcache://...), de modo
+que un bump() hecho por el scheduler invalida también las copias en memoria de cada
+worker web. El scheduler y los comandos deben correr con la misma configuración de
+CACHE_VERSIONS_URL que los workers. Con varios servidores ambas cachés pueden apuntar a
+un backend compartido (Redis, Memcached).
+
+Los resultados no expiran por tiempo: toda escritura debe terminar en un bump(). Los
+save()/delete() lo hacen mediante los signals post_save/post_delete. UPDATE por QuerySet,
+bulk_create y bulk_update no envían signals, por lo que el código que los usa
+(forgeapp.services, finance/aging.py, finance/rollup.py, bank_import, reconciliation,
+snapshots, ...) llama a bump() explícitamente al terminar.
+
+Uso:
+
+    metrics = cached('finance:dashboard', [SUBSCRIPTIONS, PAYMENT_EVENTS],
+                     lambda: dashboard_metrics(now), today)
+"""
+from django.core.cache import cache, caches
+from django.db import transaction
+import time
+
+# Espacios de datos a los que se asocian las versiones
+SUBSCRIPTIONS = 'subscriptions'
+PAYMENT_EVENTS = 'payment_events'
+TRANSACTIONS = 'transactions'
+CLIENTS = 'clients'
+APPLICATIONS = 'applications'
+SNAPSHOTS = 'snapshots'
+
+_MISSING = object()
+
+def _versions():
+    return caches['versions']
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+def _new_version():
+    # Si el backend descarta la clave de versión, la nueva no coincide con ninguna anterior
+    return time.time_ns()
+
+def get_versions(namespaces):
+    """Versión actual de cada espacio (inicializa las que no existen)"""
+    store = _versions()
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = store.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            store.add(key, _new_version(), timeout=None)
+            versions[key] = store.get(key)
+    return [versions[key] for key in keys]
+
+def _bump_now(namespaces):
+    # Una versión nueva en lugar de incr(): en backends sin incremento atómico (base de
+    # datos) dos bumps simultáneos igual dejan una versión distinta de la anterior
+    _versions().set_many({_version_key(namespace): _new_version() for namespace in namespaces}, timeout=None)
+
+def bump(*namespaces):
+    """
+    Invalida los resultados que dependen de los espacios indicados.
+    Dentro de una transacción se aplica al confirmarla, para que ninguna lectura concurrente
+    guarde datos anteriores bajo la versión nueva.
+    """
+    transaction.on_commit(lambda: _bump_now(namespaces))
+
+def cached(name, depends, compute, *key_parts):
+    """
+    Retorna el resultado guardado para (name, key_parts) con las versiones actuales de
+    depends, o lo calcula con compute() y lo guarda sin expiración. key_parts distingue
+    parámetros del cálculo (año, horizonte, fecha del día, ...).
+    """
+    versions = get_versions(depends)
+    key = ':'.join(str(part) for part in (name, *key_parts, *versions))
+
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout=None)
+    return value
@@ -0,0 +1,211 @@
+"""
+Exportación de listados a CSV y XLSX en streaming.
+
+Las filas se leen con values_list(...).iterator(chunk_size), de modo que los campos de
+modelos relacionados ('client__name', 'subscription__application__name', ...) se
+resuelven con JOIN en la misma consulta (igual que select_related) y nunca se cargan
+todas las filas en memoria: la respuesta se escribe a medida que el cliente la descarga,
+con el mismo consumo sea de 100 o de 1.000.000 de filas.
+
+Cada columna es una tupla (encabezado, campo) o (encabezado, campo, formato), donde
+formato es una función que recibe el valor del campo:
+
+    columns = [
+        ('Fecha', 'date'),
+        ('Tipo', 'type', choice_label(Transaction.TYPE_CHOICES)),
+        ('Cliente', 'subscription__client__name'),
+    ]
+    return export_response(transactions, columns, 'transacciones', file_format)
+
+Los reportes ya calculados (matrices, tablas dinámicas) usan table_response con las filas
+como listas de valores.
+
+El XLSX se genera sin dependencias externas: un libro mínimo de una hoja con celdas de
+texto en línea, comprimido con zipfile sobre un búfer que se vacía en cada bloque.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+import csv
+import re
+import zipfile
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def export_format(request):
+    """Formato de exportación pedido con ?format= (None si la vista debe renderizar HTML)"""
+    file_format = request.GET.get('format')
+    return file_format if file_format in EXPORT_FORMATS else None
+
+def choice_label(choices):
+    """Formato que muestra la etiqueta de un campo con choices en lugar del valor guardado"""
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+def _cell_value(value):
+    if isinstance(value, bool):
+        return 'Sí' if value else 'No'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None:
+        return ''
+    return value
+
+def _rows(queryset, columns, chunk_size):
+    fields = [column[1] for column in columns]
+    formatters = [column[2] if len(column) > 2 else None for column in columns]
+    for values in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        yield [formatter(value) if formatter else value for formatter, value in zip(formatters, values)]
+
+class _Echo:
+    """Pseudo archivo para csv.writer: retorna la línea escrita en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+# Caracteres con los que una hoja de cálculo interpreta una celda de CSV como fórmula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_cell(value):
+    """
+    Antepone un apóstrofo a los textos que empiezan como fórmula (descripciones, nombres o
+    archivos bancarios importados), para que abrir el CSV no ejecute nada. Los números no
+    se modifican. En XLSX las celdas de texto en línea nunca se evalúan.
+    """
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _csv_stream(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM para que Excel reconozca UTF-8 al abrir el archivo
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+class _Buffer:
+    """Archivo de solo escritura (sin seek) que acumula lo escrito hasta vaciarlo con drain()"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Caracteres de control que no se permiten en XML
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+def _xlsx_stream(header, rows, chunk_size):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(header)
+            ).encode())
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if count % chunk_size == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+def table_response(header, rows, filename, file_format='csv', chunk_size=CHUNK_SIZE):
+    """
+    StreamingHttpResponse con rows (iterable de listas de valores) en CSV o XLSX, para
+    reportes ya calculados que no salen directamente de un queryset. filename se completa
+    con la fecha del día y la extensión del formato.
+    """
+    rows = ([_cell_value(value) for value in row] for row in rows)
+
+    if file_format == 'xlsx':
+        content = _xlsx_stream(header, rows, chunk_size)
+    else:
+        file_format = 'csv'
+        content = _csv_stream(header, rows)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}_{timezone.localdate():%Y%m%d}.{file_format}"'
+    )
+    return response
+
+def export_response(queryset, columns, filename, file_format='csv', chunk_size=CHUNK_SIZE):
+    """
+    StreamingHttpResponse con las filas de queryset en CSV o XLSX. filename se completa con
+    la fecha del día y la extensión del formato.
+    """
+    header = [column[0] for column in columns]
+    return table_response(header, _rows(queryset, columns, chunk_size), filename, file_format, chunk_size)
@@ -0,0 +1,194 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+En lugar de OFFSET, cada página se pide a partir de los valores de orden de la última
+(o primera) fila de la página anterior:
+
+    WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT 26
+
+de modo que la consulta usa el índice del orden y cuesta lo mismo en la primera página que
+en la página 10.000. El cursor viaja en ?after= (página siguiente) o ?before= (página
+anterior) y el resto de los parámetros GET (filtros, ?page_size=) se conserva en los
+enlaces.
+
+Los campos de orden deben terminar en uno único (se agrega pk si falta). Los valores nulos
+se tratan como los menores (DESC NULLS LAST / ASC NULLS FIRST), igual que en MySQL y SQLite.
+
+Uso:
+
+    page = paginate(request, transactions, ['-date', '-pk'])
+    return render(request, 'finance/transaction_list.html', {'transactions': page.items, 'page': page})
+
+y en la plantilla:
+
+    {% include 'includes/pagination.html' %}
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from django.db.models import F, Q
+import json
+
+PAGE_SIZES = (25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def encode_cursor(values):
+    data = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, length):
+    """Valores del cursor, o None si no es válido (se muestra entonces la primera página)"""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+def _split(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+def _order_by(fields, reverse=False):
+    expressions = []
+    for name, descending in fields:
+        if descending != reverse:
+            expressions.append(F(name).desc(nulls_last=True))
+        else:
+            expressions.append(F(name).asc(nulls_first=True))
+    return expressions
+
+def _beyond(name, value, descending):
+    """Condición de las filas que van después de value en el sentido indicado (o None)"""
+    if descending:
+        if value is None:
+            return None
+        return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+    if value is None:
+        return Q(**{f'{name}__isnull': False})
+    return Q(**{f'{name}__gt': value})
+
+def _equal(name, value):
+    if value is None:
+        return Q(**{f'{name}__isnull': True})
+    return Q(**{name: value})
+
+def keyset_filter(fields, values, reverse=False):
+    """
+    Q de las filas posteriores (o anteriores si reverse) al cursor:
+    (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+    """
+    condition = Q(pk__in=[])
+    prefix = Q()
+    for (name, descending), value in zip(fields, values):
+        beyond = _beyond(name, value, descending != reverse)
+        if beyond is not None:
+            condition |= prefix & beyond
+        prefix &= _equal(name, value)
+    return condition
+
+class KeysetPage:
+    """Página de un listado con los enlaces a la anterior y la siguiente"""
+
+    def __init__(self, request, items, fields, page_size, has_next, has_previous):
+        self.request = request
+        self.items = items
+        self.page_size = page_size
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._fields = fields
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cursor(self, item):
+        values = []
+        for name, _ in self._fields:
+            value = item
+            for part in name.split('__'):
+                value = getattr(value, part, None)
+            values.append(value)
+        return encode_cursor(values)
+
+    def _url(self, **params):
+        query = self.request.GET.copy()
+        for key in ('after', 'before'):
+            query.pop(key, None)
+        for key, value in params.items():
+            query[key] = value
+        return f'?{query.urlencode()}'
+
+    @property
+    def has_controls(self):
+        """Si hay otras páginas o un tamaño distinto del predeterminado (se muestran los controles)"""
+        return self.has_next or self.has_previous or self.page_size != DEFAULT_PAGE_SIZE
+
+    @property
+    def next_url(self):
+        if not self.has_next:
+            return None
+        return self._url(after=self._cursor(self.items[-1]))
+
+    @property
+    def previous_url(self):
+        if not self.has_previous:
+            return None
+        return self._url(before=self._cursor(self.items[0]))
+
+    @property
+    def first_url(self):
+        return self._url()
+
+    @property
+    def size_options(self):
+        """(tamaño, url, seleccionado) para el selector de tamaño de página (vuelve al inicio)"""
+        return [(size, self._url(page_size=size), size == self.page_size) for size in PAGE_SIZES]
+
+def page_size_from(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        return default
+    return page_size if page_size in PAGE_SIZES else default
+
+def paginate(request, queryset, ordering, page_size=None):
+    """
+    Página de queryset según ?after= / ?before= y ?page_size=, ordenada por ordering
+    (nombres de campo o anotación, con '-' para orden descendente).
+    """
+    page_size = page_size or page_size_from(request)
+    if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+        ordering = [*ordering, '-pk' if ordering[0].startswith('-') else 'pk']
+    fields = _split(ordering)
+
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    after = decode_cursor(after, len(fields)) if after else None
+    before = decode_cursor(before, len(fields)) if before else None
+
+    if before is not None:
+        rows = list(
+            queryset.filter(keyset_filter(fields, before, reverse=True))
+            .order_by(*_order_by(fields, reverse=True))[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        return KeysetPage(request, items, fields, page_size, has_next=True, has_previous=has_previous)
+
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(fields, after))
+    rows = list(queryset.order_by(*_order_by(fields))[:page_size + 1])
+    return KeysetPage(
+        request, rows[:page_size], fields, page_size,
+        has_next=len(rows) > page_size, has_previous=after is not None
+    )
@@ -0,0 +1,320 @@
+"""
+Auditoría de consultas: siembra un volumen grande de datos, recorre las vistas principales
+capturando sus consultas y obtiene el plan de ejecución (EXPLAIN) de cada SELECT.
+
+Una consulta falla la auditoría cuando recorre completa (full scan) alguna de las tablas
+grandes de HOT_TABLES: en SQLite, una línea "SCAN tabla" sin índice en EXPLAIN QUERY PLAN;
+en MySQL, una fila con type = ALL en EXPLAIN. Los recorridos de un índice completo
+(SCAN ... USING INDEX, type = index) se aceptan, ya que son los que resuelven un ORDER BY
+con LIMIT sin ordenar en memoria.
+
+Se ejecuta sobre una base de datos de prueba creada para la ocasión (igual que los tests),
+con el comando:
+
+    python manage.py benchmark_queries --clients 5000 --output plans.txt
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core import cache
+import random
+import re
+import time as clock
+
+# Tablas que crecen con el negocio; en las demás (aplicaciones, métodos de pago, usuarios,
+# sesiones, resúmenes) un recorrido completo es barato
+HOT_TABLES = {
+    'forgeapp_client',
+    'forgeapp_subscription',
+    'forgeapp_paymentevent',
+    'forgeapp_appointment',
+    'forgeapp_contactmessage',
+    'forgeapp_servicecontracttoken',
+    'finance_transaction',
+    'finance_reconciliationmatch',
+}
+
+# Vistas recorridas: (nombre de la URL, objeto de ejemplo para el pk o None, parámetros GET)
+BENCHMARK_VIEWS = [
+    ('forgeapp:dashboard', None, ''),
+    ('forgeapp:client_list', None, ''),
+    ('forgeapp:client_list', None, 'status=active&nationality=chilena'),
+    ('forgeapp:client_detail', 'client', ''),
+    ('forgeapp:client_payment_history', 'client', ''),
+    ('forgeapp:client_contracts', 'client', ''),
+    ('forgeapp:subscription_list', None, ''),
+    ('forgeapp:subscription_list', None, 'status=active&payment_type=annual'),
+    ('forgeapp:subscription_list', None, 'payment_type=annual&renewal=next_month&sort=renewal'),
+    ('forgeapp:subscription_list', None, 'grace=1'),
+    ('forgeapp:subscription_list', None, 'client={client}'),
+    ('forgeapp:subscription_list', None, 'sort=-price'),
+    ('forgeapp:subscription_detail', 'subscription', ''),
+    ('forgeapp:application_list', None, ''),
+    ('forgeapp:application_detail', 'application', ''),
+    ('forgeapp:application_analytics', None, ''),
+    ('forgeapp:message_list', None, ''),
+    ('forgeapp:message_list', None, 'status=new'),
+    ('forgeapp:agenda_view', None, '{today_params}'),
+    ('finance:dashboard', None, ''),
+    ('finance:dashboard_metrics', None, ''),
+    ('finance:monthly_report', None, 'start_date={month_start}&end_date={month_end}'),
+    ('finance:annual_report', None, ''),
+    ('finance:cash_flow_report', None, ''),
+    ('finance:receivables_aging', None, ''),
+    ('finance:cohort_retention', None, ''),
+    ('finance:revenue_forecast_data', None, ''),
+    ('finance:payment_list', None, ''),
+    ('finance:transaction_list', None, ''),
+    ('finance:transaction_list', None, 'type=income&start_date={month_start}&end_date={month_end}'),
+    ('finance:transaction_summary', None, ''),
+    ('finance:reconciliation', None, ''),
+]
+
+# Vistas con recorridos completos aceptados: {nombre de la URL: {tabla, ...}}
+ALLOWED_SCANS = {
+    # Totales de todas las suscripciones en una sola pasada (finance/metrics.py), cacheados
+    'finance:dashboard': {'forgeapp_subscription'},
+    'finance:dashboard_metrics': {'forgeapp_subscription'},
+    # Las cohortes recorren la historia completa de suscripciones, cacheadas
+    'finance:cohort_retention': {'forgeapp_subscription'},
+}
+
+def seed_dataset(clients=2000, seed=0):
+    """
+    Inserta con bulk_create un conjunto de datos proporcional a clients: 2 suscripciones,
+    10 eventos de pago y 5 transacciones por cliente, además de citas, mensajes y tokens de
+    contrato. Retorna un dict con un objeto de ejemplo de cada tipo para las vistas de detalle.
+    """
+    from forgeapp.models import (
+        Application, Appointment, Client, ContactMessage, PaymentEvent, ServiceContractToken, Subscription
+    )
+    from forgeapp.services import sync_next_payment_events
+    from finance.aging import rebuild_aging
+    from finance.models import Transaction
+    from finance.rollup import rebuild_rollup
+
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    batch_size = 1000
+
+    Application.objects.bulk_create([
+        Application(name=f'Aplicación {i}', description='Aplicación de prueba', url=f'https://app{i}.example.com')
+        for i in range(10)
+    ])
+    # En MySQL bulk_create no asigna los pk: se vuelven a leer
+    applications = list(Application.objects.order_by('pk'))
+
+    Client.objects.bulk_create([
+        Client(
+            first_name=f'Nombre{i}', last_name=f'Apellido{i}', name=f'Nombre{i} Apellido{i}',
+            email=f'cliente{i}@example.com', company=f'Empresa {i % 300}',
+            status=rng.choice(['active', 'active', 'inactive', 'pending']),
+            nationality=rng.choice([value for value, _ in Client.NATIONALITY_CHOICES]),
+        )
+        for i in range(clients)
+    ], batch_size=batch_size)
+    client_ids = list(Client.objects.values_list('pk', flat=True))
+
+    subscriptions = []
+    for i in range(clients * 2):
+        payment_type = rng.choice(['monthly', 'monthly', 'monthly', 'annual'])
+        start_date = today - timedelta(days=rng.randint(0, 400))
+        current_period_end, grace_period_end = Subscription.compute_period_dates(start_date, payment_type)
+        subscriptions.append(Subscription(
+            client_id=rng.choice(client_ids),
+            application=rng.choice(applications),
+            payment_type=payment_type,
+            price=Decimal(rng.choice([10000, 15000, 25000, 40000, 120000])),
+            status=rng.choice(['active', 'active', 'active', 'pending', 'inactive', 'cancelled', 'expired']),
+            start_date=start_date,
+            current_period_end=current_period_end,
+            grace_period_end=grace_period_end,
+            reference_id=f'BM{i:08d}',
+        ))
+    Subscription.objects.bulk_create(subscriptions, batch_size=batch_size)
+    subscription_rows = list(Subscription.objects.values_list('pk', 'start_date', 'price', 'payment_type'))
+
+    # Cuatro períodos pagados y el pago pendiente del período actual
+    events = []
+    for pk, start_date, price, payment_type in subscription_rows:
+        step = 365 if payment_type == 'annual' else 30
+        for period in range(4, -1, -1):
+            expected_date = start_date - timedelta(days=step * period)
+            events.append(PaymentEvent(
+                subscription_id=pk, expected_date=expected_date, amount=price,
+                status='paid' if period else 'pending',
+                paid_date=expected_date + timedelta(days=rng.randint(0, 10)) if period else None,
+            ))
+    PaymentEvent.objects.bulk_create(events, batch_size=batch_size)
+
+    Transaction.objects.bulk_create([
+        Transaction(
+            type=rng.choice(['income', 'expense']),
+            category=rng.choice(['Ventas', 'Servicios', 'Hosting', 'Sueldos', 'Banco']),
+            description=f'Movimiento {i}',
+            amount=Decimal(rng.randint(1000, 500000)),
+            date=today - timedelta(days=rng.randint(0, 730)),
+        )
+        for i in range(clients * 5)
+    ], batch_size=batch_size)
+
+    appointments = []
+    for i in range(clients * 2):
+        hour = rng.randint(9, 18)
+        appointments.append(Appointment(
+            date=today + timedelta(days=rng.randint(-365, 60)),
+            start_time=time(hour, 0),
+            end_time=time(hour + 1, 0),
+            name=f'Contacto {i}', email=f'contacto{i}@example.com',
+            status=rng.choice(['scheduled', 'completed', 'cancelled']),
+            is_blocked=rng.random() < 0.1,
+        ))
+    Appointment.objects.bulk_create(appointments, batch_size=batch_size)
+
+    ContactMessage.objects.bulk_create([
+        ContactMessage(
+            name=f'Contacto {i}', email=f'contacto{i}@example.com', message='Mensaje de prueba',
+            status=rng.choice(['new', 'read', 'archived', 'archived']),
+        )
+        for i in range(clients)
+    ], batch_size=batch_size)
+
+    now = timezone.now()
+    ServiceContractToken.objects.bulk_create([
+        ServiceContractToken(
+            client_id=rng.choice(client_ids), application_id=applications[0].pk,
+            subscription_type='monthly', token=f'benchmark-{i}', authorization_code='ABCD1234',
+            expires_at=now + timedelta(days=rng.randint(-60, 30)),
+            status=rng.choice(['pending', 'signed', 'expired']),
+        )
+        for i in range(clients // 2)
+    ], batch_size=batch_size)
+
+    sync_next_payment_events()
+    rebuild_aging()
+    rebuild_rollup()
+    # bulk_create no envía post_save
+    cache.bump(cache.CLIENTS, cache.APPLICATIONS, cache.TRANSACTIONS)
+
+    return {
+        'client': Client.objects.order_by('pk').first(),
+        'subscription': Subscription.objects.order_by('pk').first(),
+        'application': applications[0],
+    }
+
+def analyze_tables():
+    """Actualiza las estadísticas del planificador después de sembrar los datos"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            for table in sorted(HOT_TABLES):
+                cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(table)}')
+                cursor.fetchall()
+        else:
+            cursor.execute('ANALYZE')
+
+# Alias de tablas en subconsultas y JOIN de Django: "forgeapp_paymentevent" U0
+_ALIAS = re.compile(r'[`"](\w+)[`"]\s+(?:AS\s+)?[`"]?([A-Z]\d+)\b')
+
+def _aliases(sql):
+    return {alias: table for table, alias in _ALIAS.findall(sql)}
+
+def explain(sql):
+    """
+    Plan de ejecución de una consulta: lista de (línea legible, tabla recorrida completa o None)
+    """
+    aliases = _aliases(sql)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}')
+            columns = [column[0] for column in cursor.description]
+            plan = []
+            for values in cursor.fetchall():
+                row = dict(zip(columns, values))
+                table = aliases.get(row.get('table'), row.get('table'))
+                line = (
+                    f"{row.get('select_type')} {row.get('table')} type={row.get('type')} "
+                    f"key={row.get('key')} rows={row.get('rows')} {row.get('Extra') or ''}"
+                ).strip()
+                plan.append((line, table if row.get('type') == 'ALL' else None))
+            return plan
+
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = []
+        for row in cursor.fetchall():
+            detail = row[-1]
+            match = re.match(r'SCAN (\w+)(?: AS (\w+))?$', detail)
+            table = None
+            if match:
+                name = match.group(2) or match.group(1)
+                table = aliases.get(name, match.group(1))
+            plan.append((detail, table))
+        return plan
+
+def _is_select(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+def _url(url_name, sample, query, objects, today):
+    kwargs = {'pk': objects[sample].pk} if sample else {}
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    query = query.format(
+        month_start=month_start.isoformat(),
+        month_end=month_end.isoformat(),
+        today_params=f'year={today.year}&month={today.month}&date={today.isoformat()}',
+        client=objects['client'].pk,
+    )
+    url = reverse(url_name, kwargs=kwargs)
+    return f'{url}?{query}' if query else url
+
+def run_benchmark(client, objects):
+    """
+    Recorre BENCHMARK_VIEWS con el cliente de pruebas (ya autenticado) y retorna un dict
+    por vista con su URL, código de respuesta, cantidad de consultas, duración y el plan
+    de cada SELECT distinto, incluyendo los recorridos completos de HOT_TABLES no permitidos.
+    """
+    today = timezone.localdate()
+    results = []
+    for url_name, sample, query in BENCHMARK_VIEWS:
+        url = _url(url_name, sample, query, objects, today)
+
+        start = clock.monotonic()
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        elapsed_ms = int((clock.monotonic() - start) * 1000)
+
+        allowed = ALLOWED_SCANS.get(url_name, set())
+        queries = []
+        seen = set()
+        for query_info in captured.captured_queries:
+            sql = query_info['sql']
+            if not _is_select(sql) or sql in seen:
+                continue
+            seen.add(sql)
+            plan = explain(sql)
+            scans = sorted({
+                table for _, table in plan
+                if table in HOT_TABLES and table not in allowed
+            })
+            queries.append({
+                'sql': sql,
+                'time_ms': float(query_info['time']) * 1000,
+                'plan': [line for line, _ in plan],
+                'full_scans': scans,
+            })
+
+        results.append({
+            'view': url_name,
+            'url': url,
+            'status': response.status_code,
+            'queries': len(captured.captured_queries),
+            'time_ms': elapsed_ms,
+            'explained': queries,
+            'failures': [query for query in queries if query['full_scans']],
+        })
+    return results
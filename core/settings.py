@@ -93,6 +93,16 @@ else:
         }
     }
 
+# Caché de cálculos de dashboards y reportes (ver core/cache.py). Los resultados van en
+# 'default' (memoria local de cada proceso) y las versiones de invalidación en 'versions',
+# una tabla de la base de datos compartida por los workers web, run_scheduler y los
+# comandos de gestión; todos deben usar el mismo CACHE_VERSIONS_URL. Con varios servidores
+# se puede usar un backend compartido para ambas, por ejemplo rediscache://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://forgeapp'),
+    'versions': env.cache('CACHE_VERSIONS_URL', default='dbcache://forgeapp_cache_versions'),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -158,6 +168,10 @@ ENABLE_SUBSCRIPTION_CHECK = True
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 SCHEDULER_DEFAULT = True
 
+# Scheduler con líder único (python manage.py run_scheduler)
+SCHEDULER_HEARTBEAT_SECONDS = 30
+SCHEDULER_LOCK_TTL_SECONDS = 90
+
 # Logging configuration
 LOGGING = {
     'version': 1,
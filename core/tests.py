@@ -0,0 +1,256 @@
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from forgeapp.models import Application, Client, Subscription
+from . import cache
+from .exports import choice_label, export_response, table_response
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, page_size_from, paginate
+from .query_audit import analyze_tables, explain, run_benchmark, seed_dataset
+import io
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+
+class VersionedCacheTests(TestCase):
+    """Caché versionada (core/cache.py)"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def cached(self, *key_parts):
+        return cache.cached('prueba', [cache.CLIENTS], self.compute, *key_parts)
+
+    def test_result_is_reused_until_bump(self):
+        self.assertEqual(self.cached(), 1)
+        self.assertEqual(self.cached(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump(cache.CLIENTS)
+
+        self.assertEqual(self.cached(), 2)
+
+    def test_key_parts_and_other_namespaces(self):
+        self.assertEqual(self.cached(2026), 1)
+        self.assertEqual(self.cached(2025), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump(cache.TRANSACTIONS)
+
+        self.assertEqual(self.cached(2026), 1)
+
+    def test_bump_waits_for_commit(self):
+        self.cached()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            cache.bump(cache.CLIENTS)
+            self.assertEqual(self.cached(), 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached(), 2)
+
+    def test_model_signals_bump_their_namespace(self):
+        self.cached()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(first_name='Ana', last_name='Pérez', email='ana@example.com')
+
+        self.assertEqual(self.cached(), 2)
+
+    def test_versions_live_in_the_shared_backend(self):
+        self.cached()
+        caches['default'].clear()
+
+        version = caches['versions'].get(f'version:{cache.CLIENTS}')
+        self.assertIsNotNone(version)
+        self.assertEqual(cache.get_versions([cache.CLIENTS]), [version])
+
+
+def csv_lines(response):
+    return b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+
+def xlsx_rows(response):
+    """Filas de la hoja de un XLSX exportado, como listas de textos"""
+    namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as book:
+        sheet = ElementTree.fromstring(book.read('xl/worksheets/sheet1.xml'))
+    return [
+        [''.join(cell.itertext()) for cell in row.findall('s:c', namespace)]
+        for row in sheet.iterfind('.//s:row', namespace)
+    ]
+
+
+class ExportTests(TestCase):
+    """Exportación de listados a CSV y XLSX (core/exports.py)"""
+
+    columns = [
+        ('Nombre', 'name'),
+        ('Estado', 'status', choice_label(Client.STATUS_CHOICES)),
+        ('Marketing', 'accept_marketing'),
+        ('RUT', 'rut'),
+    ]
+
+    def setUp(self):
+        Client.objects.create(first_name='Ana', last_name='Pérez', email='ana@example.com', accept_marketing=True)
+        Client.objects.create(first_name='=HYPERLINK("x")', last_name='', email='b@example.com', status='inactive')
+
+    def export(self, file_format, **kwargs):
+        return export_response(Client.objects.order_by('pk'), self.columns, 'clientes', file_format, **kwargs)
+
+    def test_csv_formats_values_and_escapes_formulas(self):
+        response = self.export('csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="clientes_{date.today():%Y%m%d}.csv"'
+        )
+        self.assertEqual(csv_lines(response), [
+            'Nombre,Estado,Marketing,RUT',
+            'Ana Pérez,Activo,Sí,',
+            '"\'=HYPERLINK(""x"")",Inactivo,No,',
+        ])
+
+    def test_only_text_cells_are_escaped(self):
+        response = table_response(['Concepto', 'Monto'], [['-comisión', -1500], ['+extra', 200]], 'saldos')
+
+        self.assertEqual(csv_lines(response)[1:], ["'-comisión,-1500", "'+extra,200"])
+
+    def test_xlsx_matches_csv_across_chunks(self):
+        response = self.export('xlsx', chunk_size=1)
+
+        self.assertEqual(
+            response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        self.assertEqual(xlsx_rows(response), [
+            ['Nombre', 'Estado', 'Marketing', 'RUT'],
+            ['Ana Pérez', 'Activo', 'Sí', ''],
+            ['=HYPERLINK("x")', 'Inactivo', 'No', ''],
+        ])
+
+    def test_related_columns_are_joined_in_one_query(self):
+        application = Application.objects.create(name='App', description='Prueba')
+        for client in Client.objects.order_by('pk'):
+            Subscription.objects.create(client=client, application=application, price=10000, status='inactive')
+        columns = [('Cliente', 'client__name'), ('Aplicación', 'application__name')]
+
+        response = export_response(Subscription.objects.order_by('pk'), columns, 'suscripciones')
+        with self.assertNumQueries(1):
+            lines = csv_lines(response)
+
+        self.assertEqual(lines[1], 'Ana Pérez,App')
+
+    def test_list_views_export_with_their_filters(self):
+        self.client.force_login(User.objects.create_user('ops'))
+
+        response = self.client.get(reverse('forgeapp:client_list'), {'status': 'inactive', 'format': 'csv'})
+
+        self.assertEqual([line.split(',')[2] for line in csv_lines(response)[1:]], ['"\'=HYPERLINK(""x"")"'])
+
+
+class KeysetPaginationTests(TestCase):
+    """Paginación por cursor (core/pagination.py)"""
+
+    def setUp(self):
+        application = Application.objects.create(name='App', description='Prueba')
+        client = Client.objects.create(first_name='Ana', last_name='Pérez', email='ana@example.com')
+        today = date.today()
+        # Fechas repetidas y nulas para probar los empates y NULLS LAST / NULLS FIRST
+        for days in [None, 3, 1, 3, None, 2, 3, 1]:
+            Subscription.objects.create(
+                client=client, application=application, price=10000, status='inactive',
+                start_date=today - timedelta(days=days) if days is not None else None
+            )
+        self.subscriptions = list(Subscription.objects.all())
+
+    def walk(self, ordering, page_size=3):
+        """pk de cada página siguiendo next_url y luego de vuelta con previous_url"""
+        factory = RequestFactory()
+        page = paginate(factory.get('/'), Subscription.objects.all(), ordering, page_size)
+        forward = [[item.pk for item in page]]
+        while page.next_url:
+            page = paginate(factory.get(page.next_url), Subscription.objects.all(), ordering, page_size)
+            forward.append([item.pk for item in page])
+        backward = [[item.pk for item in page]]
+        while page.previous_url:
+            page = paginate(factory.get(page.previous_url), Subscription.objects.all(), ordering, page_size)
+            backward.insert(0, [item.pk for item in page])
+        return forward, backward
+
+    def test_descending_walk_matches_offset_pages(self):
+        ordered = sorted(self.subscriptions, key=lambda subscription: (
+            subscription.start_date is None,
+            -subscription.start_date.toordinal() if subscription.start_date else 0,
+            -subscription.pk
+        ))
+        expected = [[subscription.pk for subscription in ordered[i:i + 3]] for i in range(0, 8, 3)]
+
+        forward, backward = self.walk(['-start_date'])
+
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_ascending_walk_matches_offset_pages(self):
+        ordered = sorted(self.subscriptions, key=lambda subscription: (
+            subscription.start_date is not None, subscription.start_date or date.min, subscription.pk
+        ))
+        expected = [[subscription.pk for subscription in ordered[i:i + 3]] for i in range(0, 8, 3)]
+
+        forward, backward = self.walk(['start_date'])
+
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_links_keep_filters_and_one_query_per_page(self):
+        request = RequestFactory().get('/', {'status': 'inactive', 'after': 'basura'})
+
+        with self.assertNumQueries(1):
+            page = paginate(request, Subscription.objects.all(), ['-pk'], page_size=3)
+
+        # Un cursor inválido muestra la primera página
+        self.assertFalse(page.has_previous)
+        self.assertIn('status=inactive', page.next_url)
+        self.assertNotIn('basura', page.next_url)
+
+    def test_cursor_round_trip_and_page_size(self):
+        values = [date(2026, 1, 31), None, 7]
+
+        self.assertEqual(decode_cursor(encode_cursor(values), 3), ['2026-01-31', None, 7])
+        self.assertIsNone(decode_cursor(encode_cursor(values), 2))
+        self.assertEqual(page_size_from(RequestFactory().get('/', {'page_size': 50})), 50)
+        self.assertEqual(page_size_from(RequestFactory().get('/', {'page_size': 30})), DEFAULT_PAGE_SIZE)
+        self.assertEqual(page_size_from(RequestFactory().get('/', {'page_size': 'x'})), DEFAULT_PAGE_SIZE)
+
+
+class QueryAuditTests(TestCase):
+    """Auditoría de planes de ejecución (core/query_audit.py)"""
+
+    def test_explain_reports_full_scans(self):
+        scan = explain('SELECT "id" FROM "finance_transaction" WHERE "description" = \'x\'')
+        indexed = explain('SELECT "id" FROM "finance_transaction" WHERE "import_hash" = \'x\'')
+
+        self.assertEqual([table for _, table in scan], ['finance_transaction'])
+        self.assertEqual([table for _, table in indexed], [None])
+
+    def test_benchmarked_views_use_indexes(self):
+        objects = seed_dataset(clients=200)
+        analyze_tables()
+        self.client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark'))
+
+        results = run_benchmark(self.client, objects)
+
+        self.assertEqual(
+            [
+                (result['url'], result['status'], [query['full_scans'] for query in result['failures']])
+                for result in results if result['status'] != 200 or result['failures']
+            ],
+            []
+        )
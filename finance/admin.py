@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment, Transaction
+from .models import Payment, Transaction, SchedulerLock, JobRun, ReceivableAging, RevenueRollup, RevenueSnapshot, ReconciliationMatch
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -11,8 +11,53 @@ class PaymentAdmin(admin.ModelAdmin):
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'type', 'category', 'amount', 'date', 'description')
-    list_filter = ('type', 'category', 'date')
+    list_display = ('id', 'type', 'category', 'amount', 'date', 'description', 'source_account')
+    list_filter = ('type', 'category', 'date', 'source_account')
     search_fields = ('description', 'category', 'notes')
+    readonly_fields = ('import_hash',)
+    raw_id_fields = ('payment_event',)
     date_hierarchy = 'date'
     ordering = ('-date',)
+
+@admin.register(SchedulerLock)
+class SchedulerLockAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'acquired_at', 'heartbeat_at')
+    readonly_fields = ('name', 'owner', 'acquired_at', 'heartbeat_at')
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ('job_name', 'status', 'started_at', 'duration_ms', 'rows_scanned', 'rows_updated', 'host', 'pid')
+    list_filter = ('job_name', 'status', 'started_at')
+    date_hierarchy = 'started_at'
+    ordering = ('-started_at',)
+
+@admin.register(ReceivableAging)
+class ReceivableAgingAdmin(admin.ModelAdmin):
+    list_display = ('client', 'application', 'current', 'days_0_30', 'days_31_60', 'days_61_90', 'days_over_90', 'pending_count', 'as_of')
+    list_select_related = ('client', 'application')
+    search_fields = ('client__name', 'application__name')
+    readonly_fields = ('as_of', 'updated_at')
+
+@admin.register(RevenueRollup)
+class RevenueRollupAdmin(admin.ModelAdmin):
+    list_display = ('year', 'month', 'application', 'client', 'payment_type', 'amount', 'count')
+    list_filter = ('year', 'payment_type', 'application')
+    list_select_related = ('client', 'application')
+    search_fields = ('client__name', 'application__name')
+    readonly_fields = ('updated_at',)
+
+@admin.register(RevenueSnapshot)
+class RevenueSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'application', 'mrr', 'arr', 'active_subscriptions', 'new_subscriptions', 'churned_subscriptions', 'active_clients')
+    list_filter = ('application',)
+    list_select_related = ('application',)
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+@admin.register(ReconciliationMatch)
+class ReconciliationMatchAdmin(admin.ModelAdmin):
+    list_display = ('transaction', 'payment_event', 'score', 'reasons', 'status', 'created_at', 'resolved_at')
+    list_filter = ('status',)
+    raw_id_fields = ('transaction', 'payment_event')
+    readonly_fields = ('created_at', 'resolved_at')
+    ordering = ('-created_at',)
@@ -0,0 +1,221 @@
+"""
+Antigüedad de cuentas por cobrar (aging) por cliente y aplicación.
+
+ReceivableAging guarda, por cada par cliente/aplicación, la suma de los PaymentEvent
+pendientes separada en tramos según los días de atraso respecto de su fecha as_of:
+
+    current        aún no vence (fecha esperada posterior a as_of)
+    days_0_30      0 a 30 días de atraso
+    days_31_60     31 a 60 días
+    days_61_90     61 a 90 días
+    days_over_90   más de 90 días
+
+La tabla se mantiene así:
+
+- Los signals de PaymentEvent (finance/signals.py) aplican la diferencia de cada evento
+  creado, pagado, modificado o eliminado (apply_event).
+- Las operaciones masivas de forgeapp.services envían payment_events_changed y se
+  recalculan solo los pares afectados (rebuild_aging).
+- Si cambia el cliente o la aplicación de una suscripción, el signal de Subscription
+  recalcula su par anterior y el nuevo (rebuild_aging con pairs).
+- La tarea diaria (shift_aging) mueve entre tramos únicamente los montos de eventos que
+  cruzaron un límite desde el último desplazamiento.
+"""
+from datetime import date, timedelta
+from django.db import transaction
+from core import cache
+from django.db.models import Count, F, Q, Sum
+import logging
+
+logger = logging.getLogger('finance')
+
+# (días de atraso desde los que se entra al tramo, tramo de origen, tramo de destino)
+BOUNDARIES = [
+    (0, 'current', 'days_0_30'),
+    (31, 'days_0_30', 'days_31_60'),
+    (61, 'days_31_60', 'days_61_90'),
+    (91, 'days_61_90', 'days_over_90'),
+]
+
+def bucket_for(expected_date, as_of):
+    """Nombre del tramo en que cae un evento con fecha esperada expected_date a la fecha as_of"""
+    overdue = (as_of - expected_date).days
+    if overdue < 0:
+        return 'current'
+    if overdue <= 30:
+        return 'days_0_30'
+    if overdue <= 60:
+        return 'days_31_60'
+    if overdue <= 90:
+        return 'days_61_90'
+    return 'days_over_90'
+
+def bucket_filters(today):
+    """Filtros sobre expected_date equivalentes a bucket_for, para agregaciones condicionales"""
+    return {
+        'current': Q(expected_date__gt=today),
+        'days_0_30': Q(expected_date__lte=today, expected_date__gte=today - timedelta(days=30)),
+        'days_31_60': Q(expected_date__lt=today - timedelta(days=30), expected_date__gte=today - timedelta(days=60)),
+        'days_61_90': Q(expected_date__lt=today - timedelta(days=60), expected_date__gte=today - timedelta(days=90)),
+        'days_over_90': Q(expected_date__lt=today - timedelta(days=90)),
+    }
+
+def apply_event(subscription_id, expected_date, amount, sign):
+    """
+    Suma (sign=1) o resta (sign=-1) un evento pendiente del resumen de su cliente/aplicación.
+    Al restar no se crean filas: si el resumen no existe no hay nada que descontar.
+    """
+    from finance.models import ReceivableAging
+    from forgeapp.models import Subscription
+
+    key = Subscription.objects.filter(pk=subscription_id).values_list('client_id', 'application_id').first()
+    if key is None:
+        return
+
+    client_id, application_id = key
+    if sign > 0:
+        row, _ = ReceivableAging.objects.get_or_create(
+            client_id=client_id,
+            application_id=application_id,
+            defaults={'as_of': date.today()}
+        )
+    else:
+        row = ReceivableAging.objects.filter(
+            client_id=client_id,
+            application_id=application_id
+        ).only('pk', 'as_of').first()
+        if row is None:
+            return
+
+    bucket = bucket_for(expected_date, row.as_of)
+    ReceivableAging.objects.filter(pk=row.pk).update(**{
+        bucket: F(bucket) + amount * sign,
+        'pending_count': F('pending_count') + sign,
+    })
+
+def event_contribution(values):
+    """
+    Retorna (subscription_id, expected_date, amount) si los valores corresponden a un evento
+    pendiente que suma al aging, o None si no aporta (pagado o con datos incompletos).
+    """
+    if values.get('status') != 'pending':
+        return None
+    contribution = (values.get('subscription_id'), values.get('expected_date'), values.get('amount'))
+    if None in contribution:
+        return None
+    return contribution
+
+def rebuild_aging(subscription_ids=None, today=None, pairs=None):
+    """
+    Recalcula desde PaymentEvent el resumen de los pares cliente/aplicación de subscription_ids
+    (o de todos si ambos son None) con una única consulta agrupada. pairs agrega pares
+    (client_id, application_id) que ya no corresponden a ninguna de esas suscripciones, como
+    el anterior de una suscripción modificada. Retorna la cantidad de filas escritas.
+    """
+    from finance.models import ReceivableAging
+    from forgeapp.models import PaymentEvent, Subscription
+
+    today = today or date.today()
+    events = PaymentEvent.objects.filter(status='pending')
+    rows = ReceivableAging.objects.all()
+
+    if subscription_ids is not None or pairs is not None:
+        pairs = set(pairs or ()) | set(
+            Subscription.objects.filter(pk__in=list(subscription_ids or ()))
+            .values_list('client_id', 'application_id').distinct()
+        )
+        if not pairs:
+            return 0
+        client_ids = {client_id for client_id, _ in pairs}
+        application_ids = {application_id for _, application_id in pairs}
+        events = events.filter(
+            subscription__client_id__in=client_ids,
+            subscription__application_id__in=application_ids
+        )
+        rows = rows.filter(client_id__in=client_ids, application_id__in=application_ids)
+
+    totals = events.values(
+        'subscription__client_id', 'subscription__application_id'
+    ).annotate(
+        pending_count=Count('pk'),
+        **{
+            bucket: Sum('amount', filter=condition)
+            for bucket, condition in bucket_filters(today).items()
+        }
+    ).order_by()
+
+    new_rows = []
+    for total in totals:
+        key = (total['subscription__client_id'], total['subscription__application_id'])
+        if pairs is not None and key not in pairs:
+            continue
+        new_rows.append(ReceivableAging(
+            client_id=key[0],
+            application_id=key[1],
+            pending_count=total['pending_count'],
+            as_of=today,
+            **{bucket: total[bucket] or 0 for bucket in ReceivableAging.BUCKET_FIELDS}
+        ))
+
+    with transaction.atomic():
+        if pairs is None:
+            rows.delete()
+        else:
+            stale = [
+                pk for pk, client_id, application_id in rows.values_list('pk', 'client_id', 'application_id')
+                if (client_id, application_id) in pairs
+            ]
+            ReceivableAging.objects.filter(pk__in=stale).delete()
+        ReceivableAging.objects.bulk_create(new_rows)
+
+    cache.bump(cache.PAYMENT_EVENTS)
+    return len(new_rows)
+
+def shift_aging(today=None):
+    """
+    Avanza el resumen hasta today moviendo entre tramos solo los eventos pendientes que
+    cruzaron un límite (0, 31, 61 o 91 días de atraso) desde el as_of de cada fila.
+    El costo depende de la cantidad de eventos que cambian de tramo, no del historial completo.
+    Retorna la cantidad de filas ajustadas.
+    """
+    from finance.models import ReceivableAging
+    from forgeapp.models import PaymentEvent
+
+    today = today or date.today()
+    adjusted = 0
+
+    as_of_dates = ReceivableAging.objects.filter(as_of__lt=today).values_list('as_of', flat=True).distinct()
+
+    with transaction.atomic():
+        for as_of in list(as_of_dates):
+            rows = ReceivableAging.objects.filter(as_of=as_of)
+            keys = set(rows.values_list('client_id', 'application_id'))
+
+            for days, source, target in BOUNDARIES:
+                # Eventos cuyo atraso llegó a `days` en el intervalo (as_of, today]
+                crossed = PaymentEvent.objects.filter(
+                    status='pending',
+                    expected_date__gt=as_of - timedelta(days=days),
+                    expected_date__lte=today - timedelta(days=days)
+                ).values(
+                    'subscription__client_id', 'subscription__application_id'
+                ).annotate(moved=Sum('amount')).order_by()
+
+                for group in crossed:
+                    key = (group['subscription__client_id'], group['subscription__application_id'])
+                    if key not in keys:
+                        continue
+                    adjusted += rows.filter(client_id=key[0], application_id=key[1]).update(**{
+                        source: F(source) - group['moved'],
+                        target: F(target) + group['moved'],
+                    })
+
+            rows.update(as_of=today)
+
+        # Los pares sin eventos pendientes ya no aportan al resumen
+        ReceivableAging.objects.filter(pending_count__lte=0).delete()
+
+    cache.bump(cache.PAYMENT_EVENTS)
+
+    logger.info(f"Aging desplazado al {today}: {adjusted} ajustes de tramo")
+    return adjusted
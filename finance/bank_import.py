@@ -0,0 +1,331 @@
+"""
+Importación de cartolas bancarias (CSV u OFX) como Transaction.
+
+El archivo se lee como flujo, fila por fila, y cada movimiento se valida y convierte en un
+StatementRow (fecha, monto con signo, descripción). Los montos positivos son ingresos y
+los negativos egresos.
+
+Cada movimiento se identifica con un hash de su contenido (fecha, monto, descripción,
+cuenta y número de aparición del mismo movimiento dentro del archivo, para no perder dos
+cargos idénticos del mismo día). El hash se guarda en Transaction.import_hash (único e
+indexado), de modo que por cada bloque de filas basta una consulta import_hash__in para
+descartar los ya importados y un bulk_create para insertar el resto. Volver a subir la
+misma cartola no inserta nada.
+
+Las transacciones ingresadas a mano no tienen hash: un movimiento de la cartola con la misma
+fecha, tipo, monto y descripción (sin distinguir mayúsculas ni espacios) que una de ellas se
+toma como ya registrado y no se inserta. Cada transacción manual cubre un solo movimiento,
+de modo que dos cargos idénticos con uno solo ingresado a mano importan el otro.
+
+Si alguna fila no es válida no se importa ninguna (la importación corre en una
+transacción) y se informan los errores con su número de línea.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from core import cache
+import csv
+import hashlib
+import html
+import io
+import logging
+import re
+
+logger = logging.getLogger('finance')
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 20
+
+StatementRow = namedtuple('StatementRow', ['line', 'date', 'amount', 'description'])
+
+class StatementError(ValueError):
+    """Errores de validación de una cartola (lista de mensajes con número de línea)"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+# Nombres de columna aceptados en las cartolas CSV (en minúsculas y sin tildes)
+CSV_COLUMNS = {
+    'date': ('fecha', 'date', 'fecha operacion', 'fecha contable'),
+    'description': ('descripcion', 'description', 'glosa', 'detalle', 'concepto', 'movimiento'),
+    'amount': ('monto', 'amount', 'importe', 'valor'),
+    'debit': ('cargo', 'cargos', 'debito', 'debit', 'egreso'),
+    'credit': ('abono', 'abonos', 'credito', 'credit', 'ingreso'),
+}
+
+DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%y', '%Y%m%d')
+
+def _normalize(text):
+    text = text.strip().lower()
+    for accented, plain in zip('áéíóú', 'aeiou'):
+        text = text.replace(accented, plain)
+    return ' '.join(text.split())
+
+def parse_date(text):
+    text = text.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'fecha no reconocida: "{text}"')
+
+def parse_amount(text):
+    """
+    Convierte montos con separadores chilenos o internacionales: "1.234.567", "-1.234,50",
+    "$ 12.000", "1234.56". Un solo punto seguido de exactamente tres dígitos se toma como
+    separador de miles (los montos en pesos no tienen decimales).
+    """
+    cleaned = re.sub(r'[^\d,.\-]', '', text.strip())
+    negative = cleaned.startswith('-') or text.strip().startswith('(')
+    cleaned = cleaned.replace('-', '')
+    if not cleaned:
+        raise ValueError(f'monto no reconocido: "{text}"')
+
+    if ',' in cleaned and '.' in cleaned:
+        decimal_separator = ',' if cleaned.rfind(',') > cleaned.rfind('.') else '.'
+    elif ',' in cleaned:
+        decimal_separator = ',' if re.search(r',\d{1,2}$', cleaned) else None
+    elif cleaned.count('.') == 1 and not re.search(r'\.\d{3}$', cleaned):
+        decimal_separator = '.'
+    else:
+        decimal_separator = None
+
+    thousands = {',', '.'} - {decimal_separator}
+    for separator in thousands:
+        cleaned = cleaned.replace(separator, '')
+    if decimal_separator:
+        cleaned = cleaned.replace(decimal_separator, '.')
+
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f'monto no reconocido: "{text}"')
+    return -amount if negative else amount
+
+def _csv_columns(header):
+    columns = {}
+    for index, name in enumerate(header):
+        name = _normalize(name)
+        for key, aliases in CSV_COLUMNS.items():
+            if name in aliases and key not in columns:
+                columns[key] = index
+    if 'date' not in columns or 'description' not in columns:
+        raise StatementError(['Línea 1: la cartola debe tener columnas de fecha y descripción'])
+    if 'amount' not in columns and not ('debit' in columns or 'credit' in columns):
+        raise StatementError(['Línea 1: la cartola debe tener una columna de monto o de cargos/abonos'])
+    return columns
+
+def parse_csv(stream):
+    """
+    Movimientos de una cartola CSV (separada por comas o punto y coma), con una columna de
+    monto con signo o columnas separadas de cargos y abonos. Genera StatementRow o
+    ValueError por fila inválida.
+    """
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(stream, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = _csv_columns(header)
+
+    for line, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        cells = {
+            key: values[index].strip() if index < len(values) else ''
+            for key, index in columns.items()
+        }
+        try:
+            if cells.get('amount'):
+                amount = parse_amount(cells['amount'])
+            else:
+                credit = parse_amount(cells['credit']) if cells.get('credit') else Decimal('0')
+                debit = parse_amount(cells['debit']) if cells.get('debit') else Decimal('0')
+                amount = abs(credit) - abs(debit)
+            yield StatementRow(line, parse_date(cells['date']), amount, cells['description'])
+        except ValueError as e:
+            yield ValueError(f'Línea {line}: {e}')
+
+def _ofx_tokens(stream, chunk_size=65536):
+    """Pares (etiqueta, valor) de un archivo OFX (SGML o XML), leído por bloques"""
+    pending = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        parts = (pending + chunk).split('<')
+        # El último fragmento puede estar incompleto: se conserva para el siguiente bloque
+        pending = parts.pop() if chunk else ''
+        for part in parts:
+            tag, _, value = part.partition('>')
+            if tag:
+                yield tag.strip().upper(), html.unescape(value.strip())
+        if not chunk:
+            return
+
+def parse_ofx(stream):
+    """
+    Movimientos (STMTTRN) de un archivo OFX. Genera StatementRow o ValueError por
+    movimiento inválido; line es el número de movimiento dentro del archivo.
+    """
+    current = None
+    number = 0
+    for tag, value in _ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            number += 1
+            current = {}
+        elif tag == '/STMTTRN' and current is not None:
+            try:
+                posted = current.get('DTPOSTED', '')[:8]
+                description = current.get('NAME') or current.get('MEMO') or ''
+                if current.get('NAME') and current.get('MEMO') and current['MEMO'] != current['NAME']:
+                    description = f"{current['NAME']} {current['MEMO']}"
+                yield StatementRow(
+                    number, parse_date(posted), parse_amount(current.get('TRNAMT', '')), description
+                )
+            except ValueError as e:
+                yield ValueError(f'Movimiento {number}: {e}')
+            current = None
+        elif current is not None and not tag.startswith('/'):
+            current[tag] = value
+
+def import_hash(row, account, occurrence):
+    """Hash del contenido de un movimiento (fecha, monto, descripción, cuenta, aparición)"""
+    description = ' '.join(row.description.split())
+    content = f'{row.date.isoformat()}|{row.amount:.2f}|{description}|{account}|{occurrence}'
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def open_statement(uploaded_file):
+    """Flujo de texto del archivo subido: UTF-8 si es válido, si no Windows-1252"""
+    sample = uploaded_file.read(65536)
+    uploaded_file.seek(0)
+    try:
+        sample.decode('utf-8')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # El bloque puede cortar un carácter multibyte al final
+        encoding = 'utf-8-sig' if e.start >= len(sample) - 3 else 'cp1252'
+    return io.TextIOWrapper(uploaded_file, encoding=encoding, newline='')
+
+def statement_rows(stream, file_format):
+    return parse_ofx(stream) if file_format == 'ofx' else parse_csv(stream)
+
+def _manual_key(transaction_type, amount, day, description):
+    return (day, transaction_type, amount, ' '.join(description.split()).lower())
+
+def _manual_transactions(rows, claimed):
+    """
+    Transacciones ingresadas a mano (sin import_hash) que coinciden con algún movimiento de
+    rows, agrupadas por _manual_key: {clave: [pk, ...]}. Omite las de claimed, que ya
+    cubren un movimiento de un bloque anterior.
+    """
+    from finance.models import Transaction
+
+    candidates = Transaction.objects.filter(
+        import_hash__isnull=True,
+        date__in={row.date for row in rows},
+        amount__in={abs(row.amount) for row in rows},
+    ).exclude(pk__in=claimed).order_by('pk').values_list('pk', 'type', 'amount', 'date', 'description')
+
+    manual = {}
+    for pk, transaction_type, amount, day, description in candidates:
+        manual.setdefault(_manual_key(transaction_type, amount, day, description), []).append(pk)
+    return manual
+
+def _insert_chunk(chunk, account, income_category, expense_category, claimed):
+    """
+    Inserta los movimientos del bloque que no estén importados ni ingresados a mano.
+    Agrega a claimed las transacciones manuales que cubren un movimiento.
+    Retorna (creados, ya ingresados a mano).
+    """
+    from finance.models import Transaction
+
+    hashes = [row_hash for row_hash, _ in chunk]
+    existing = set(Transaction.objects.filter(import_hash__in=hashes).values_list('import_hash', flat=True))
+    chunk = [(row_hash, row) for row_hash, row in chunk if row_hash not in existing]
+    manual = _manual_transactions([row for _, row in chunk], claimed) if chunk else {}
+
+    new_rows = []
+    for row_hash, row in chunk:
+        transaction_type = 'income' if row.amount > 0 else 'expense'
+        matches = manual.get(_manual_key(transaction_type, abs(row.amount), row.date, row.description))
+        if matches:
+            claimed.add(matches.pop(0))
+            continue
+        new_rows.append(Transaction(
+            type=transaction_type,
+            category=income_category if row.amount > 0 else expense_category,
+            description=row.description or 'Movimiento bancario',
+            amount=abs(row.amount),
+            date=row.date,
+            source_account=account,
+            import_hash=row_hash,
+        ))
+    Transaction.objects.bulk_create(new_rows)
+    return len(new_rows), len(chunk) - len(new_rows)
+
+def import_statement(rows, account, income_category='Banco', expense_category='Banco', chunk_size=CHUNK_SIZE):
+    """
+    Importa los movimientos (StatementRow o ValueError, como los generan parse_csv y
+    parse_ofx) en bloques de chunk_size. Los montos en cero se omiten.
+
+    Retorna {'rows', 'created', 'duplicates', 'manual', 'skipped'} (manual: movimientos ya
+    ingresados a mano); lanza StatementError (sin importar nada) si alguna fila no es válida.
+    """
+    account = account.strip()
+    occurrences = Counter()
+    errors = []
+    total = created = manual = skipped = 0
+    claimed = set()
+    chunk = []
+
+    with transaction.atomic():
+        for row in rows:
+            if isinstance(row, ValueError):
+                errors.append(str(row))
+                if len(errors) >= MAX_ERRORS:
+                    break
+                continue
+            total += 1
+            if not row.amount:
+                skipped += 1
+                continue
+
+            key = (row.date, row.amount, ' '.join(row.description.split()))
+            occurrences[key] += 1
+            chunk.append((import_hash(row, account, occurrences[key]), row))
+
+            if len(chunk) >= chunk_size and not errors:
+                chunk_created, chunk_manual = _insert_chunk(chunk, account, income_category, expense_category, claimed)
+                created += chunk_created
+                manual += chunk_manual
+                chunk = []
+
+        if errors:
+            # La excepción revierte también los bloques ya insertados
+            raise StatementError(errors)
+
+        if chunk:
+            chunk_created, chunk_manual = _insert_chunk(chunk, account, income_category, expense_category, claimed)
+            created += chunk_created
+            manual += chunk_manual
+
+    if created:
+        # bulk_create no envía post_save
+        cache.bump(cache.TRANSACTIONS)
+
+    logger.info(f"Cartola de la cuenta {account or '-'} importada: {created} movimientos nuevos de {total}")
+    return {
+        'rows': total,
+        'created': created,
+        'duplicates': total - skipped - created - manual,
+        'manual': manual,
+        'skipped': skipped,
+    }
@@ -0,0 +1,124 @@
+"""
+Retención por cohortes de clientes.
+
+La cohorte de un cliente es el mes en que se activó por primera vez (la menor fecha entre
+start_date y los pagos de sus suscripciones). Un cliente se considera retenido en un mes
+si alguna de sus suscripciones lo cubre:
+
+- desde su primer mes de actividad hasta el mes actual si está ACTIVE,
+- hasta cancelled_at si está CANCELLED,
+- hasta el fin del período del último pago (1 o 12 meses) en los demás estados,
+
+o si registró un pago ese mes.
+
+En lugar de recorrer, por cada cohorte, cada mes posterior sobre todas las suscripciones y
+eventos, se hace una sola consulta (suscripciones con sus eventos pagados, leída en
+streaming) y se arma la matriz con operaciones sobre conjuntos de bits: cada cohorte y
+cada mes tienen un entero cuyo bit i corresponde al cliente i, y la celda (cohorte, mes)
+es la cantidad de bits de la intersección.
+"""
+from datetime import date
+from django.db.models import FilteredRelation, Q
+from forgeapp.models import Subscription
+from finance.forecast import PERIOD_MONTHS, month_ordinal, ordinal_to_date
+
+MAX_COHORTS = 36
+
+def _subscription_spans(rows, today):
+    """
+    Agrupa las filas (una por suscripción y pago) y retorna, por cliente, la lista de
+    intervalos de meses cubiertos (primer mes, último mes) y el conjunto de meses con pago.
+    """
+    current = month_ordinal(today)
+    subscriptions = {}
+    for client_id, subscription_id, start_date, status, cancelled_at, payment_type, paid_date in rows:
+        entry = subscriptions.setdefault(subscription_id, {
+            'client_id': client_id,
+            'start': month_ordinal(start_date) if start_date else None,
+            'status': status,
+            'cancelled': month_ordinal(cancelled_at) if cancelled_at else None,
+            'period': PERIOD_MONTHS.get(payment_type, 12),
+            'paid': set(),
+        })
+        if paid_date:
+            entry['paid'].add(month_ordinal(paid_date))
+
+    clients = {}
+    for entry in subscriptions.values():
+        paid = entry['paid']
+        starts = [month for month in [entry['start'], min(paid, default=None)] if month is not None]
+        if not starts or (entry['status'] == 'pending' and not paid):
+            continue
+        first = min(starts)
+
+        if entry['status'] == 'active':
+            last = current
+        elif entry['status'] == 'cancelled' and entry['cancelled'] is not None:
+            last = entry['cancelled']
+        elif paid:
+            last = max(paid) + entry['period'] - 1
+        else:
+            last = first
+        last = min(max(last, first), current)
+
+        spans, months = clients.setdefault(entry['client_id'], ([], set()))
+        spans.append((first, last))
+        months.update(paid)
+
+    return clients
+
+def cohort_matrix(cohorts=12, today=None):
+    """
+    Matriz de retención de las últimas `cohorts` cohortes mensuales.
+
+    Retorna un dict con:
+        offsets: meses desde la activación (0, 1, 2, ...)
+        cohorts: lista de {'month', 'size', 'retained', 'rates'} del más antiguo al más
+                 reciente; retained[k] es la cantidad de clientes activos k meses después de
+                 su activación y rates[k] el porcentaje respecto de size (None si el mes aún
+                 no ocurre)
+    """
+    today = today or date.today()
+    cohorts = max(1, min(int(cohorts), MAX_COHORTS))
+    current = month_ordinal(today)
+    first_cohort = current - cohorts + 1
+
+    rows = Subscription.objects.annotate(
+        paid_events=FilteredRelation('payment_events', condition=Q(payment_events__status='paid'))
+    ).values_list(
+        'client_id', 'pk', 'start_date', 'status', 'cancelled_at', 'payment_type', 'paid_events__paid_date'
+    ).order_by().iterator(chunk_size=2000)
+
+    clients = _subscription_spans(rows, today)
+
+    members = {}   # cohorte -> bits de sus clientes
+    active = {}    # mes -> bits de los clientes activos
+    for index, (spans, paid_months) in enumerate(clients.values()):
+        cohort = min(first for first, _ in spans)
+        if cohort < first_cohort:
+            continue
+        bit = 1 << index
+        members[cohort] = members.get(cohort, 0) | bit
+        months = set(paid_months)
+        for first, last in spans:
+            months.update(range(first, last + 1))
+        for month in months:
+            if cohort <= month <= current:
+                active[month] = active.get(month, 0) | bit
+
+    result = []
+    for cohort in range(first_cohort, current + 1):
+        bits = members.get(cohort, 0)
+        size = bits.bit_count()
+        retained = [(bits & active.get(month, 0)).bit_count() for month in range(cohort, current + 1)]
+        result.append({
+            'month': ordinal_to_date(cohort),
+            'size': size,
+            'retained': retained,
+            'rates': [count / size * 100 if size else None for count in retained],
+        })
+
+    return {
+        'offsets': list(range(cohorts)),
+        'cohorts': result,
+    }
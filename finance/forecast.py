@@ -0,0 +1,103 @@
+"""
+Proyección de ingresos por suscripciones (flujo de caja futuro).
+
+En lugar de recorrer cada suscripción y avanzar su current_period_end mes a mes, la
+proyección trabaja con meses como ordinales (año * 12 + mes - 1):
+
+1. Una sola consulta agrupa las suscripciones activas con autorenovación por aplicación,
+   tipo de pago y mes del próximo cobro, sumando sus precios.
+2. Cada grupo se expande sobre el horizonte con aritmética de ordinales: un cobro mensual
+   cae en todos los meses desde el primero, uno anual cada 12 meses.
+
+El costo depende de la cantidad de grupos (aplicaciones × tipos × meses), no de la
+cantidad de suscripciones.
+"""
+from datetime import date
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from forgeapp.models import Subscription
+
+MAX_HORIZON_MONTHS = 24
+
+PERIOD_MONTHS = {
+    'monthly': 1,
+    'annual': 12,
+}
+
+def month_ordinal(value):
+    """Convierte una fecha en un ordinal de mes (año * 12 + mes - 1)"""
+    return value.year * 12 + value.month - 1
+
+def ordinal_to_date(ordinal):
+    """Primer día del mes correspondiente a un ordinal de mes"""
+    return date(ordinal // 12, ordinal % 12 + 1, 1)
+
+def forecast_revenue(months=12, today=None):
+    """
+    Proyecta los cobros esperados de las suscripciones activas con autorenovación durante
+    los próximos `months` meses (incluido el actual), agrupados por mes y aplicación.
+
+    El primer cobro de cada suscripción es su evento pendiente (next_payment_event) o, si
+    no tiene, current_period_end. Un cobro ya vencido se suma una vez al mes actual y los
+    siguientes continúan con el ciclo original.
+
+    Retorna un dict con:
+        months: lista de fechas (primer día de cada mes)
+        applications: lista de {'id', 'name', 'amounts', 'total'} ordenada por total
+        totals: total por mes
+        total: total del horizonte
+        subscriptions: cantidad de suscripciones proyectadas
+    """
+    today = today or date.today()
+    months = max(1, min(int(months), MAX_HORIZON_MONTHS))
+    first = month_ordinal(today)
+
+    groups = Subscription.objects.filter(
+        status='active',
+        auto_renewal=True,
+        start_date__isnull=False
+    ).annotate(
+        first_due=TruncMonth(Coalesce('next_payment_event__expected_date', 'current_period_end'))
+    ).values(
+        'application_id', 'application__name', 'payment_type', 'first_due'
+    ).annotate(
+        amount=Sum('price'),
+        subscriptions=Count('pk')
+    ).order_by()
+
+    applications = {}
+    subscriptions = 0
+
+    for group in groups:
+        step = PERIOD_MONTHS.get(group['payment_type'], 12)
+        offset = month_ordinal(group['first_due']) - first
+        if offset >= months:
+            continue
+
+        application = applications.setdefault(group['application_id'], {
+            'id': group['application_id'],
+            'name': group['application__name'],
+            'amounts': [Decimal('0')] * months,
+        })
+        if offset < 0:
+            # Cobro vencido: se espera en el mes actual y los siguientes mantienen su ciclo
+            application['amounts'][0] += group['amount']
+            offset %= step
+        for index in range(offset, months, step):
+            application['amounts'][index] += group['amount']
+        subscriptions += group['subscriptions']
+
+    totals = [Decimal('0')] * months
+    for application in applications.values():
+        application['total'] = sum(application['amounts'], Decimal('0'))
+        for index, amount in enumerate(application['amounts']):
+            totals[index] += amount
+
+    return {
+        'months': [ordinal_to_date(first + index) for index in range(months)],
+        'applications': sorted(applications.values(), key=lambda app: app['total'], reverse=True),
+        'totals': totals,
+        'total': sum(totals, Decimal('0')),
+        'subscriptions': subscriptions,
+    }
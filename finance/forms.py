@@ -117,3 +117,67 @@ class TransactionFilterForm(forms.Form):
             'type': 'date'
         })
     )
+
+class BankStatementImportForm(forms.Form):
+    """Formulario para importar una cartola bancaria (CSV u OFX)"""
+    FORMAT_CHOICES = [
+        ('', 'Detectar por extensión'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+
+    file = forms.FileField(
+        label='Cartola',
+        widget=forms.ClearableFileInput(attrs={'class': 'w-full', 'accept': '.csv,.txt,.ofx,.qfx'})
+    )
+    file_format = forms.ChoiceField(
+        label='Formato',
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'w-full'})
+    )
+    account = forms.CharField(
+        label='Cuenta',
+        max_length=50,
+        help_text='Identifica la cuenta bancaria; forma parte de la clave de deduplicación',
+        widget=forms.TextInput(attrs={'class': 'w-full'})
+    )
+    income_category = forms.CharField(
+        label='Categoría de abonos',
+        max_length=100,
+        initial='Banco',
+        widget=forms.TextInput(attrs={'class': 'w-full'})
+    )
+    expense_category = forms.CharField(
+        label='Categoría de cargos',
+        max_length=100,
+        initial='Banco',
+        widget=forms.TextInput(attrs={'class': 'w-full'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        uploaded = cleaned_data.get('file')
+        if uploaded and not cleaned_data.get('file_format'):
+            extension = uploaded.name.rsplit('.', 1)[-1].lower()
+            cleaned_data['file_format'] = 'ofx' if extension in ('ofx', 'qfx') else 'csv'
+        return cleaned_data
+
+class ReconciliationForm(forms.Form):
+    """Rango de fechas de los ingresos a conciliar con los eventos de pago pendientes"""
+    start_date = forms.DateField(
+        label='Desde',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'w-full'})
+    )
+    end_date = forms.DateField(
+        label='Hasta',
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'w-full'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError('La fecha de inicio debe ser anterior a la fecha de término')
+        return cleaned_data
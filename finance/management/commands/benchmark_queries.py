@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un volumen grande de datos en una base de datos de prueba, recorre las vistas '
+        'principales y revisa con EXPLAIN que ninguna consulta recorra completa una tabla grande'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=2000,
+            help='Cantidad de clientes a sembrar; el resto de los datos es proporcional (por defecto 2000)'
+        )
+        parser.add_argument('--output', help='Archivo donde guardar el plan de ejecución de cada consulta')
+        parser.add_argument(
+            '--noinput',
+            action='store_false',
+            dest='interactive',
+            help='No preguntar antes de eliminar una base de datos de prueba existente'
+        )
+
+    def handle(self, *args, **options):
+        from core.query_audit import analyze_tables, run_benchmark, seed_dataset
+
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options['interactive'], serialize=False)
+        try:
+            self.stdout.write(f"Sembrando datos para {options['clients']} clientes...")
+            objects = seed_dataset(options['clients'])
+            analyze_tables()
+
+            user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+            client = Client()
+            client.force_login(user)
+            results = run_benchmark(client, objects)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures = 0
+        for result in results:
+            failed = result['status'] != 200 or result['failures']
+            failures += bool(failed)
+            line = (
+                f"{result['url']:<70} {result['status']}  {result['queries']:>4} consultas  "
+                f"{result['time_ms']:>6} ms"
+            )
+            self.stdout.write(self.style.ERROR(line) if failed else line)
+            for query in result['failures']:
+                self.stdout.write(f"    recorrido completo de {', '.join(query['full_scans'])}: {query['sql'][:300]}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                for result in results:
+                    output.write(f"## {result['url']} ({result['status']}, {result['queries']} consultas)\n\n")
+                    for query in result['explained']:
+                        output.write(f"{query['sql']}\n")
+                        output.write(''.join(f'    {line}\n' for line in query['plan']))
+                        output.write('\n')
+            self.stdout.write(f"Planes de ejecución guardados en {options['output']}")
+
+        if failures:
+            raise CommandError(f'{failures} vista(s) con errores o recorridos completos de tablas grandes')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} vistas revisadas sin recorridos completos'))
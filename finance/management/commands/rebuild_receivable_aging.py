@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero la antigüedad de cuentas por cobrar a partir de los eventos de pago pendientes'
+
+    def handle(self, *args, **options):
+        from finance.aging import rebuild_aging
+        from finance.telemetry import track_job
+
+        with track_job('rebuild_receivable_aging') as run:
+            run.rows_updated = rebuild_aging()
+
+        self.stdout.write(self.style.SUCCESS(f'{run.rows_updated} resumen(es) cliente/aplicación recalculados'))
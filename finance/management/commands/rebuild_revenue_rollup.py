@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero el resumen mensual de ingresos a partir de los eventos de pago pagados'
+
+    def handle(self, *args, **options):
+        from finance.rollup import rebuild_rollup
+        from finance.telemetry import track_job
+
+        with track_job('rebuild_revenue_rollup') as run:
+            run.rows_updated = rebuild_rollup()
+
+        self.stdout.write(self.style.SUCCESS(f'{run.rows_updated} resumen(es) mensuales recalculados'))
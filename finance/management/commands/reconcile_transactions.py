@@ -0,0 +1,44 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Concilia los ingresos sin conciliar con los eventos de pago pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='Primer día de los ingresos a conciliar (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Último día de los ingresos a conciliar (YYYY-MM-DD)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántos ingresos se conciliarían, sin modificar datos'
+        )
+
+    def _date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Las fechas deben tener el formato YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        from finance.reconciliation import reconcile
+        from finance.telemetry import track_job
+
+        start_date = self._date(options['start_date'])
+        end_date = self._date(options['end_date'])
+
+        if options['dry_run']:
+            result = reconcile(start_date, end_date, dry_run=True)
+        else:
+            with track_job('reconcile_transactions') as run:
+                result = reconcile(start_date, end_date)
+                run.rows_scanned = result['transactions']
+                run.rows_updated = result['matched']
+
+        prefix = 'Se conciliarían' if options['dry_run'] else 'Conciliados'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result['matched']} de {result['transactions']} ingresos; "
+            f"{result['review']} por revisar, {result['unmatched']} sin coincidencias"
+        ))
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger('finance')
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta el scheduler de tareas programadas. Varios procesos pueden ejecutarlo a la vez: '
+        'solo el que tiene el candado en base de datos (líder) corre las tareas, el resto queda en espera'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--heartbeat',
+            type=int,
+            default=getattr(settings, 'SCHEDULER_HEARTBEAT_SECONDS', 30),
+            help='Segundos entre cada renovación del candado',
+        )
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=getattr(settings, 'SCHEDULER_LOCK_TTL_SECONDS', 90),
+            help='Segundos sin heartbeat tras los cuales otro proceso puede tomar el liderazgo',
+        )
+        parser.add_argument(
+            '--run-now',
+            action='store_true',
+            help='Ejecuta las tareas diarias inmediatamente al obtener el liderazgo',
+        )
+
+    def handle(self, *args, **options):
+        from finance.scheduler import (
+            start_scheduler, daily_tasks, acquire_leadership, renew_leadership, release_leadership
+        )
+
+        if not getattr(settings, 'ENABLE_SUBSCRIPTION_CHECK', True):
+            self.stdout.write(self.style.WARNING('ENABLE_SUBSCRIPTION_CHECK está desactivado, no se inicia el scheduler'))
+            return
+
+        heartbeat = options['heartbeat']
+        ttl = options['ttl']
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Detener el ciclo limpiamente con SIGTERM (deploys) o Ctrl+C
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+        self.stdout.write(f'Scheduler {owner} iniciado, esperando liderazgo...')
+        scheduler = None
+
+        try:
+            while not stop.is_set():
+                close_old_connections()
+
+                if scheduler is None:
+                    if acquire_leadership(owner, ttl):
+                        scheduler = start_scheduler()
+                        if scheduler is None:
+                            release_leadership(owner)
+                        else:
+                            logger.info(f"Scheduler {owner} obtuvo el liderazgo")
+                            self.stdout.write(self.style.SUCCESS(f'{owner} es ahora el líder del scheduler'))
+                            if options['run_now']:
+                                daily_tasks()
+                elif not renew_leadership(owner):
+                    logger.warning(f"Scheduler {owner} perdió el liderazgo, deteniendo tareas")
+                    self.stdout.write(self.style.WARNING(f'{owner} perdió el liderazgo'))
+                    scheduler.shutdown(wait=False)
+                    scheduler = None
+
+                stop.wait(heartbeat)
+        finally:
+            if scheduler is not None:
+                scheduler.shutdown()
+            release_leadership(owner)
+            logger.info(f"Scheduler {owner} detenido")
+            self.stdout.write('Scheduler detenido')
@@ -0,0 +1,28 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Registra la fotografía diaria de MRR y churn con el estado actual de las suscripciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Fecha de la fotografía (YYYY-MM-DD). Por defecto, ayer'
+        )
+
+    def handle(self, *args, **options):
+        from finance.snapshots import take_snapshot
+        from finance.telemetry import track_job
+
+        day = None
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato YYYY-MM-DD')
+
+        with track_job('take_revenue_snapshot') as run:
+            run.rows_updated = take_snapshot(day)
+
+        self.stdout.write(self.style.SUCCESS(f'{run.rows_updated} fila(s) de fotografía registradas'))
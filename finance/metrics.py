@@ -0,0 +1,108 @@
+"""
+Métricas del dashboard financiero.
+
+dashboard_metrics() calcula todos los KPIs con dos consultas:
+
+1. Una agregación condicional sobre Subscription (conteos, MRR, clientes activos,
+   retenidos y nuevos, distribución por tipo de pago).
+2. Los ingresos pagados de los últimos meses, leídos del resumen mensual (RevenueRollup).
+
+La cantidad de consultas no depende del tamaño del historial. Además, el dashboard y el
+endpoint JSON (finance:dashboard_metrics) leen el resultado desde la caché versionada
+(cached_dashboard_metrics), que se invalida al cambiar suscripciones o eventos de pago.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from core.cache import cached, SUBSCRIPTIONS, PAYMENT_EVENTS
+from forgeapp.models import Subscription
+from finance.rollup import totals_by_month
+from finance.templatetags.finance_extras import month_name_es
+
+REVENUE_SERIES_MONTHS = 6
+
+def month_starts(today, months):
+    """Primer día de los últimos `months` meses calendario, del más antiguo al actual"""
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(starts))
+
+def subscription_metrics(now=None):
+    """
+    KPIs de suscripciones en una sola agregación condicional. El MRR es la suma de los
+    precios de las suscripciones mensuales activas (las anuales no se incluyen) y su
+    variación se compara con las que ya existían hace 30 días. El MRR mensualizado de
+    las fotografías diarias (finance/snapshots.py) se muestra aparte, en el historial.
+    """
+    now = now or timezone.now()
+    last_month = now - timedelta(days=30)
+
+    active = Q(status='active')
+    monthly = active & Q(payment_type='monthly')
+    before_last_month = Q(created_at__lt=last_month)
+
+    totals = Subscription.objects.aggregate(
+        total_subscriptions=Count('pk'),
+        active_subscriptions=Count('pk', filter=active),
+        mrr=Sum('price', filter=monthly),
+        mrr_last_month=Sum('price', filter=monthly & before_last_month),
+        monthly_count=Count('pk', filter=monthly),
+        annual_count=Count('pk', filter=active & Q(payment_type='annual')),
+        active_clients=Count('client', distinct=True, filter=active),
+        retained_clients=Count('client', distinct=True, filter=active & before_last_month),
+        new_clients=Count('client', distinct=True, filter=active & Q(created_at__gte=last_month)),
+    )
+
+    mrr = totals['mrr'] or Decimal('0')
+    mrr_last_month = totals['mrr_last_month'] or Decimal('0')
+    if mrr_last_month > 0:
+        mrr_change = float((mrr - mrr_last_month) / mrr_last_month * 100)
+    else:
+        mrr_change = 100 if mrr > 0 else 0
+
+    active_clients = totals['active_clients']
+    retention_rate = totals['retained_clients'] / active_clients * 100 if active_clients else 0
+
+    return {
+        'total_subscriptions': totals['total_subscriptions'],
+        'active_subscriptions': totals['active_subscriptions'],
+        'mrr': mrr,
+        'mrr_change': mrr_change,
+        'retention_rate': round(retention_rate, 1),
+        'active_clients': active_clients,
+        'new_clients': totals['new_clients'],
+        'avg_client_value': mrr / active_clients if active_clients else 0,
+        'payment_distribution': [totals['monthly_count'], totals['annual_count']],
+    }
+
+def revenue_series(today=None, months=REVENUE_SERIES_MONTHS):
+    """Ingresos pagados de los últimos meses calendario, desde el resumen mensual de ingresos"""
+    today = today or date.today()
+    starts = month_starts(today, months)
+    totals = totals_by_month(starts[0], today)
+
+    return {
+        'monthly_labels': [month_name_es(start.month) for start in starts],
+        'monthly_data': [float(totals.get((start.year, start.month)) or 0) for start in starts],
+    }
+
+def dashboard_metrics(now=None):
+    """Todas las métricas del dashboard financiero (dos consultas)"""
+    now = now or timezone.now()
+    return {
+        **subscription_metrics(now),
+        **revenue_series(timezone.localdate(now)),
+    }
+
+def cached_dashboard_metrics(now=None):
+    """dashboard_metrics() desde la caché versionada (una entrada por día)"""
+    now = now or timezone.now()
+    return cached(
+        'finance:dashboard_metrics', [SUBSCRIPTIONS, PAYMENT_EVENTS],
+        lambda: dashboard_metrics(now),
+        timezone.localdate(now)
+    )
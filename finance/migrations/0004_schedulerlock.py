@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_receipt_verification_code_alter_receipt_pdf_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('owner', models.CharField(blank=True, max_length=200, verbose_name='Propietario')),
+                ('acquired_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Adquisición')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Heartbeat')),
+            ],
+            options={
+                'verbose_name': 'Candado de Scheduler',
+                'verbose_name_plural': 'Candados de Scheduler',
+                'ordering': ['name'],
+            },
+        ),
+    ]
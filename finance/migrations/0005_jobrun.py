@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_schedulerlock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_name', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('status', models.CharField(choices=[('running', 'En Ejecución'), ('success', 'Exitosa'), ('error', 'Con Error')], default='running', max_length=20, verbose_name='Estado')),
+                ('started_at', models.DateTimeField(verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duración (ms)')),
+                ('rows_scanned', models.PositiveIntegerField(default=0, verbose_name='Filas Revisadas')),
+                ('rows_updated', models.PositiveIntegerField(default=0, verbose_name='Filas Modificadas')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('host', models.CharField(blank=True, max_length=200, verbose_name='Host')),
+                ('pid', models.PositiveIntegerField(blank=True, null=True, verbose_name='PID')),
+            ],
+            options={
+                'verbose_name': 'Ejecución de Tarea',
+                'verbose_name_plural': 'Ejecuciones de Tareas',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job_name', '-started_at'], name='finance_jobrun_name_started'), models.Index(fields=['started_at'], name='finance_jobrun_started')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0031_backfill_subscription_next_payment_event'),
+        ('finance', '0005_jobrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceivableAging',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Por Vencer')),
+                ('days_0_30', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='0-30 días')),
+                ('days_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='31-60 días')),
+                ('days_61_90', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='61-90 días')),
+                ('days_over_90', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Más de 90 días')),
+                ('pending_count', models.IntegerField(default=0, verbose_name='Eventos Pendientes')),
+                ('as_of', models.DateField(verbose_name='Calculado al')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receivable_aging', to='forgeapp.application', verbose_name='Aplicación')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receivable_aging', to='forgeapp.client', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Antigüedad de Cuentas por Cobrar',
+                'verbose_name_plural': 'Antigüedad de Cuentas por Cobrar',
+                'ordering': ['client', 'application'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='receivableaging',
+            constraint=models.UniqueConstraint(fields=('client', 'application'), name='finance_aging_client_app'),
+        ),
+    ]
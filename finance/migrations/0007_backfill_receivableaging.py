@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_receivable_aging(apps, schema_editor):
+    """Calcula la antigüedad de cuentas por cobrar a partir de los eventos de pago pendientes"""
+    PaymentEvent = apps.get_model('forgeapp', 'PaymentEvent')
+    ReceivableAging = apps.get_model('finance', 'ReceivableAging')
+
+    today = date.today()
+    buckets = {
+        'current': Q(expected_date__gt=today),
+        'days_0_30': Q(expected_date__lte=today, expected_date__gte=today - timedelta(days=30)),
+        'days_31_60': Q(expected_date__lt=today - timedelta(days=30), expected_date__gte=today - timedelta(days=60)),
+        'days_61_90': Q(expected_date__lt=today - timedelta(days=60), expected_date__gte=today - timedelta(days=90)),
+        'days_over_90': Q(expected_date__lt=today - timedelta(days=90)),
+    }
+
+    totals = PaymentEvent.objects.filter(status='pending').values(
+        'subscription__client_id', 'subscription__application_id'
+    ).annotate(
+        pending_count=Count('pk'),
+        **{bucket: Sum('amount', filter=condition) for bucket, condition in buckets.items()}
+    ).order_by()
+
+    ReceivableAging.objects.bulk_create([
+        ReceivableAging(
+            client_id=total['subscription__client_id'],
+            application_id=total['subscription__application_id'],
+            pending_count=total['pending_count'],
+            as_of=today,
+            **{bucket: total[bucket] or 0 for bucket in buckets}
+        )
+        for total in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_receivableaging'),
+        ('forgeapp', '0032_paymentevent_status_expected_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_receivable_aging, reverse_code=migrations.RunPython.noop),
+    ]
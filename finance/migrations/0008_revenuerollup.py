@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0034_seed_referencesequence'),
+        ('finance', '0007_backfill_receivableaging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Año')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Mes')),
+                ('payment_type', models.CharField(max_length=20, verbose_name='Tipo de Pago')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Monto Pagado')),
+                ('count', models.IntegerField(default=0, verbose_name='Pagos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollup', to='forgeapp.application', verbose_name='Aplicación')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollup', to='forgeapp.client', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual de Ingresos',
+                'verbose_name_plural': 'Resúmenes Mensuales de Ingresos',
+                'ordering': ['-year', '-month', 'application', 'client'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'application', 'client', 'payment_type'), name='finance_rollup_key'),
+        ),
+    ]
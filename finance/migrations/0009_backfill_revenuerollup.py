@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_revenue_rollup(apps, schema_editor):
+    """Calcula el resumen mensual de ingresos a partir de los eventos de pago pagados"""
+    PaymentEvent = apps.get_model('forgeapp', 'PaymentEvent')
+    RevenueRollup = apps.get_model('finance', 'RevenueRollup')
+
+    totals = PaymentEvent.objects.filter(status='paid', paid_date__isnull=False).annotate(
+        year=ExtractYear('paid_date'),
+        month=ExtractMonth('paid_date')
+    ).values(
+        'year', 'month',
+        'subscription__application_id', 'subscription__client_id', 'subscription__payment_type'
+    ).annotate(
+        total=Sum('amount'),
+        paid_count=Count('pk')
+    ).order_by()
+
+    RevenueRollup.objects.bulk_create([
+        RevenueRollup(
+            year=total['year'],
+            month=total['month'],
+            application_id=total['subscription__application_id'],
+            client_id=total['subscription__client_id'],
+            payment_type=total['subscription__payment_type'],
+            amount=total['total'],
+            count=total['paid_count']
+        )
+        for total in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_revenuerollup'),
+        ('forgeapp', '0034_seed_referencesequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_revenue_rollup, reverse_code=migrations.RunPython.noop),
+    ]
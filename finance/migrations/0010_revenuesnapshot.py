@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0035_subscription_activated_churned'),
+        ('finance', '0009_backfill_revenuerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='MRR')),
+                ('arr', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='ARR')),
+                ('active_subscriptions', models.IntegerField(default=0, verbose_name='Suscripciones Activas')),
+                ('new_subscriptions', models.IntegerField(default=0, verbose_name='Suscripciones Nuevas')),
+                ('churned_subscriptions', models.IntegerField(default=0, verbose_name='Suscripciones Perdidas')),
+                ('active_clients', models.IntegerField(default=0, verbose_name='Clientes Activos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='revenue_snapshots', to='forgeapp.application', verbose_name='Aplicación')),
+            ],
+            options={
+                'verbose_name': 'Fotografía de Ingresos',
+                'verbose_name_plural': 'Fotografías de Ingresos',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['application', 'date'], name='finance_snapshot_app_date')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='revenuesnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'application'), name='finance_snapshot_date_app'),
+        ),
+        migrations.AddConstraint(
+            model_name='revenuesnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('application__isnull', True)), fields=('date',), name='finance_snapshot_date_total'),
+        ),
+    ]
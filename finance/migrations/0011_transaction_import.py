@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_revenuesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Hash de Importación'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='source_account',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Cuenta de Origen'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0035_subscription_activated_churned'),
+        ('finance', '0011_transaction_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='payment_event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='forgeapp.paymentevent', verbose_name='Evento de Pago Conciliado'),
+        ),
+        migrations.CreateModel(
+            name='ReconciliationMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField(verbose_name='Puntaje')),
+                ('reasons', models.CharField(blank=True, max_length=200, verbose_name='Criterios')),
+                ('status', models.CharField(choices=[('pending', 'Por Revisar'), ('accepted', 'Aceptada'), ('rejected', 'Rechazada')], default='pending', max_length=20, verbose_name='Estado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Revisión')),
+                ('payment_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_matches', to='forgeapp.paymentevent', verbose_name='Evento de Pago')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_matches', to='finance.transaction', verbose_name='Transacción')),
+            ],
+            options={
+                'verbose_name': 'Coincidencia de Conciliación',
+                'verbose_name_plural': 'Coincidencias de Conciliación',
+                'ordering': ['-created_at', '-score'],
+                'indexes': [models.Index(fields=['status', 'transaction'], name='finance_recon_status_tx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reconciliationmatch',
+            constraint=models.UniqueConstraint(fields=('transaction', 'payment_event'), name='finance_recon_tx_event'),
+        ),
+    ]
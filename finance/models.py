@@ -112,6 +112,20 @@ class Transaction(models.Model):
         verbose_name='Pago Relacionado'
     )
     notes = models.TextField('Notas', blank=True)
+    # Movimientos importados desde cartolas bancarias (finance/bank_import.py)
+    source_account = models.CharField('Cuenta de Origen', max_length=50, blank=True)
+    import_hash = models.CharField(
+        'Hash de Importación', max_length=64, unique=True, null=True, blank=True, editable=False
+    )
+    # Evento de pago que este ingreso salda, asignado por la conciliación (finance/reconciliation.py)
+    payment_event = models.ForeignKey(
+        'forgeapp.PaymentEvent',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions',
+        verbose_name='Evento de Pago Conciliado'
+    )
     created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
     updated_at = models.DateTimeField('Última Actualización', auto_now=True)
 
@@ -119,6 +133,237 @@ class Transaction(models.Model):
         verbose_name = 'Transacción'
         verbose_name_plural = 'Transacciones'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['type', 'date'], name='finance_tx_type_date'),
+            models.Index(fields=['date'], name='finance_tx_date'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} - {self.description[:50]}"
+
+class SchedulerLock(models.Model):
+    """
+    Candado en base de datos para elegir un único proceso líder del scheduler.
+    El líder renueva heartbeat_at periódicamente; si deja de hacerlo por más del TTL
+    configurado, otro proceso puede tomar el candado.
+    """
+    name = models.CharField('Nombre', max_length=100, unique=True)
+    owner = models.CharField('Propietario', max_length=200, blank=True)
+    acquired_at = models.DateTimeField('Fecha de Adquisición', null=True, blank=True)
+    heartbeat_at = models.DateTimeField('Último Heartbeat', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Candado de Scheduler'
+        verbose_name_plural = 'Candados de Scheduler'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.owner or 'libre'})"
+
+class JobRun(models.Model):
+    """Registro de cada ejecución de una tarea programada o comando de gestión"""
+    STATUS_CHOICES = [
+        ('running', 'En Ejecución'),
+        ('success', 'Exitosa'),
+        ('error', 'Con Error'),
+    ]
+
+    job_name = models.CharField('Tarea', max_length=100)
+    status = models.CharField('Estado', max_length=20, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField('Inicio')
+    finished_at = models.DateTimeField('Fin', null=True, blank=True)
+    duration_ms = models.PositiveIntegerField('Duración (ms)', null=True, blank=True)
+    rows_scanned = models.PositiveIntegerField('Filas Revisadas', default=0)
+    rows_updated = models.PositiveIntegerField('Filas Modificadas', default=0)
+    error = models.TextField('Error', blank=True)
+    host = models.CharField('Host', max_length=200, blank=True)
+    pid = models.PositiveIntegerField('PID', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Ejecución de Tarea'
+        verbose_name_plural = 'Ejecuciones de Tareas'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job_name', '-started_at'], name='finance_jobrun_name_started'),
+            models.Index(fields=['started_at'], name='finance_jobrun_started'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_name} - {self.started_at:%d/%m/%Y %H:%M} ({self.get_status_display()})"
+
+class ReceivableAging(models.Model):
+    """
+    Resumen de cuentas por cobrar por cliente y aplicación, separado por antigüedad de la deuda.
+    Cada monto es la suma de los PaymentEvent pendientes cuya fecha esperada cae en el tramo,
+    calculado respecto de as_of. Se mantiene incrementalmente (ver finance/aging.py) y la tarea
+    diaria desplaza los montos entre tramos al avanzar la fecha.
+    """
+    BUCKET_FIELDS = ['current', 'days_0_30', 'days_31_60', 'days_61_90', 'days_over_90']
+
+    client = models.ForeignKey(
+        'forgeapp.Client',
+        on_delete=models.CASCADE,
+        related_name='receivable_aging',
+        verbose_name='Cliente'
+    )
+    application = models.ForeignKey(
+        'forgeapp.Application',
+        on_delete=models.CASCADE,
+        related_name='receivable_aging',
+        verbose_name='Aplicación'
+    )
+    current = models.DecimalField('Por Vencer', max_digits=12, decimal_places=2, default=0)
+    days_0_30 = models.DecimalField('0-30 días', max_digits=12, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField('31-60 días', max_digits=12, decimal_places=2, default=0)
+    days_61_90 = models.DecimalField('61-90 días', max_digits=12, decimal_places=2, default=0)
+    days_over_90 = models.DecimalField('Más de 90 días', max_digits=12, decimal_places=2, default=0)
+    pending_count = models.IntegerField('Eventos Pendientes', default=0)
+    as_of = models.DateField('Calculado al')
+    updated_at = models.DateTimeField('Última Actualización', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Antigüedad de Cuentas por Cobrar'
+        verbose_name_plural = 'Antigüedad de Cuentas por Cobrar'
+        ordering = ['client', 'application']
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'application'], name='finance_aging_client_app'),
+        ]
+
+    def __str__(self):
+        return f"{self.client} - {self.application} ({self.as_of:%d/%m/%Y})"
+
+    @property
+    def overdue(self):
+        """Monto vencido (todos los tramos excepto Por Vencer)"""
+        return self.days_0_30 + self.days_31_60 + self.days_61_90 + self.days_over_90
+
+    @property
+    def total(self):
+        return self.current + self.overdue
+
+class RevenueRollup(models.Model):
+    """
+    Ingresos pagados agregados por mes, aplicación, cliente y tipo de pago.
+    Cada fila suma los PaymentEvent pagados cuya fecha de pago cae en el mes. Se mantiene
+    incrementalmente (ver finance/rollup.py) para que los reportes lean unos cientos de filas
+    en lugar de recorrer todo el historial de eventos.
+    """
+    year = models.PositiveSmallIntegerField('Año')
+    month = models.PositiveSmallIntegerField('Mes')
+    application = models.ForeignKey(
+        'forgeapp.Application',
+        on_delete=models.CASCADE,
+        related_name='revenue_rollup',
+        verbose_name='Aplicación'
+    )
+    client = models.ForeignKey(
+        'forgeapp.Client',
+        on_delete=models.CASCADE,
+        related_name='revenue_rollup',
+        verbose_name='Cliente'
+    )
+    payment_type = models.CharField('Tipo de Pago', max_length=20)
+    amount = models.DecimalField('Monto Pagado', max_digits=12, decimal_places=2, default=0)
+    count = models.IntegerField('Pagos', default=0)
+    updated_at = models.DateTimeField('Última Actualización', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Resumen Mensual de Ingresos'
+        verbose_name_plural = 'Resúmenes Mensuales de Ingresos'
+        ordering = ['-year', '-month', 'application', 'client']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month', 'application', 'client', 'payment_type'],
+                name='finance_rollup_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:02d}/{self.year} - {self.application} - {self.client}"
+
+class RevenueSnapshot(models.Model):
+    """
+    Fotografía diaria de MRR y churn. Hay una fila por aplicación y día, más una fila de
+    totales (application vacío) porque los clientes activos no se pueden sumar entre
+    aplicaciones. La registra la tarea diaria (ver finance/snapshots.py) y los gráficos y
+    comparaciones entre períodos la leen con un rango sobre la fecha.
+    """
+    date = models.DateField('Fecha')
+    application = models.ForeignKey(
+        'forgeapp.Application',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='revenue_snapshots',
+        verbose_name='Aplicación'
+    )
+    mrr = models.DecimalField('MRR', max_digits=12, decimal_places=2, default=0)
+    arr = models.DecimalField('ARR', max_digits=14, decimal_places=2, default=0)
+    active_subscriptions = models.IntegerField('Suscripciones Activas', default=0)
+    new_subscriptions = models.IntegerField('Suscripciones Nuevas', default=0)
+    churned_subscriptions = models.IntegerField('Suscripciones Perdidas', default=0)
+    active_clients = models.IntegerField('Clientes Activos', default=0)
+    created_at = models.DateTimeField('Fecha de Registro', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Fotografía de Ingresos'
+        verbose_name_plural = 'Fotografías de Ingresos'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'application'], name='finance_snapshot_date_app'),
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(application__isnull=True),
+                name='finance_snapshot_date_total'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['application', 'date'], name='finance_snapshot_app_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date:%d/%m/%Y} - {self.application or 'Total'}"
+
+class ReconciliationMatch(models.Model):
+    """
+    Coincidencia dudosa entre un ingreso y un evento de pago pendiente, propuesta por la
+    conciliación automática (finance/reconciliation.py) para revisión manual. Las
+    coincidencias de alta confianza se aplican directamente y no quedan registradas aquí.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Por Revisar'),
+        ('accepted', 'Aceptada'),
+        ('rejected', 'Rechazada'),
+    ]
+
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='reconciliation_matches',
+        verbose_name='Transacción'
+    )
+    payment_event = models.ForeignKey(
+        'forgeapp.PaymentEvent',
+        on_delete=models.CASCADE,
+        related_name='reconciliation_matches',
+        verbose_name='Evento de Pago'
+    )
+    score = models.PositiveSmallIntegerField('Puntaje')
+    reasons = models.CharField('Criterios', max_length=200, blank=True)
+    status = models.CharField('Estado', max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    resolved_at = models.DateTimeField('Fecha de Revisión', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Coincidencia de Conciliación'
+        verbose_name_plural = 'Coincidencias de Conciliación'
+        ordering = ['-created_at', '-score']
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'payment_event'], name='finance_recon_tx_event'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'transaction'], name='finance_recon_status_tx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction} -> {self.payment_event_id} ({self.score})"
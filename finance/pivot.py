@@ -0,0 +1,93 @@
+"""
+Resumen de transacciones por categoría y mes.
+
+Una sola consulta agrupa las transacciones del año por tipo, categoría y mes; la tabla
+dinámica (filas = categorías, columnas = meses) se arma en memoria.
+"""
+from datetime import date
+from decimal import Decimal
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth
+from finance.models import Transaction
+
+MONTHS = range(1, 13)
+
+def month_bounds(year, month):
+    """Primer y último día del mes, para los enlaces de detalle"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, date.fromordinal(end.toordinal() - 1)
+
+def transaction_pivot(year):
+    """
+    Tabla dinámica de transacciones del año.
+
+    Retorna un dict con:
+        sections: por tipo (ingresos, egresos) {'type', 'label', 'rows', 'totals', 'total'},
+                  donde cada fila es {'category', 'cells', 'total', 'count'}; cells y totals
+                  tienen una celda por mes {'month', 'amount', 'start', 'end'}, con el rango
+                  de fechas para los enlaces de detalle
+        monthly_data: por mes {'month', 'income', 'expenses', 'balance'}
+        total_income, total_expenses, total_balance
+    """
+    groups = Transaction.objects.filter(date__year=year).annotate(
+        month=ExtractMonth('date')
+    ).values('type', 'category', 'month').annotate(
+        total=Sum('amount'),
+        count=Count('pk')
+    ).order_by()
+
+    rows = {}
+    for group in groups:
+        row = rows.setdefault((group['type'], group['category']), {
+            'category': group['category'],
+            'cells': [Decimal('0')] * 12,
+            'total': Decimal('0'),
+            'count': 0,
+        })
+        row['cells'][group['month'] - 1] += group['total']
+        row['total'] += group['total']
+        row['count'] += group['count']
+
+    bounds = [month_bounds(year, month) for month in MONTHS]
+
+    def cells(amounts):
+        return [
+            {'month': index + 1, 'amount': amount, 'start': start, 'end': end}
+            for index, (amount, (start, end)) in enumerate(zip(amounts, bounds))
+        ]
+
+    sections = []
+    for type_value, label in Transaction.TYPE_CHOICES:
+        section_rows = sorted(
+            (row for (row_type, _), row in rows.items() if row_type == type_value),
+            key=lambda row: row['total'],
+            reverse=True
+        )
+        totals = [sum((row['cells'][index] for row in section_rows), Decimal('0')) for index in range(12)]
+        sections.append({
+            'type': type_value,
+            'label': label,
+            'rows': [dict(row, cells=cells(row['cells'])) for row in section_rows],
+            'totals': cells(totals),
+            'total': sum(totals, Decimal('0')),
+        })
+
+    income, expenses = (
+        [cell['amount'] for cell in section['totals']] for section in sections
+    )
+    return {
+        'sections': sections,
+        'monthly_data': [
+            {
+                'month': month,
+                'income': income[month - 1],
+                'expenses': expenses[month - 1],
+                'balance': income[month - 1] - expenses[month - 1],
+            }
+            for month in MONTHS
+        ],
+        'total_income': sections[0]['total'],
+        'total_expenses': sections[1]['total'],
+        'total_balance': sections[0]['total'] - sections[1]['total'],
+    }
@@ -0,0 +1,320 @@
+"""
+Conciliación de ingresos (Transaction) con eventos de pago pendientes (PaymentEvent).
+
+Los eventos pendientes del rango de fechas se cargan una sola vez y se indexan en memoria
+por (monto, semana de la fecha esperada), de modo que los candidatos de cada ingreso se
+obtienen con unas pocas búsquedas en un dict en lugar de una consulta por par. Cada
+candidato se puntúa según:
+
+- el monto exacto (requisito para ser candidato),
+- la cercanía entre la fecha del ingreso y la fecha esperada (dentro de window_days),
+- el ID de referencia de la suscripción (ME000001) en la descripción del ingreso,
+- el nombre del cliente en la descripción.
+
+Las coincidencias de alta confianza (con el ID de referencia en la descripción, puntaje alto
+y sin un segundo candidato cercano) se marcan como pagadas en bloque con forgeapp.services.bulk_mark_paid y el ingreso queda
+enlazado al evento (Transaction.payment_event). Las dudosas se registran como
+ReconciliationMatch pendientes para revisión manual.
+
+Volver a ejecutar la conciliación omite los ingresos ya conciliados o con coincidencias
+por revisar, y no vuelve a proponer los pares rechazados.
+
+El monto, la fecha y el nombre del cliente por sí solos no bastan para marcar un pago: un
+cliente con dos suscripciones del mismo precio, o un reembolso o pago no relacionado del
+mismo cliente, también coinciden en esos criterios. Esos pares siempre van a revisión.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from core import cache
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger('finance')
+
+DATE_WINDOW_DAYS = 15
+BUCKET_DAYS = 7
+
+AMOUNT_SCORE = 40
+DATE_SCORE = 20
+REFERENCE_SCORE = 40
+CLIENT_SCORE = 25
+
+REFERENCE_REASON = 'referencia'
+
+# Puntaje mínimo para marcar el pago automáticamente (además de la referencia), ventaja
+# mínima sobre el segundo candidato, y puntaje mínimo para proponer el par en la cola de
+# revisión
+AUTO_MATCH_SCORE = 80
+AUTO_MATCH_MARGIN = 20
+REVIEW_SCORE = 50
+REVIEW_CANDIDATES = 3
+
+CENT = Decimal('0.01')
+
+def _normalize(text):
+    """Texto en minúsculas, sin tildes y con solo letras y dígitos separados por espacios"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+def _amount_key(amount):
+    return Decimal(amount).quantize(CENT)
+
+def _bucket(day):
+    return day.toordinal() // BUCKET_DAYS
+
+class EventIndex:
+    """Eventos pendientes agrupados por (monto, semana de la fecha esperada)"""
+
+    def __init__(self, events, window_days=DATE_WINDOW_DAYS):
+        self.window_days = window_days
+        self._buckets = {}
+        for event in events:
+            self._buckets.setdefault((_amount_key(event['amount']), _bucket(event['expected_date'])), []).append(event)
+
+    def candidates(self, amount, day):
+        """Eventos del mismo monto cuya fecha esperada está a window_days días o menos de day"""
+        amount = _amount_key(amount)
+        first = _bucket(day - timedelta(days=self.window_days))
+        last = _bucket(day + timedelta(days=self.window_days))
+        for bucket in range(first, last + 1):
+            for event in self._buckets.get((amount, bucket), ()):
+                if abs((event['expected_date'] - day).days) <= self.window_days:
+                    yield event
+
+def _name_tokens(name):
+    return [token for token in _normalize(name).split() if len(token) >= 3]
+
+def score_candidate(row, event, window_days=DATE_WINDOW_DAYS):
+    """(puntaje, criterios) de un par ingreso/evento con el mismo monto"""
+    score = AMOUNT_SCORE
+    reasons = ['monto']
+
+    days = abs((event['expected_date'] - row['date']).days)
+    score += round(DATE_SCORE * (1 - days / (window_days + 1)))
+    reasons.append('mismo día' if not days else f'{days} días')
+
+    description = row['description']
+    reference = _normalize(event['reference_id']).replace(' ', '')
+    if reference and reference in description.replace(' ', ''):
+        score += REFERENCE_SCORE
+        reasons.append(REFERENCE_REASON)
+
+    tokens = event['name_tokens']
+    if tokens:
+        words = set(description.split())
+        found = sum(1 for token in tokens if token in words)
+        if found == len(tokens):
+            score += CLIENT_SCORE
+            reasons.append('cliente')
+        elif found * 2 >= len(tokens):
+            score += CLIENT_SCORE // 2
+            reasons.append('cliente parcial')
+
+    return score, ', '.join(reasons)
+
+def is_automatic(candidates):
+    """
+    Si el mejor candidato (lista ordenada por puntaje) se puede marcar sin revisión: debe
+    traer la referencia de la suscripción, superar AUTO_MATCH_SCORE y aventajar al segundo
+    candidato por AUTO_MATCH_MARGIN
+    """
+    _, score, reasons = candidates[0]
+    return (
+        REFERENCE_REASON in reasons.split(', ')
+        and score >= AUTO_MATCH_SCORE
+        and (len(candidates) == 1 or score - candidates[1][1] >= AUTO_MATCH_MARGIN)
+    )
+
+def _pending_events(first_day, last_day):
+    from forgeapp.models import PaymentEvent
+
+    rows = PaymentEvent.objects.filter(
+        status='pending', expected_date__range=(first_day, last_day)
+    ).values('pk', 'expected_date', 'amount', 'subscription__reference_id', 'subscription__client__name')
+
+    return [
+        {
+            'pk': row['pk'],
+            'expected_date': row['expected_date'],
+            'amount': row['amount'],
+            'reference_id': row['subscription__reference_id'],
+            'name_tokens': _name_tokens(row['subscription__client__name']),
+        }
+        for row in rows
+    ]
+
+def unreconciled_income(start_date=None, end_date=None):
+    """Ingresos sin evento de pago conciliado ni coincidencias pendientes de revisión"""
+    from finance.models import ReconciliationMatch, Transaction
+
+    transactions = Transaction.objects.filter(type='income', payment_event__isnull=True).exclude(
+        pk__in=ReconciliationMatch.objects.filter(status='pending').values('transaction')
+    )
+    if start_date:
+        transactions = transactions.filter(date__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(date__lte=end_date)
+    return transactions
+
+def find_matches(transactions, window_days=DATE_WINDOW_DAYS):
+    """
+    Clasifica los ingresos de transactions. Retorna (automáticos, revisión) donde
+    automáticos es una lista de (transacción, evento, puntaje, criterios) y revisión una
+    lista de (transacción, [(evento, puntaje, criterios), ...]). Usa tres consultas: los
+    ingresos, los pares ya rechazados y los eventos pendientes del rango.
+    """
+    from finance.models import ReconciliationMatch
+
+    rows = [
+        {'pk': pk, 'date': day, 'amount': amount, 'description': _normalize(description)}
+        for pk, day, amount, description in transactions.values_list('pk', 'date', 'amount', 'description')
+    ]
+    if not rows:
+        return [], []
+
+    rejected = set(
+        ReconciliationMatch.objects.filter(status='rejected', transaction__in=transactions)
+        .values_list('transaction_id', 'payment_event_id')
+    )
+
+    days = [row['date'] for row in rows]
+    window = timedelta(days=window_days)
+    index = EventIndex(_pending_events(min(days) - window, max(days) + window), window_days)
+
+    scored = []
+    for row in rows:
+        candidates = sorted(
+            (
+                (event, *score_candidate(row, event, window_days))
+                for event in index.candidates(row['amount'], row['date'])
+                if (row['pk'], event['pk']) not in rejected
+            ),
+            key=lambda candidate: (-candidate[1], candidate[0]['expected_date'])
+        )
+        candidates = [candidate for candidate in candidates if candidate[1] >= REVIEW_SCORE]
+        if candidates:
+            scored.append((row, candidates))
+
+    # Los pares más seguros se asignan primero; un evento se asigna a un solo ingreso
+    automatic = []
+    claimed = set()
+    confident = [(row, candidates) for row, candidates in scored if is_automatic(candidates)]
+    confident.sort(key=lambda item: -item[1][0][1])
+    for row, candidates in confident:
+        event, score, reasons = candidates[0]
+        if event['pk'] not in claimed:
+            claimed.add(event['pk'])
+            automatic.append((row, event, score, reasons))
+
+    matched = {row['pk'] for row, _, _, _ in automatic}
+    review = []
+    for row, candidates in scored:
+        if row['pk'] in matched:
+            continue
+        candidates = [candidate for candidate in candidates if candidate[0]['pk'] not in claimed]
+        if candidates:
+            review.append((row, candidates[:REVIEW_CANDIDATES]))
+
+    return automatic, review
+
+def reconcile(start_date=None, end_date=None, window_days=DATE_WINDOW_DAYS, dry_run=False):
+    """
+    Concilia los ingresos sin conciliar del rango [start_date, end_date].
+
+    Los pares automáticos se marcan como pagados (con la fecha del ingreso como fecha de
+    pago) y los dudosos quedan en la cola de revisión. Con dry_run=True solo se calcula
+    el resultado. Retorna {'transactions', 'matched', 'review', 'unmatched'}.
+    """
+    from forgeapp.services import bulk_mark_paid
+    from finance.models import ReconciliationMatch, Transaction
+
+    transactions = unreconciled_income(start_date, end_date)
+    total = transactions.count()
+    automatic, review = find_matches(transactions, window_days)
+
+    if dry_run:
+        matched = len(automatic)
+    else:
+        with transaction.atomic():
+            # Solo se enlazan los eventos que seguían pendientes al momento de marcarlos
+            marked = set(bulk_mark_paid([(event['pk'], row['date']) for row, event, _, _ in automatic]))
+            # bulk_update no aplica auto_now: updated_at se asigna igual que en accept_match
+            now = timezone.now()
+            Transaction.objects.bulk_update(
+                [
+                    Transaction(pk=row['pk'], payment_event_id=event['pk'], updated_at=now)
+                    for row, event, _, _ in automatic if event['pk'] in marked
+                ],
+                ['payment_event', 'updated_at'],
+                batch_size=500
+            )
+            ReconciliationMatch.objects.bulk_create(
+                [
+                    ReconciliationMatch(
+                        transaction_id=row['pk'], payment_event_id=event['pk'], score=score, reasons=reasons
+                    )
+                    for row, candidates in review
+                    for event, score, reasons in candidates
+                ],
+                batch_size=500,
+                ignore_conflicts=True
+            )
+        matched = len(marked)
+        if marked:
+            # bulk_update no envía post_save
+            cache.bump(cache.TRANSACTIONS)
+        logger.info(
+            f"Conciliación {start_date or '-'} a {end_date or '-'}: {matched} ingresos conciliados, "
+            f"{len(review)} por revisar de {total}"
+        )
+
+    return {
+        'transactions': total,
+        'matched': matched,
+        'review': len(review),
+        'unmatched': total - matched - len(review),
+    }
+
+def accept_match(match):
+    """
+    Acepta una coincidencia de la cola de revisión: marca el evento como pagado con la
+    fecha del ingreso y los enlaza. Las demás coincidencias pendientes del mismo ingreso o
+    del mismo evento se rechazan. Retorna False si el ingreso ya estaba conciliado o el
+    evento ya no estaba pendiente.
+    """
+    from forgeapp.services import bulk_mark_paid
+    from finance.models import ReconciliationMatch, Transaction
+
+    with transaction.atomic():
+        match = ReconciliationMatch.objects.select_for_update().select_related('transaction').get(pk=match.pk)
+        if match.status != 'pending' or match.transaction.payment_event_id:
+            return False
+        if not bulk_mark_paid([(match.payment_event_id, match.transaction.date)]):
+            return False
+
+        now = timezone.now()
+        Transaction.objects.filter(pk=match.transaction_id).update(payment_event=match.payment_event_id, updated_at=now)
+        ReconciliationMatch.objects.filter(pk=match.pk).update(status='accepted', resolved_at=now)
+        ReconciliationMatch.objects.filter(status='pending', transaction=match.transaction_id).update(
+            status='rejected', resolved_at=now
+        )
+        ReconciliationMatch.objects.filter(status='pending', payment_event=match.payment_event_id).update(
+            status='rejected', resolved_at=now
+        )
+
+    cache.bump(cache.TRANSACTIONS)
+    logger.info(f"Coincidencia {match.pk} aceptada: ingreso {match.transaction_id} concilia el evento {match.payment_event_id}")
+    return True
+
+def reject_match(match):
+    """Rechaza una coincidencia de la cola de revisión (no se vuelve a proponer)"""
+    from finance.models import ReconciliationMatch
+
+    return bool(
+        ReconciliationMatch.objects.filter(pk=match.pk, status='pending').update(
+            status='rejected', resolved_at=timezone.now()
+        )
+    )
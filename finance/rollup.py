@@ -0,0 +1,232 @@
+"""
+Resumen mensual de ingresos pagados (RevenueRollup).
+
+Cada fila acumula el monto y la cantidad de PaymentEvent pagados de un mes para una
+combinación aplicación/cliente/tipo de pago (tomados de la suscripción del evento).
+La tabla se mantiene así:
+
+- Los signals de PaymentEvent (finance/signals.py) aplican la diferencia de cada evento
+  que pasa a pagado, se modifica o se elimina (apply_paid).
+- Las operaciones masivas de forgeapp.services envían payment_events_changed y se
+  recalculan solo las combinaciones afectadas (rebuild_rollup).
+- Si cambia el cliente, la aplicación o el tipo de pago de una suscripción, el signal de
+  Subscription recalcula su combinación anterior y la nueva (rebuild_rollup con keys).
+- El comando rebuild_revenue_rollup recalcula la tabla completa.
+"""
+from decimal import Decimal
+from django.db import transaction
+from core import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+def paid_contribution(values):
+    """
+    Retorna (subscription_id, paid_date, amount) si los valores corresponden a un evento
+    pagado que suma al resumen, o None si no aporta (pendiente o sin fecha de pago).
+    """
+    if values.get('status') != 'paid':
+        return None
+    contribution = (values.get('subscription_id'), values.get('paid_date'), values.get('amount'))
+    if None in contribution:
+        return None
+    return contribution
+
+def apply_paid(subscription_id, paid_date, amount, sign):
+    """
+    Suma (sign=1) o resta (sign=-1) un evento pagado del resumen de su mes.
+    Al restar no se crean filas: si el resumen no existe no hay nada que descontar.
+    """
+    from finance.models import RevenueRollup
+    from forgeapp.models import Subscription
+
+    key = Subscription.objects.filter(pk=subscription_id).values(
+        'application_id', 'client_id', 'payment_type'
+    ).first()
+    if key is None:
+        return
+
+    key.update(year=paid_date.year, month=paid_date.month)
+    if sign > 0:
+        row, _ = RevenueRollup.objects.get_or_create(**key)
+        rows = RevenueRollup.objects.filter(pk=row.pk)
+    else:
+        rows = RevenueRollup.objects.filter(**key)
+
+    rows.update(amount=F('amount') + amount * sign, count=F('count') + sign)
+    if sign < 0:
+        rows.filter(count__lte=0).delete()
+
+def rebuild_rollup(subscription_ids=None, keys=None):
+    """
+    Recalcula desde PaymentEvent el resumen de las combinaciones aplicación/cliente/tipo de
+    pago de subscription_ids (o de todas si ambos son None) con una única consulta agrupada.
+    keys agrega combinaciones (application_id, client_id, payment_type) que ya no
+    corresponden a ninguna de esas suscripciones, como la anterior de una suscripción
+    modificada. Retorna la cantidad de filas escritas.
+    """
+    from finance.models import RevenueRollup
+    from forgeapp.models import PaymentEvent, Subscription
+
+    events = PaymentEvent.objects.filter(status='paid', paid_date__isnull=False)
+    rows = RevenueRollup.objects.all()
+
+    if subscription_ids is not None or keys is not None:
+        keys = set(keys or ()) | set(
+            Subscription.objects.filter(pk__in=list(subscription_ids or ()))
+            .values_list('application_id', 'client_id', 'payment_type').distinct()
+        )
+        if not keys:
+            return 0
+        application_ids = {application_id for application_id, _, _ in keys}
+        client_ids = {client_id for _, client_id, _ in keys}
+        events = events.filter(
+            subscription__application_id__in=application_ids,
+            subscription__client_id__in=client_ids
+        )
+        rows = rows.filter(application_id__in=application_ids, client_id__in=client_ids)
+
+    totals = events.annotate(
+        year=ExtractYear('paid_date'),
+        month=ExtractMonth('paid_date')
+    ).values(
+        'year', 'month',
+        'subscription__application_id', 'subscription__client_id', 'subscription__payment_type'
+    ).annotate(
+        total=Sum('amount'),
+        paid_count=Count('pk')
+    ).order_by()
+
+    new_rows = []
+    for total in totals:
+        key = (
+            total['subscription__application_id'],
+            total['subscription__client_id'],
+            total['subscription__payment_type'],
+        )
+        if keys is not None and key not in keys:
+            continue
+        new_rows.append(RevenueRollup(
+            year=total['year'],
+            month=total['month'],
+            application_id=key[0],
+            client_id=key[1],
+            payment_type=key[2],
+            amount=total['total'],
+            count=total['paid_count']
+        ))
+
+    with transaction.atomic():
+        if keys is None:
+            rows.delete()
+        else:
+            stale = [
+                pk for pk, *key in rows.values_list('pk', 'application_id', 'client_id', 'payment_type')
+                if tuple(key) in keys
+            ]
+            RevenueRollup.objects.filter(pk__in=stale).delete()
+        RevenueRollup.objects.bulk_create(new_rows)
+
+    cache.bump(cache.PAYMENT_EVENTS)
+    return len(new_rows)
+
+def monthly_totals(year):
+    """Total pagado por mes del año (dict mes -> monto) en una sola consulta"""
+    from finance.models import RevenueRollup
+
+    return dict(
+        RevenueRollup.objects.filter(year=year)
+        .values('month').annotate(total=Sum('amount'))
+        .values_list('month', 'total').order_by()
+    )
+
+def totals_by_month(start, end):
+    """Total pagado por (año, mes) entre los meses de las fechas start y end, ambos incluidos"""
+    from finance.models import RevenueRollup
+
+    first = (start.year, start.month)
+    last = (end.year, end.month)
+    totals = (
+        RevenueRollup.objects.filter(year__gte=start.year, year__lte=end.year)
+        .values('year', 'month').annotate(total=Sum('amount'))
+        .values_list('year', 'month', 'total').order_by()
+    )
+    return {
+        (year, month): total
+        for year, month, total in totals
+        if first <= (year, month) <= last
+    }
+
+BREAKDOWN_FIELDS = {
+    'application': ('application_id', 'application__name'),
+    'client': ('client_id', 'client__name'),
+}
+
+def _change(current, previous):
+    """Variación porcentual respecto de previous (None si no hay base de comparación)"""
+    if not previous:
+        return None
+    return float((current - previous) / previous * 100)
+
+def revenue_comparison(years, breakdown=None):
+    """
+    Ingresos pagados por mes de varios años lado a lado, con variación respecto del año
+    anterior seleccionado, en una sola consulta agrupada sobre el resumen mensual.
+    breakdown ('application' o 'client') agrega el detalle por aplicación o cliente.
+
+    Retorna un dict con:
+        years: años ordenados
+        columns: por año {'year', 'total', 'change'}
+        months: 12 filas {'month', 'cells'}, con una celda {'total', 'change'} por año
+        breakdown: filas {'id', 'name', 'totals', 'change'} ordenadas por el último año
+    """
+    from finance.models import RevenueRollup
+
+    years = sorted(set(years))
+    index = {year: position for position, year in enumerate(years)}
+    group_fields = ['year', 'month']
+    if breakdown in BREAKDOWN_FIELDS:
+        group_fields += BREAKDOWN_FIELDS[breakdown]
+    else:
+        breakdown = None
+
+    groups = RevenueRollup.objects.filter(year__in=years).values(*group_fields).annotate(
+        total=Sum('amount')
+    ).order_by()
+
+    zero = [Decimal('0')] * len(years)
+    monthly = {month: list(zero) for month in range(1, 13)}
+    items = {}
+    for group in groups:
+        position = index[group['year']]
+        monthly[group['month']][position] += group['total']
+        if breakdown:
+            key_field, name_field = BREAKDOWN_FIELDS[breakdown]
+            item = items.setdefault(group[key_field], {
+                'id': group[key_field],
+                'name': group[name_field],
+                'totals': list(zero),
+            })
+            item['totals'][position] += group['total']
+
+    def cells(values):
+        return [
+            {'total': value, 'change': _change(value, values[i - 1]) if i else None}
+            for i, value in enumerate(values)
+        ]
+
+    totals = [sum(monthly[month][i] for month in monthly) for i in range(len(years))]
+    for item in items.values():
+        item['change'] = _change(item['totals'][-1], item['totals'][-2]) if len(years) > 1 else None
+
+    return {
+        'years': years,
+        'columns': [dict(cell, year=year) for year, cell in zip(years, cells(totals))],
+        'months': [{'month': month, 'cells': cells(values)} for month, values in monthly.items()],
+        'breakdown': sorted(items.values(), key=lambda item: item['totals'][-1], reverse=True),
+    }
+
+def rollup_years():
+    """Años con ingresos registrados en el resumen mensual"""
+    from finance.models import RevenueRollup
+
+    return list(RevenueRollup.objects.values_list('year', flat=True).distinct().order_by('year'))
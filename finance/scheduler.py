@@ -1,63 +1,115 @@
+"""
+Tareas programadas de finance.
+
+El scheduler no se inicia dentro de los procesos web: se ejecuta en un proceso dedicado
+con `python manage.py run_scheduler`, que toma un candado en base de datos (SchedulerLock)
+para que las tareas corran una sola vez aunque haya varios nodos.
+"""
 from apscheduler.schedulers.background import BackgroundScheduler
 from django_apscheduler.jobstores import DjangoJobStore
 from django.utils import timezone
-from django.core.cache import cache
-from django.db import transaction
-from django.core.management import call_command
+from django.db import IntegrityError
+from django.db.models import Q, F, Case, When, Value
+from datetime import timedelta
+from finance.telemetry import track_job, prune_job_runs
 import logging
 
 logger = logging.getLogger(__name__)
 
+LOCK_NAME = 'finance_scheduler'
+
 def check_expired_subscriptions():
     """
     Verifica y actualiza suscripciones vencidas.
     Una suscripción se marca como EXPIRED solo si pasaron más de 15 días desde su fecha de renovación esperada.
     Requiere que la suscripción tenga start_date (no sea PENDING).
+    La actualización se hace en bloque mediante forgeapp.services.expire_subscriptions.
     """
     try:
-        from forgeapp.models import Subscription
-        from datetime import date
-
-        with transaction.atomic():
-            # Obtener todas las suscripciones activas con fecha de inicio
-            active_subscriptions = Subscription.objects.select_for_update().filter(
-                status='active',
-                start_date__isnull=False  # Solo suscripciones con fecha de inicio
-            )
-
-            # Verificar cuáles han expirado (pasó el período de gracia de 15 días)
-            count = 0
-            today = date.today()
-
-            for subscription in active_subscriptions:
-                # Verificar si pasó el período de gracia
-                if subscription.grace_period_end and today > subscription.grace_period_end:
-                    subscription.status = 'expired'
-                    subscription.save()
-                    count += 1
-                    logger.info(f"Suscripción {subscription.reference_id} marcada como expirada (venció el {subscription.grace_period_end})")
-
-            if count > 0:
-                logger.info(f"Se marcaron {count} suscripciones como expiradas")
+        from forgeapp.services import expire_subscriptions
+
+        with track_job('check_expired_subscriptions') as run:
+            run.rows_scanned = run.rows_updated = expire_subscriptions()
+        return run.rows_updated
 
     except Exception as e:
         logger.error(f"Error al verificar suscripciones: {e}")
+        return 0
+
+def generate_payment_events():
+    """
+    Genera en bloque los eventos de pago del ciclo de facturación.
+    Cubre las suscripciones a las que los signals no les generaron el siguiente evento
+    (por ejemplo, cambios hechos con UPDATE en bloque).
+    """
+    try:
+        from forgeapp.services import generate_payment_events as generate
+
+        with track_job('generate_payment_events') as run:
+            run.rows_scanned = run.rows_updated = generate()['created']
+        return run.rows_updated
+
+    except Exception as e:
+        logger.error(f"Error al generar eventos de pago: {e}")
+        return 0
+
+def shift_receivable_aging():
+    """Desplaza los montos de la antigüedad de cuentas por cobrar al día actual"""
+    try:
+        from finance.aging import shift_aging
+
+        with track_job('shift_receivable_aging') as run:
+            run.rows_updated = shift_aging()
+        return run.rows_updated
+
+    except Exception as e:
+        logger.error(f"Error al desplazar antigüedad de cuentas por cobrar: {e}")
+        return 0
+
+def take_revenue_snapshot():
+    """Registra la fotografía diaria de MRR y churn del día que termina"""
+    try:
+        from finance.snapshots import take_snapshot
+
+        with track_job('take_revenue_snapshot') as run:
+            run.rows_updated = take_snapshot()
+        return run.rows_updated
+
+    except Exception as e:
+        logger.error(f"Error al registrar la fotografía de ingresos: {e}")
+        return 0
 
 def daily_tasks():
     """
     Ejecuta las tareas diarias.
-    NOTA: La generación de eventos de pago se hace automáticamente mediante signals
-    cuando se activa una suscripción o se marca un evento como pagado.
+    NOTA: Los signals generan el evento de pago cuando se activa una suscripción o se marca
+    un evento como pagado; generate_payment_events completa los que falten en bloque.
     """
     try:
-        # Verificar suscripciones vencidas
-        check_expired_subscriptions()
+        with track_job('daily_tasks') as run:
+            # Fotografía de MRR y churn del día anterior, antes de modificar suscripciones
+            run.rows_updated += take_revenue_snapshot()
+
+            # Verificar suscripciones vencidas
+            run.rows_updated += check_expired_subscriptions()
+
+            # Generar eventos de pago del ciclo de facturación
+            run.rows_updated += generate_payment_events()
+
+            # Mover montos entre tramos de antigüedad de deuda
+            run.rows_updated += shift_receivable_aging()
+
+            # Limpiar registros antiguos de ejecuciones
+            prune_job_runs()
 
     except Exception as e:
         logger.error(f"Error en tareas diarias: {e}")
 
 def start_scheduler():
-    """Inicia el scheduler de forma segura"""
+    """
+    Inicia el scheduler de forma segura y lo retorna (o None si falla).
+    Solo debe llamarse desde el proceso líder (ver comando run_scheduler).
+    """
     try:
         scheduler = BackgroundScheduler()
         scheduler.add_jobstore(DjangoJobStore(), "default")
@@ -75,9 +127,43 @@ def start_scheduler():
 
         scheduler.start()
         logger.info("Scheduler iniciado exitosamente")
-        
-        # Ejecutar tareas inmediatamente al iniciar
-        daily_tasks()
+        return scheduler
         
     except Exception as e:
         logger.error(f"Error al iniciar el scheduler: {e}")
+        return None
+
+def acquire_leadership(owner, ttl, name=LOCK_NAME):
+    """
+    Intenta tomar el candado del scheduler para owner.
+    Se obtiene si está libre, si ya pertenece a owner o si su último heartbeat es más antiguo que ttl segundos.
+    Retorna True si owner quedó como líder.
+    """
+    from finance.models import SchedulerLock
+
+    now = timezone.now()
+    try:
+        SchedulerLock.objects.get_or_create(name=name)
+    except IntegrityError:
+        pass  # Otro proceso creó el candado al mismo tiempo
+
+    taken = SchedulerLock.objects.filter(name=name).filter(
+        Q(owner=owner) | Q(owner='') | Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=now - timedelta(seconds=ttl))
+    ).update(
+        owner=owner,
+        heartbeat_at=now,
+        acquired_at=Case(When(owner=owner, then=F('acquired_at')), default=Value(now))
+    )
+    return taken == 1
+
+def renew_leadership(owner, name=LOCK_NAME):
+    """Renueva el heartbeat del candado. Retorna False si owner ya no es el líder."""
+    from finance.models import SchedulerLock
+
+    return SchedulerLock.objects.filter(name=name, owner=owner).update(heartbeat_at=timezone.now()) == 1
+
+def release_leadership(owner, name=LOCK_NAME):
+    """Libera el candado si pertenece a owner, para que otro nodo lo tome sin esperar el TTL"""
+    from finance.models import SchedulerLock
+
+    SchedulerLock.objects.filter(name=name, owner=owner).update(owner='', heartbeat_at=None)
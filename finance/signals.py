@@ -1,13 +1,140 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.apps import apps
 from django.db.models import Q
 from datetime import timedelta
+from core import cache
+from forgeapp.signals import payment_events_changed, in_bulk_operation
+from finance.aging import apply_event, event_contribution, rebuild_aging
+from finance.rollup import apply_paid, paid_contribution, rebuild_rollup
 import logging
 
 logger = logging.getLogger(__name__)
 
+@receiver(post_save, sender='forgeapp.PaymentEvent')
+def update_aging_on_event_save(sender, instance, created, **kwargs):
+    """Aplica al aging la diferencia entre los valores originales y los nuevos del evento"""
+    if in_bulk_operation():
+        return
+
+    loaded_values = getattr(instance, '_loaded_values', None)
+    if not created and loaded_values is None:
+        # Instancia sin valores originales (no se cargó desde la BD): recalcular su par
+        rebuild_aging([instance.subscription_id])
+        return
+
+    before = None if created else event_contribution(loaded_values)
+    after = event_contribution(instance.tracked_values())
+    if before == after:
+        return
+
+    if before:
+        apply_event(*before, sign=-1)
+    if after:
+        apply_event(*after, sign=1)
+
+@receiver(post_delete, sender='forgeapp.PaymentEvent')
+def update_aging_on_event_delete(sender, instance, **kwargs):
+    """Descuenta del aging un evento pendiente eliminado"""
+    if in_bulk_operation():
+        return
+
+    contribution = event_contribution(instance.tracked_values())
+    if contribution:
+        apply_event(*contribution, sign=-1)
+
+@receiver(payment_events_changed)
+def rebuild_aging_on_bulk_change(sender, subscription_ids, statuses=None, **kwargs):
+    """Recalcula por lote el aging de las suscripciones modificadas en bloque"""
+    if statuses is None or 'pending' in statuses:
+        rebuild_aging(subscription_ids)
+
+@receiver(post_save, sender='forgeapp.PaymentEvent')
+def update_rollup_on_event_save(sender, instance, created, **kwargs):
+    """Aplica al resumen de ingresos la diferencia entre los valores originales y los nuevos del evento"""
+    if in_bulk_operation():
+        return
+
+    loaded_values = getattr(instance, '_loaded_values', None)
+    if not created and loaded_values is None:
+        # Instancia sin valores originales (no se cargó desde la BD): recalcular su combinación
+        rebuild_rollup([instance.subscription_id])
+        return
+
+    before = None if created else paid_contribution(loaded_values)
+    after = paid_contribution(instance.tracked_values())
+    if before == after:
+        return
+
+    if before:
+        apply_paid(*before, sign=-1)
+    if after:
+        apply_paid(*after, sign=1)
+
+@receiver(post_delete, sender='forgeapp.PaymentEvent')
+def update_rollup_on_event_delete(sender, instance, **kwargs):
+    """Descuenta del resumen de ingresos un evento pagado eliminado"""
+    if in_bulk_operation():
+        return
+
+    contribution = paid_contribution(instance.tracked_values())
+    if contribution:
+        apply_paid(*contribution, sign=-1)
+
+@receiver(payment_events_changed)
+def rebuild_rollup_on_bulk_change(sender, subscription_ids, statuses=None, **kwargs):
+    """Recalcula por lote el resumen de ingresos cuando una operación masiva tocó eventos pagados"""
+    if statuses is None or 'paid' in statuses:
+        rebuild_rollup(subscription_ids)
+
+def _changed_subscription_values(instance, created):
+    """
+    Valores originales de Subscription.TRACKED_FIELDS si alguno cambió en este save(), o
+    None si no cambió ninguno. También None si la instancia es nueva o no se cargaron todos
+    los campos desde la BD (sin el valor original no hay combinación anterior que recalcular).
+    """
+    loaded_values = getattr(instance, '_loaded_values', None)
+    if created or loaded_values is None or len(loaded_values) < len(instance.TRACKED_FIELDS):
+        return None
+    if loaded_values == instance.tracked_values():
+        return None
+    return loaded_values
+
+@receiver(post_save, sender='forgeapp.Subscription')
+def rebuild_rollup_on_subscription_change(sender, instance, created, **kwargs):
+    """
+    Recalcula el resumen de ingresos de la combinación anterior y la nueva cuando cambia el
+    cliente, la aplicación o el tipo de pago de la suscripción
+    """
+    previous = _changed_subscription_values(instance, created)
+    if previous is None:
+        return
+
+    rebuild_rollup(
+        [instance.pk],
+        keys=[(previous['application_id'], previous['client_id'], previous['payment_type'])]
+    )
+
+@receiver(post_save, sender='forgeapp.Subscription')
+def rebuild_aging_on_subscription_change(sender, instance, created, **kwargs):
+    """
+    Recalcula el aging del par cliente/aplicación anterior y el nuevo cuando cambia el cliente
+    o la aplicación de la suscripción (el tipo de pago no forma parte del par)
+    """
+    previous = _changed_subscription_values(instance, created)
+    if previous is None:
+        return
+    if (previous['client_id'], previous['application_id']) == (instance.client_id, instance.application_id):
+        return
+
+    rebuild_aging([instance.pk], pairs=[(previous['client_id'], previous['application_id'])])
+
+@receiver([post_save, post_delete], sender='finance.Transaction')
+def bump_transactions_cache(sender, **kwargs):
+    """Invalida los cálculos cacheados que dependen de las transacciones (core/cache.py)"""
+    cache.bump(cache.TRANSACTIONS)
+
 def register_signals():
     """
     Registra los signals una vez que la aplicación está lista.
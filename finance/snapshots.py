@@ -0,0 +1,116 @@
+"""
+Fotografías diarias de MRR y churn (RevenueSnapshot).
+
+Los valores históricos de MRR no se pueden reconstruir a partir del estado actual de las
+suscripciones, por lo que la tarea diaria registra cada noche:
+
+    mrr                      suma mensualizada de los precios activos (anual / 12)
+    arr                      mrr * 12
+    active_subscriptions     suscripciones en ACTIVE al cierre del día
+    new_subscriptions        suscripciones que pasaron a ACTIVE durante el día (activated_at)
+    churned_subscriptions    suscripciones que dejaron ACTIVE durante el día (churned_at)
+    active_clients           clientes distintos con alguna suscripción activa
+
+por aplicación y en una fila de totales. Cada fotografía cuesta dos consultas agregadas;
+los gráficos y comparaciones leen un rango de fechas del índice (application, date).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.utils import timezone
+from core import cache
+import logging
+
+logger = logging.getLogger('finance')
+
+def monthly_price():
+    """Precio mensualizado de una suscripción (los planes anuales aportan price / 12)"""
+    field = DecimalField(max_digits=12, decimal_places=2)
+    return Case(
+        # 12.0 y no 12: SQLite guarda los precios enteros como INTEGER y truncaría la división
+        When(payment_type='annual', then=ExpressionWrapper(F('price') / Value(12.0), output_field=field)),
+        default=F('price'),
+        output_field=field
+    )
+
+def day_range(day):
+    """Inicio y fin (exclusivo) del día en la zona horaria local"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+def snapshot_aggregates(day):
+    """Agregaciones de una fotografía, para usar con aggregate() o annotate()"""
+    start, end = day_range(day)
+    active = Q(status='active')
+    return {
+        'mrr': Sum(monthly_price(), filter=active),
+        'active_subscriptions': Count('pk', filter=active),
+        'new_subscriptions': Count('pk', filter=Q(activated_at__gte=start, activated_at__lt=end)),
+        'churned_subscriptions': Count('pk', filter=Q(churned_at__gte=start, churned_at__lt=end)),
+        'active_clients': Count('client', distinct=True, filter=active),
+    }
+
+def _snapshot(day, application_id, values):
+    from finance.models import RevenueSnapshot
+
+    mrr = (values['mrr'] or Decimal('0')).quantize(Decimal('0.01'))
+    return RevenueSnapshot(
+        date=day,
+        application_id=application_id,
+        mrr=mrr,
+        arr=mrr * 12,
+        active_subscriptions=values['active_subscriptions'],
+        new_subscriptions=values['new_subscriptions'],
+        churned_subscriptions=values['churned_subscriptions'],
+        active_clients=values['active_clients'],
+    )
+
+def take_snapshot(day=None):
+    """
+    Registra la fotografía de day (por defecto ayer, ya que la tarea diaria corre a las
+    00:00) con el estado actual de las suscripciones. Reemplaza la del mismo día si existe.
+    Retorna la cantidad de filas escritas.
+    """
+    from finance.models import RevenueSnapshot
+    from forgeapp.models import Subscription
+
+    day = day or timezone.localdate() - timedelta(days=1)
+    aggregates = snapshot_aggregates(day)
+
+    rows = [_snapshot(day, None, Subscription.objects.aggregate(**aggregates))]
+    for values in Subscription.objects.values('application_id').annotate(**aggregates).order_by():
+        if values['active_subscriptions'] or values['new_subscriptions'] or values['churned_subscriptions']:
+            rows.append(_snapshot(day, values['application_id'], values))
+
+    with transaction.atomic():
+        RevenueSnapshot.objects.filter(date=day).delete()
+        RevenueSnapshot.objects.bulk_create(rows)
+    cache.bump(cache.SNAPSHOTS)
+
+    logger.info(f"Fotografía de ingresos del {day}: MRR {rows[0].mrr}, {len(rows) - 1} aplicaciones")
+    return len(rows)
+
+def snapshot_series(start, end, application_id=None):
+    """Fotografías entre start y end (incluidos) de una aplicación o de los totales, por fecha"""
+    from finance.models import RevenueSnapshot
+
+    return list(
+        RevenueSnapshot.objects.filter(
+            application_id=application_id,
+            date__gte=start,
+            date__lte=end
+        ).order_by('date').values(
+            'date', 'mrr', 'arr', 'active_subscriptions', 'new_subscriptions',
+            'churned_subscriptions', 'active_clients'
+        )
+    )
+
+def snapshot_before(day, application_id=None):
+    """Última fotografía registrada en o antes de day (o None)"""
+    from finance.models import RevenueSnapshot
+
+    return RevenueSnapshot.objects.filter(
+        application_id=application_id,
+        date__lte=day
+    ).order_by('-date').first()
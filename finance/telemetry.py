@@ -0,0 +1,59 @@
+"""
+Telemetría de tareas programadas y comandos de gestión.
+
+Uso:
+
+    with track_job('check_expired_subscriptions') as run:
+        run.rows_updated = expire_subscriptions()
+
+Cada ejecución queda registrada como un JobRun con su duración, filas procesadas,
+error (si lo hubo) y el host/pid que la ejecutó.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+import logging
+import os
+import socket
+import time
+import traceback
+
+logger = logging.getLogger('finance')
+
+@contextmanager
+def track_job(job_name):
+    """Registra un JobRun alrededor del bloque; si el bloque falla se guarda el error y se propaga la excepción"""
+    from finance.models import JobRun
+
+    run = JobRun.objects.create(
+        job_name=job_name,
+        started_at=timezone.now(),
+        host=socket.gethostname(),
+        pid=os.getpid()
+    )
+    start = time.monotonic()
+
+    try:
+        yield run
+        run.status = 'success'
+    except Exception:
+        run.status = 'error'
+        run.error = traceback.format_exc()
+        raise
+    finally:
+        run.finished_at = timezone.now()
+        run.duration_ms = int((time.monotonic() - start) * 1000)
+        run.save()
+        logger.info(
+            f"Tarea {job_name} finalizada ({run.status}) en {run.duration_ms} ms: "
+            f"{run.rows_scanned} filas revisadas, {run.rows_updated} modificadas"
+        )
+
+def prune_job_runs(days=None):
+    """Elimina los JobRun más antiguos que JOB_RUN_RETENTION_DAYS (por defecto 90 días)"""
+    from finance.models import JobRun
+
+    days = days or getattr(settings, 'JOB_RUN_RETENTION_DAYS', 90)
+    deleted, _ = JobRun.objects.filter(started_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -1,3 +1,865 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import io
+import zipfile
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from forgeapp.models import Application, Client, PaymentEvent, Subscription
+from forgeapp.services import bulk_cancel, bulk_deactivate, bulk_mark_paid
+from .aging import bucket_filters, bucket_for, rebuild_aging, shift_aging
+from .bank_import import StatementError, StatementRow, import_statement, parse_amount, parse_csv, parse_ofx
+from .cohorts import cohort_matrix
+from .forecast import PERIOD_MONTHS, forecast_revenue, month_ordinal
+from .metrics import dashboard_metrics, subscription_metrics
+from .models import (
+    JobRun, ReceivableAging, ReconciliationMatch, RevenueRollup, RevenueSnapshot, SchedulerLock, Transaction
+)
+from .pivot import month_bounds, transaction_pivot
+from .reconciliation import (
+    accept_match, find_matches, is_automatic, reconcile, reject_match, score_candidate, unreconciled_income
+)
+from .rollup import monthly_totals, rebuild_rollup, revenue_comparison, totals_by_month
+from .snapshots import snapshot_before, snapshot_series, take_snapshot
+from .scheduler import acquire_leadership, check_expired_subscriptions, release_leadership, renew_leadership
+from .telemetry import prune_job_runs, track_job
 
-# Create your tests here.
+
+class SubscriptionFixtureMixin:
+    """Dos aplicaciones y cuatro suscripciones activas, con ayudas para crear eventos"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.applications = [
+            Application.objects.create(name=f'App {i}', description='Prueba') for i in range(2)
+        ]
+        self.subscriptions = []
+        for i in range(4):
+            client = Client.objects.create(first_name='Cliente', last_name=str(i), email=f'cliente{i}@example.com')
+            self.subscriptions.append(Subscription.objects.create(
+                client=client,
+                application=self.applications[i % 2],
+                price=Decimal('10000'),
+                payment_type='annual' if i == 3 else 'monthly',
+                status='active',
+                start_date=self.today - timedelta(days=120 - i * 30)
+            ))
+
+    def add_event(self, subscription, days_ago, amount='10000'):
+        return PaymentEvent.objects.create(
+            subscription=subscription,
+            expected_date=self.today - timedelta(days=days_ago),
+            amount=Decimal(amount),
+            status='pending'
+        )
+
+    def pending_event(self, subscription):
+        return PaymentEvent.objects.filter(subscription=subscription, status='pending').earliest('expected_date')
+
+
+def aging_rows():
+    return sorted(ReceivableAging.objects.values_list(
+        'client_id', 'application_id', 'pending_count', *ReceivableAging.BUCKET_FIELDS
+    ))
+
+
+def rollup_rows():
+    return sorted(RevenueRollup.objects.values_list(
+        'year', 'month', 'application_id', 'client_id', 'payment_type', 'amount', 'count'
+    ))
+
+
+class ReceivableAgingTests(SubscriptionFixtureMixin, TestCase):
+    """finance/aging.py: el aging incremental es igual a rebuild_aging"""
+
+    def assertMatchesRebuild(self):
+        incremental = aging_rows()
+        rebuild_aging(today=self.today)
+        self.assertEqual(incremental, aging_rows())
+
+    def test_create_pay_delete_and_bulk_match_rebuild(self):
+        first, second, third, fourth = self.subscriptions
+        self.assertMatchesRebuild()
+
+        # Eventos pendientes en todos los tramos
+        for days_ago in (-10, 0, 15, 45, 75, 120):
+            self.add_event(first, days_ago)
+        self.add_event(second, 40, amount='2500')
+        self.assertMatchesRebuild()
+
+        # Pago individual (genera el evento siguiente)
+        self.pending_event(first).mark_as_paid(self.today)
+        self.assertMatchesRebuild()
+
+        # Cambio de monto y de fecha esperada
+        event = self.pending_event(second)
+        event.amount = Decimal('7500')
+        event.expected_date = self.today - timedelta(days=95)
+        event.save()
+        self.assertMatchesRebuild()
+
+        # Eliminación de un evento pendiente
+        self.pending_event(first).delete()
+        self.assertMatchesRebuild()
+
+        # Pago masivo
+        bulk_mark_paid([(self.pending_event(subscription).pk, self.today) for subscription in (second, third)])
+        self.assertMatchesRebuild()
+
+        # Bajas masivas, que eliminan los eventos pendientes
+        bulk_deactivate([third.pk])
+        bulk_cancel(Subscription.objects.filter(pk=fourth.pk))
+        self.assertMatchesRebuild()
+
+
+    def test_subscription_key_change_matches_rebuild(self):
+        first, second = self.subscriptions[:2]
+        self.add_event(first, 45)
+        self.add_event(second, 10)
+        self.assertMatchesRebuild()
+
+        for field, value in (('application', self.applications[1]), ('client', second.client)):
+            subscription = Subscription.objects.get(pk=first.pk)
+            setattr(subscription, field, value)
+            subscription.save()
+            self.assertMatchesRebuild()
+
+        self.assertFalse(ReceivableAging.objects.filter(client=first.client).exists())
+
+    def test_bucket_limits_match_database_filters(self):
+        limits = {-1: 'current', 0: 'days_0_30', 30: 'days_0_30', 31: 'days_31_60', 60: 'days_31_60',
+                  61: 'days_61_90', 90: 'days_61_90', 91: 'days_over_90'}
+        events = {self.add_event(self.subscriptions[0], days).pk: bucket for days, bucket in limits.items()}
+
+        for days, bucket in limits.items():
+            self.assertEqual(bucket_for(self.today - timedelta(days=days), self.today), bucket)
+        for bucket, condition in bucket_filters(self.today).items():
+            self.assertEqual(
+                set(PaymentEvent.objects.filter(condition, pk__in=events).values_list('pk', flat=True)),
+                {pk for pk, expected in events.items() if expected == bucket}
+            )
+
+    def test_shift_matches_rebuild_on_later_day(self):
+        for days_ago in (-5, 0, 29, 31, 59, 88, 95):
+            self.add_event(self.subscriptions[0], days_ago)
+        self.add_event(self.subscriptions[1], 25, amount='500')
+        rebuild_aging(today=self.today)
+
+        later = self.today + timedelta(days=7)
+        shift_aging(today=later)
+        shifted = aging_rows()
+
+        rebuild_aging(today=later)
+        self.assertEqual(shifted, aging_rows())
+
+class RevenueRollupTests(SubscriptionFixtureMixin, TestCase):
+    """finance/rollup.py: el resumen de ingresos incremental es igual a rebuild_rollup"""
+
+    def assertMatchesRebuild(self):
+        incremental = rollup_rows()
+        rebuild_rollup()
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_create_pay_delete_and_bulk_match_rebuild(self):
+        first, second, third, fourth = self.subscriptions
+        last_month = self.today - timedelta(days=35)
+
+        # Pagos individuales en dos meses distintos
+        self.pending_event(first).mark_as_paid(last_month)
+        self.pending_event(first).mark_as_paid(self.today)
+        self.assertMatchesRebuild()
+
+        # Evento creado directamente como pagado
+        PaymentEvent.objects.create(
+            subscription=second,
+            expected_date=last_month,
+            paid_date=last_month,
+            amount=Decimal('4000'),
+            status='paid'
+        )
+        self.assertMatchesRebuild()
+
+        # Cambio de monto y de mes de pago de un evento pagado
+        event = PaymentEvent.objects.filter(subscription=first, status='paid').latest('paid_date')
+        event.amount = Decimal('12500')
+        event.paid_date = last_month
+        event.save()
+        self.assertMatchesRebuild()
+
+        # Un pago revertido a pendiente y un pago eliminado
+        event.status = 'pending'
+        event.paid_date = None
+        event.save()
+        PaymentEvent.objects.filter(subscription=second, status='paid').get().delete()
+        self.assertMatchesRebuild()
+
+        # Pago masivo, incluido un segundo evento de la misma suscripción
+        payments = [(self.pending_event(subscription).pk, self.today) for subscription in (second, third, fourth)]
+        payments.append((self.add_event(third, 60, amount='3000').pk, last_month))
+        bulk_mark_paid(payments)
+        self.assertMatchesRebuild()
+
+        # Bajas masivas: no tocan los pagos registrados
+        bulk_deactivate([third.pk])
+        bulk_cancel(Subscription.objects.filter(pk=fourth.pk))
+        self.assertMatchesRebuild()
+
+    def test_subscription_key_change_matches_rebuild(self):
+        first, second = self.subscriptions[:2]
+        self.pending_event(first).mark_as_paid(self.today)
+        self.pending_event(second).mark_as_paid(self.today)
+        self.assertMatchesRebuild()
+
+        # Cambio de aplicación, cliente y tipo de pago, uno a la vez y con una instancia recargada
+        for field, value in (
+            ('application', self.applications[1]),
+            ('client', second.client),
+            ('payment_type', 'annual'),
+        ):
+            subscription = Subscription.objects.get(pk=first.pk)
+            setattr(subscription, field, value)
+            subscription.save()
+            self.assertMatchesRebuild()
+
+        self.assertFalse(RevenueRollup.objects.filter(client=first.client).exists())
+
+
+    def test_partial_rebuild_and_monthly_readers(self):
+        first, second = self.subscriptions[:2]
+        last_month = self.today - timedelta(days=35)
+        self.pending_event(first).mark_as_paid(last_month)
+        self.pending_event(second).mark_as_paid(self.today)
+
+        # Un recálculo parcial no toca las combinaciones de otras suscripciones
+        RevenueRollup.objects.filter(client=second.client).update(amount=Decimal('1'))
+        rebuild_rollup([first.pk])
+        self.assertEqual(RevenueRollup.objects.get(client=second.client).amount, Decimal('1'))
+        rebuild_rollup([second.pk])
+        self.assertMatchesRebuild()
+
+        expected = {}
+        for paid_date in (last_month, self.today):
+            key = (paid_date.year, paid_date.month)
+            expected[key] = expected.get(key, Decimal('0')) + Decimal('10000')
+        self.assertEqual(totals_by_month(last_month, self.today), expected)
+        self.assertEqual(
+            monthly_totals(self.today.year),
+            {month: total for (year, month), total in expected.items() if year == self.today.year}
+        )
+
+class SchedulerLockTests(TestCase):
+    """Un solo proceso líder del scheduler a la vez (finance/scheduler.py)"""
+
+    def test_second_owner_waits_while_leader_is_alive(self):
+        self.assertTrue(acquire_leadership('nodo-a', ttl=60))
+        self.assertFalse(acquire_leadership('nodo-b', ttl=60))
+        self.assertTrue(renew_leadership('nodo-a'))
+        self.assertFalse(renew_leadership('nodo-b'))
+
+    def test_reacquire_keeps_acquired_at(self):
+        acquire_leadership('nodo-a', ttl=60)
+        acquired_at = SchedulerLock.objects.get().acquired_at
+
+        self.assertTrue(acquire_leadership('nodo-a', ttl=60))
+        self.assertEqual(SchedulerLock.objects.get().acquired_at, acquired_at)
+
+    def test_stale_lock_is_taken_over(self):
+        acquire_leadership('nodo-a', ttl=60)
+        SchedulerLock.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertTrue(acquire_leadership('nodo-b', ttl=60))
+        self.assertEqual(SchedulerLock.objects.get().owner, 'nodo-b')
+        self.assertFalse(renew_leadership('nodo-a'))
+
+    def test_release_lets_another_owner_in(self):
+        acquire_leadership('nodo-a', ttl=60)
+        release_leadership('nodo-b')
+        self.assertFalse(acquire_leadership('nodo-b', ttl=60))
+
+        release_leadership('nodo-a')
+        self.assertTrue(acquire_leadership('nodo-b', ttl=60))
+
+
+class JobRunTests(TestCase):
+    """Telemetría de tareas programadas (finance/telemetry.py) y panel de operaciones"""
+
+    def test_successful_run_is_recorded(self):
+        with track_job('prueba') as run:
+            run.rows_scanned = 10
+            run.rows_updated = 4
+
+        run = JobRun.objects.get()
+        self.assertEqual(
+            (run.job_name, run.status, run.rows_scanned, run.rows_updated),
+            ('prueba', 'success', 10, 4)
+        )
+        self.assertIsNotNone(run.finished_at)
+        self.assertIsNotNone(run.duration_ms)
+
+    def test_failed_run_keeps_error_and_reraises(self):
+        with self.assertRaises(ZeroDivisionError):
+            with track_job('prueba'):
+                1 / 0
+
+        run = JobRun.objects.get()
+        self.assertEqual(run.status, 'error')
+        self.assertIn('ZeroDivisionError', run.error)
+
+    def test_scheduled_job_records_its_run(self):
+        check_expired_subscriptions()
+
+        self.assertEqual(JobRun.objects.get().job_name, 'check_expired_subscriptions')
+
+    def test_prune_removes_only_old_runs(self):
+        now = timezone.now()
+        JobRun.objects.create(job_name='antigua', started_at=now - timedelta(days=100))
+        JobRun.objects.create(job_name='reciente', started_at=now - timedelta(days=10))
+
+        self.assertEqual(prune_job_runs(days=90), 1)
+        self.assertEqual(list(JobRun.objects.values_list('job_name', flat=True)), ['reciente'])
+
+    def test_ops_page_lists_jobs(self):
+        with track_job('check_expired_subscriptions'):
+            pass
+        self.client.force_login(User.objects.create_user('ops'))
+
+        response = self.client.get(reverse('finance:job_runs'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'check_expired_subscriptions')
+
+
+class RevenueForecastTests(SubscriptionFixtureMixin, TestCase):
+    """forecast_revenue coincide con avanzar el ciclo de cada suscripción una por una"""
+
+    def expected(self, months):
+        """Proyección calculada suscripción por suscripción"""
+        first = month_ordinal(self.today)
+        amounts = {}
+        for subscription in Subscription.objects.filter(status='active', auto_renewal=True):
+            step = PERIOD_MONTHS[subscription.payment_type]
+            event = subscription.next_payment_event
+            due = month_ordinal(event.expected_date if event else subscription.current_period_end)
+            row = amounts.setdefault(subscription.application_id, [Decimal('0')] * months)
+            if due < first:
+                row[0] += subscription.price
+                while due < first:
+                    due += step
+            for index in range(due - first, months, step):
+                row[index] += subscription.price
+        return amounts
+
+    def test_matches_per_subscription_projection(self):
+        first, second, third, fourth = self.subscriptions
+        # Un cobro vencido hace dos meses, un período ya pagado y dos suscripciones excluidas
+        self.pending_event(first).mark_as_paid(self.today)
+        PaymentEvent.objects.filter(subscription=second, status='pending').update(
+            expected_date=self.today - timedelta(days=62)
+        )
+        Subscription.objects.filter(pk=third.pk).update(auto_renewal=False)
+        Subscription.objects.create(
+            client=fourth.client, application=self.applications[0], price=Decimal('999'), status='inactive',
+            start_date=self.today
+        )
+
+        for months in (1, 12, 24):
+            forecast = forecast_revenue(months, today=self.today)
+            self.assertEqual(
+                {application['id']: application['amounts'] for application in forecast['applications']},
+                {key: value for key, value in self.expected(months).items() if any(value)}
+            )
+            self.assertEqual(forecast['total'], sum(forecast['totals'], Decimal('0')))
+            self.assertEqual(len(forecast['months']), months)
+
+        self.assertEqual(forecast_revenue(12, today=self.today)['subscriptions'], 3)
+
+    def test_horizon_is_clamped(self):
+        self.assertEqual(len(forecast_revenue(100, today=self.today)['months']), 24)
+        self.assertEqual(len(forecast_revenue(0, today=self.today)['months']), 1)
+
+    def test_json_endpoint(self):
+        self.client.force_login(User.objects.create_user('finanzas'))
+
+        response = self.client.get(reverse('finance:revenue_forecast_data'), {'months': 6})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['months']), 6)
+
+
+class DashboardMetricsTests(SubscriptionFixtureMixin, TestCase):
+    """KPIs del dashboard (finance/metrics.py)"""
+
+    def test_subscription_kpis(self):
+        first, second, third, fourth = self.subscriptions
+        # first y second existían hace más de 30 días; fourth es anual
+        Subscription.objects.filter(pk__in=[first.pk, second.pk]).update(
+            created_at=timezone.now() - timedelta(days=45)
+        )
+        Subscription.objects.filter(pk=third.pk).update(price=Decimal('20000'))
+        Subscription.objects.create(
+            client=first.client, application=self.applications[1], price=Decimal('5000'), status='inactive'
+        )
+
+        metrics = subscription_metrics()
+
+        self.assertEqual(metrics['total_subscriptions'], 5)
+        self.assertEqual(metrics['active_subscriptions'], 4)
+        # MRR: solo suscripciones mensuales activas
+        self.assertEqual(metrics['mrr'], Decimal('40000'))
+        self.assertEqual(metrics['mrr_change'], 100.0)
+        self.assertEqual(metrics['payment_distribution'], [3, 1])
+        self.assertEqual(metrics['active_clients'], 4)
+        self.assertEqual(metrics['new_clients'], 2)
+        self.assertEqual(metrics['retention_rate'], 50.0)
+        self.assertEqual(metrics['avg_client_value'], Decimal('10000'))
+
+    def test_revenue_series_reads_paid_events(self):
+        self.pending_event(self.subscriptions[0]).mark_as_paid(self.today)
+        self.pending_event(self.subscriptions[1]).mark_as_paid(self.today)
+
+        metrics = dashboard_metrics()
+
+        self.assertEqual(len(metrics['monthly_data']), 6)
+        self.assertEqual(metrics['monthly_data'][-1], 20000.0)
+
+    def test_two_queries(self):
+        with self.assertNumQueries(2):
+            dashboard_metrics()
+
+
+class RevenueSnapshotTests(SubscriptionFixtureMixin, TestCase):
+    """Fotografías diarias de MRR y churn (finance/snapshots.py)"""
+
+    def test_snapshot_totals_and_per_application_rows(self):
+        bulk_cancel([self.subscriptions[2].pk])
+
+        self.assertEqual(take_snapshot(self.today), 3)
+
+        total = RevenueSnapshot.objects.get(date=self.today, application=None)
+        # Dos mensuales activas de 10.000 y una anual de 10.000 / 12
+        self.assertEqual(total.mrr, Decimal('20833.33'))
+        self.assertEqual(total.arr, total.mrr * 12)
+        self.assertEqual(
+            (total.active_subscriptions, total.new_subscriptions, total.churned_subscriptions, total.active_clients),
+            (3, 4, 1, 3)
+        )
+        per_application = dict(
+            RevenueSnapshot.objects.filter(date=self.today, application__isnull=False)
+            .values_list('application_id', 'active_subscriptions')
+        )
+        self.assertEqual(per_application, {self.applications[0].pk: 1, self.applications[1].pk: 2})
+
+    def test_retaking_a_day_replaces_it(self):
+        take_snapshot(self.today)
+        bulk_cancel([subscription.pk for subscription in self.subscriptions])
+        take_snapshot(self.today)
+
+        total = RevenueSnapshot.objects.get(date=self.today, application=None)
+        self.assertEqual((total.mrr, total.churned_subscriptions), (Decimal('0'), 4))
+
+    def test_series_and_previous_snapshot(self):
+        yesterday = self.today - timedelta(days=1)
+        take_snapshot(yesterday)
+        take_snapshot(self.today)
+
+        self.assertEqual(
+            [row['date'] for row in snapshot_series(yesterday - timedelta(days=5), self.today)],
+            [yesterday, self.today]
+        )
+        self.assertEqual(snapshot_before(self.today - timedelta(days=1)).date, yesterday)
+        self.assertIsNone(snapshot_before(yesterday - timedelta(days=1)))
+
+
+class CohortRetentionTests(TestCase):
+    """Matriz de retención por cohortes (finance/cohorts.py)"""
+
+    def setUp(self):
+        self.today = date(2026, 6, 15)
+        self.application = Application.objects.create(name='App', description='Prueba')
+
+    def subscribe(self, number, **fields):
+        client = Client.objects.create(first_name='Cliente', last_name=str(number), email=f'cliente{number}@example.com')
+        return Subscription.objects.create(
+            client=client, application=self.application, price=Decimal('10000'), **fields
+        )
+
+    def test_matrix_follows_each_subscription_until_it_ends(self):
+        # Cohorte de abril: una activa y una cancelada en mayo
+        self.subscribe(0, status='active', start_date=date(2026, 4, 10))
+        self.subscribe(1, status='cancelled', start_date=date(2026, 4, 5), cancelled_at=date(2026, 5, 20))
+        # Cohorte de mayo: un único pago mensual cubre solo mayo
+        expired = self.subscribe(2, status='expired', start_date=date(2026, 5, 1))
+        PaymentEvent.objects.create(
+            subscription=expired, expected_date=date(2026, 5, 1), paid_date=date(2026, 5, 1),
+            amount=Decimal('10000'), status='paid'
+        )
+        # Sin actividad: pendiente sin pagos y una cohorte fuera del rango pedido
+        self.subscribe(3, status='pending', start_date=date(2026, 6, 1))
+        self.subscribe(4, status='active', start_date=date(2025, 1, 1))
+
+        matrix = cohort_matrix(3, self.today)
+
+        self.assertEqual(matrix['offsets'], [0, 1, 2])
+        self.assertEqual(
+            [(cohort['month'], cohort['size'], cohort['retained']) for cohort in matrix['cohorts']],
+            [
+                (date(2026, 4, 1), 2, [2, 2, 1]),
+                (date(2026, 5, 1), 1, [1, 0]),
+                (date(2026, 6, 1), 0, [0]),
+            ]
+        )
+        self.assertEqual(matrix['cohorts'][0]['rates'], [100.0, 100.0, 50.0])
+        self.assertEqual(matrix['cohorts'][2]['rates'], [None])
+
+    def test_client_belongs_to_its_first_subscription_cohort(self):
+        first = self.subscribe(0, status='cancelled', start_date=date(2026, 4, 1), cancelled_at=date(2026, 4, 30))
+        Subscription.objects.create(
+            client=first.client, application=self.application, price=Decimal('10000'),
+            status='active', start_date=date(2026, 6, 1)
+        )
+
+        cohorts = cohort_matrix(3, self.today)['cohorts']
+
+        self.assertEqual([cohort['size'] for cohort in cohorts], [1, 0, 0])
+        self.assertEqual(cohorts[0]['retained'], [1, 0, 1])
+
+    def test_export_formats(self):
+        self.subscribe(0, status='active', start_date=date.today())
+        self.client.force_login(User.objects.create_user('finanzas'))
+        url = reverse('finance:cohort_retention')
+
+        response = self.client.get(url, {'months': 6, 'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(lines[0], 'Cohorte,Clientes,Mes 0,Mes 1,Mes 2,Mes 3,Mes 4,Mes 5')
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[-1], f"{date.today():%Y-%m},1,100.0")
+
+        response = self.client.get(url, {'format': 'xlsx'})
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as book:
+            self.assertIn('xl/worksheets/sheet1.xml', book.namelist())
+
+
+class RevenueComparisonTests(SubscriptionFixtureMixin, TestCase):
+    """Comparación de ingresos entre años sobre el resumen mensual"""
+
+    def setUp(self):
+        super().setUp()
+        self.paid(self.subscriptions[0], date(2025, 3, 10), '10000')
+        self.paid(self.subscriptions[0], date(2026, 3, 10), '15000')
+        self.paid(self.subscriptions[1], date(2026, 5, 1), '5000')
+
+    def paid(self, subscription, day, amount):
+        PaymentEvent.objects.create(
+            subscription=subscription, expected_date=day, paid_date=day, amount=Decimal(amount), status='paid'
+        )
+
+    def test_months_and_columns_side_by_side(self):
+        with self.assertNumQueries(1):
+            comparison = revenue_comparison([2026, 2025])
+
+        self.assertEqual(comparison['years'], [2025, 2026])
+        self.assertEqual(
+            [(column['year'], column['total'], column['change']) for column in comparison['columns']],
+            [(2025, Decimal('10000'), None), (2026, Decimal('20000'), 100.0)]
+        )
+        self.assertEqual(len(comparison['months']), 12)
+        self.assertEqual(
+            comparison['months'][2]['cells'],
+            [{'total': Decimal('10000'), 'change': None}, {'total': Decimal('15000'), 'change': 50.0}]
+        )
+        # Sin ingresos el año anterior no hay base para la variación
+        self.assertEqual(comparison['months'][4]['cells'][1], {'total': Decimal('5000'), 'change': None})
+        self.assertEqual(comparison['breakdown'], [])
+
+    def test_breakdown_by_application(self):
+        breakdown = revenue_comparison([2025, 2026], 'application')['breakdown']
+
+        self.assertEqual(
+            [(item['id'], item['name'], item['totals'], item['change']) for item in breakdown],
+            [
+                (self.applications[0].pk, 'App 0', [Decimal('10000'), Decimal('15000')], 50.0),
+                (self.applications[1].pk, 'App 1', [Decimal('0'), Decimal('5000')], None),
+            ]
+        )
+
+    def test_unknown_breakdown_is_ignored(self):
+        self.assertEqual(revenue_comparison([2026], 'currency')['breakdown'], [])
+
+    def test_annual_report_renders(self):
+        self.client.force_login(User.objects.create_user('finanzas'))
+
+        response = self.client.get(
+            reverse('finance:annual_report'), {'years': [2025, 2026], 'breakdown': 'client'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['selected_years'], [2025, 2026])
+        self.assertEqual(len(response.context['comparison']['breakdown']), 2)
+
+
+class TransactionPivotTests(TestCase):
+    """Tabla dinámica de transacciones por categoría y mes (finance/pivot.py)"""
+
+    def setUp(self):
+        for type, category, amount, day in [
+            ('income', 'Suscripciones', '30000', date(2026, 1, 5)),
+            ('income', 'Suscripciones', '20000', date(2026, 1, 20)),
+            ('income', 'Consultoría', '40000', date(2026, 2, 28)),
+            ('expense', 'Hosting', '5000', date(2026, 12, 31)),
+            ('income', 'Suscripciones', '99999', date(2025, 12, 31)),
+        ]:
+            Transaction.objects.create(
+                type=type, category=category, description='Prueba', amount=Decimal(amount), date=day
+            )
+
+    def test_rows_columns_and_totals(self):
+        with self.assertNumQueries(1):
+            pivot = transaction_pivot(2026)
+
+        income, expenses = pivot['sections']
+        self.assertEqual((income['type'], expenses['type']), ('income', 'expense'))
+        self.assertEqual(
+            [(row['category'], row['total'], row['count']) for row in income['rows']],
+            [('Suscripciones', Decimal('50000'), 2), ('Consultoría', Decimal('40000'), 1)]
+        )
+        cell = income['rows'][0]['cells'][0]
+        self.assertEqual(
+            (cell['month'], cell['amount'], cell['start'], cell['end']),
+            (1, Decimal('50000'), date(2026, 1, 1), date(2026, 1, 31))
+        )
+        self.assertEqual(expenses['totals'][11]['end'], date(2026, 12, 31))
+        self.assertEqual(
+            [month['balance'] for month in pivot['monthly_data']],
+            [Decimal('50000'), Decimal('40000')] + [Decimal('0')] * 9 + [Decimal('-5000')]
+        )
+        self.assertEqual(
+            (pivot['total_income'], pivot['total_expenses'], pivot['total_balance']),
+            (Decimal('90000'), Decimal('5000'), Decimal('85000'))
+        )
+
+    def test_month_bounds(self):
+        self.assertEqual(month_bounds(2028, 2), (date(2028, 2, 1), date(2028, 2, 29)))
+        self.assertEqual(month_bounds(2026, 12), (date(2026, 12, 1), date(2026, 12, 31)))
+
+    def test_cell_link_filters_the_transaction_list(self):
+        self.client.force_login(User.objects.create_user('finanzas'))
+        start, end = month_bounds(2026, 1)
+
+        response = self.client.get(reverse('finance:transaction_list'), {
+            'type': 'income', 'category_exact': 'Suscripciones', 'start_date': start, 'end_date': end
+        })
+
+        self.assertEqual(response.context['total_income'], Decimal('50000'))
+
+    def test_summary_export(self):
+        self.client.force_login(User.objects.create_user('finanzas'))
+
+        response = self.client.get(reverse('finance:transaction_summary'), {'year': 2026, 'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+        self.assertTrue(lines[0].startswith('Tipo,Categoría,2026-01,2026-02'))
+        self.assertEqual(
+            [(*line.split(',')[:2], Decimal(line.split(',')[-1])) for line in lines[1:]],
+            [
+                ('Ingreso', 'Suscripciones', Decimal('50000')),
+                ('Ingreso', 'Consultoría', Decimal('40000')),
+                ('Ingreso', 'Total', Decimal('90000')),
+                ('Egreso', 'Hosting', Decimal('5000')),
+                ('Egreso', 'Total', Decimal('5000')),
+                ('Balance', '', Decimal('85000')),
+            ]
+        )
+
+
+STATEMENT_CSV = (
+    'Fecha;Descripción;Cargo;Abono\n'
+    '01/03/2026;Transferencia Ana Pérez;;12.000\n'
+    '02/03/2026;Comisión mantención;1.500;\n'
+    '02/03/2026;Comisión mantención;1.500;\n'
+    '\n'
+    '03/03/2026;Ajuste;0;\n'
+)
+
+
+class BankImportTests(TestCase):
+    """Importación de cartolas bancarias (finance/bank_import.py)"""
+
+    def import_csv(self, content, **kwargs):
+        return import_statement(parse_csv(io.StringIO(content)), 'Cuenta 1', **kwargs)
+
+    def test_parse_amount(self):
+        for text, amount in [
+            ('1.234.567', '1234567'), ('-1.234,50', '-1234.50'), ('$ 12.000', '12000'),
+            ('1234.56', '1234.56'), ('1,234.56', '1234.56'), ('(5.000)', '-5000'),
+        ]:
+            self.assertEqual(parse_amount(text), Decimal(amount), text)
+        with self.assertRaises(ValueError):
+            parse_amount('n/a')
+
+    def test_parse_csv_with_debit_and_credit_columns(self):
+        rows = list(parse_csv(io.StringIO(STATEMENT_CSV + '31/02/2026;Fecha inválida;;100\n')))
+
+        self.assertEqual(rows[0], StatementRow(2, date(2026, 3, 1), Decimal('12000'), 'Transferencia Ana Pérez'))
+        self.assertEqual(rows[1].amount, Decimal('-1500'))
+        # La línea en blanco se omite
+        self.assertEqual(len(rows), 5)
+        self.assertIsInstance(rows[-1], ValueError)
+        self.assertTrue(str(rows[-1]).startswith('Línea 7:'))
+
+    def test_parse_ofx(self):
+        content = (
+            '<OFX><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20260301120000<TRNAMT>12000.00<NAME>Ana<MEMO>Plan'
+            '</STMTTRN>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260302<TRNAMT>-1500<NAME>Comisi&oacute;n</STMTTRN>'
+            '</BANKTRANLIST></OFX>'
+        )
+
+        self.assertEqual(list(parse_ofx(io.StringIO(content))), [
+            StatementRow(1, date(2026, 3, 1), Decimal('12000.00'), 'Ana Plan'),
+            StatementRow(2, date(2026, 3, 2), Decimal('-1500'), 'Comisión'),
+        ])
+
+    def test_reimport_inserts_nothing(self):
+        result = self.import_csv(STATEMENT_CSV, chunk_size=2)
+
+        self.assertEqual(result, {'rows': 4, 'created': 3, 'duplicates': 0, 'manual': 0, 'skipped': 1})
+        # Los dos cargos idénticos del mismo día se conservan
+        self.assertEqual(Transaction.objects.filter(type='expense', amount=Decimal('1500')).count(), 2)
+
+        result = self.import_csv(STATEMENT_CSV)
+
+        self.assertEqual((result['created'], result['duplicates']), (0, 3))
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_manual_transaction_covers_one_movement(self):
+        Transaction.objects.create(
+            type='expense', category='Gastos', description='comisión  MANTENCIÓN',
+            amount=Decimal('1500'), date=date(2026, 3, 2)
+        )
+
+        result = self.import_csv(STATEMENT_CSV, chunk_size=1)
+
+        self.assertEqual((result['created'], result['manual']), (2, 1))
+        self.assertEqual(Transaction.objects.filter(type='expense').count(), 2)
+        self.assertEqual(self.import_csv(STATEMENT_CSV)['duplicates'], 2)
+
+    def test_invalid_row_rolls_back_everything(self):
+        with self.assertRaises(StatementError) as raised:
+            self.import_csv(STATEMENT_CSV + '04/03/2026;Sin monto;abc;\n', chunk_size=1)
+
+        self.assertEqual(raised.exception.errors, ['Línea 7: monto no reconocido: "abc"'])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_upload_windows_1252_file(self):
+        self.client.force_login(User.objects.create_user('finanzas'))
+        upload = SimpleUploadedFile('cartola.csv', STATEMENT_CSV.encode('cp1252'), content_type='text/csv')
+
+        response = self.client.post(reverse('finance:transaction_import'), {
+            'file': upload, 'file_format': 'csv', 'account': 'Cuenta 1',
+            'income_category': 'Ventas', 'expense_category': 'Banco',
+        })
+
+        self.assertRedirects(response, reverse('finance:transaction_list') + '?source_account=Cuenta+1')
+        self.assertEqual(Transaction.objects.get(type='income').description, 'Transferencia Ana Pérez')
+
+
+class ReconciliationTests(SubscriptionFixtureMixin, TestCase):
+    """Conciliación de ingresos con eventos de pago (finance/reconciliation.py)"""
+
+    def setUp(self):
+        super().setUp()
+        self.referenced = self.add_event(self.subscriptions[0], 0, '25000')
+        self.named = self.add_event(self.subscriptions[1], 2, '25000')
+
+    def income(self, description, days_ago=0, amount='25000'):
+        return Transaction.objects.create(
+            type='income', category='Suscripciones', description=description,
+            amount=Decimal(amount), date=self.today - timedelta(days=days_ago)
+        )
+
+    def matches(self):
+        return sorted(ReconciliationMatch.objects.values_list('transaction_id', 'payment_event_id', 'status'))
+
+    def test_score_candidate(self):
+        row = {'date': self.today, 'description': 'pago me000001 ana perez'}
+        event = {
+            'expected_date': self.today - timedelta(days=3),
+            'reference_id': 'ME000001',
+            'name_tokens': ['ana', 'perez'],
+        }
+
+        self.assertEqual(score_candidate(row, event), (121, 'monto, 3 días, referencia, cliente'))
+        event['name_tokens'] = ['ana', 'maria', 'soto']
+        self.assertEqual(score_candidate(row, event), (96, 'monto, 3 días, referencia'))
+
+    def test_automatic_match_requires_the_reference(self):
+        event = self.referenced
+        self.assertTrue(is_automatic([(event, 100, 'monto, mismo día, referencia')]))
+        self.assertFalse(is_automatic([(event, 105, 'monto, mismo día, cliente')]))
+        self.assertFalse(is_automatic([
+            (event, 120, 'monto, mismo día, referencia'), (event, 110, 'monto, 1 días, referencia')
+        ]))
+
+    def test_reference_is_marked_and_name_only_goes_to_review(self):
+        paid = self.income(f'Pago {self.subscriptions[0].reference_id} Cliente 0')
+        named = self.income('Transferencia Cliente 1', days_ago=1)
+
+        self.assertEqual(reconcile(dry_run=True), {'transactions': 2, 'matched': 1, 'review': 1, 'unmatched': 0})
+        self.assertFalse(ReconciliationMatch.objects.exists())
+
+        self.assertEqual(reconcile(), {'transactions': 2, 'matched': 1, 'review': 1, 'unmatched': 0})
+
+        self.referenced.refresh_from_db()
+        paid.refresh_from_db()
+        self.assertEqual((self.referenced.status, self.referenced.paid_date), ('paid', self.today))
+        self.assertEqual(paid.payment_event_id, self.referenced.pk)
+        self.assertEqual(self.matches(), [(named.pk, self.named.pk, 'pending')])
+        self.named.refresh_from_db()
+        self.assertEqual(self.named.status, 'pending')
+        # Los ingresos conciliados o por revisar no se vuelven a procesar
+        self.assertEqual(reconcile()['transactions'], 0)
+
+    def test_find_matches_uses_three_queries(self):
+        for i in range(5):
+            self.income(f'Transferencia Cliente {i}', days_ago=i)
+
+        with self.assertNumQueries(3):
+            automatic, review = find_matches(unreconciled_income())
+
+        self.assertEqual((len(automatic), len(review)), (0, 5))
+
+    def test_accept_match_rejects_competing_matches(self):
+        first = self.income('Transferencia Cliente 1')
+        second = self.income('Abono Cliente 1', days_ago=1)
+        reconcile()
+        match = ReconciliationMatch.objects.get(transaction=first, payment_event=self.named)
+
+        self.assertTrue(accept_match(match))
+        self.assertFalse(accept_match(match))
+
+        self.named.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual((self.named.status, self.named.paid_date), ('paid', first.date))
+        self.assertEqual(first.payment_event_id, self.named.pk)
+        # Se rechazan las demás del mismo ingreso o del mismo evento; el otro par de second sigue pendiente
+        self.assertEqual(self.matches(), [
+            (first.pk, self.referenced.pk, 'rejected'),
+            (first.pk, self.named.pk, 'accepted'),
+            (second.pk, self.referenced.pk, 'pending'),
+            (second.pk, self.named.pk, 'rejected'),
+        ])
+
+    def test_rejected_pair_is_not_proposed_again(self):
+        transaction = self.income('Transferencia Cliente 1')
+        reconcile()
+        for match in ReconciliationMatch.objects.all():
+            self.assertTrue(reject_match(match))
+
+        self.assertEqual(reconcile(), {'transactions': 1, 'matched': 0, 'review': 0, 'unmatched': 1})
+        self.assertEqual({status for _, _, status in self.matches()}, {'rejected'})
+        self.assertIsNone(Transaction.objects.get(pk=transaction.pk).payment_event_id)
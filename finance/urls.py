@@ -6,9 +6,15 @@ app_name = 'finance'
 urlpatterns = [
     # Dashboard y reportes generales
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/metrics/', views.dashboard_metrics_data, name='dashboard_metrics'),
+    path('dashboard/snapshots/', views.revenue_snapshots_data, name='revenue_snapshots_data'),
     path('reports/monthly/', views.monthly_report, name='monthly_report'),
     path('reports/annual/', views.annual_report, name='annual_report'),
     path('reports/cash-flow/', views.cash_flow_report, name='cash_flow_report'),
+    path('reports/aging/', views.receivables_aging, name='receivables_aging'),
+    path('reports/cohorts/', views.cohort_retention, name='cohort_retention'),
+    path('reports/forecast/', views.revenue_forecast, name='revenue_forecast'),
+    path('reports/forecast/data/', views.revenue_forecast_data, name='revenue_forecast_data'),
     
     # Pagos
     path('payments/', views.payment_list, name='payment_list'),
@@ -27,7 +33,18 @@ urlpatterns = [
     path('transactions/', views.transaction_list, name='transaction_list'),
     path('transactions/summary/', views.transaction_summary, name='transaction_summary'),
     path('transactions/create/', views.transaction_create, name='transaction_create'),
+    path('transactions/import/', views.transaction_import, name='transaction_import'),
     path('transactions/<int:pk>/', views.transaction_detail, name='transaction_detail'),
     path('transactions/<int:pk>/update/', views.transaction_update, name='transaction_update'),
     path('transactions/<int:pk>/delete/', views.transaction_delete, name='transaction_delete'),
+
+    # Conciliación
+    path('reconciliation/', views.reconciliation, name='reconciliation'),
+    path('reconciliation/<int:pk>/accept/', views.reconciliation_match_resolve, {'action': 'accept'},
+         name='reconciliation_match_accept'),
+    path('reconciliation/<int:pk>/reject/', views.reconciliation_match_resolve, {'action': 'reject'},
+         name='reconciliation_match_reject'),
+
+    # Operaciones
+    path('ops/jobs/', views.job_runs, name='job_runs'),
 ]
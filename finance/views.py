@@ -2,133 +2,140 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, Avg, Max
 from django import forms
 from django.db import transaction
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, FileResponse, JsonResponse
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from django.template.loader import render_to_string
+from django.urls import reverse
 from io import BytesIO
+from urllib.parse import urlencode
+import json
 import logging
 from pdf_generator.views import generar_pdf_recibo_buffer
-from .models import Payment, Transaction, Receipt
+from core.cache import cached, SUBSCRIPTIONS, PAYMENT_EVENTS, TRANSACTIONS, CLIENTS, APPLICATIONS
+from core.exports import choice_label, export_format, export_response, table_response
+from core.pagination import paginate
+from forgeapp.models import Subscription
+from .models import Payment, Transaction, Receipt, JobRun, ReceivableAging, ReconciliationMatch
 
 logger = logging.getLogger('finance')
 
+MAX_COMPARISON_YEARS = 10
+
 @login_required
 def dashboard(request):
     """Dashboard financiero con KPIs y gráficos"""
     from forgeapp.models import PaymentEvent
-    from datetime import date, timedelta
-
-    # Obtener todas las suscripciones y activas
-    total_subscriptions = Subscription.objects.count()
-    active_subscriptions = Subscription.objects.filter(status='active')
-    active_count = active_subscriptions.count()
-
-    # Calcular MRR (Monthly Recurring Revenue)
-    mrr = active_subscriptions.filter(payment_type='monthly').aggregate(
-        total=Sum('price')
-    )['total'] or 0
-
-    # Calcular cambio en MRR vs mes anterior
-    last_month = timezone.now() - timezone.timedelta(days=30)
-    mrr_last_month = active_subscriptions.filter(
-        payment_type='monthly',
-        created_at__lt=last_month
-    ).aggregate(total=Sum('price'))['total'] or 0
-
-    if mrr_last_month > 0:
-        mrr_change = ((mrr - mrr_last_month) / mrr_last_month) * 100
-    else:
-        mrr_change = 100 if mrr > 0 else 0
-
-    # Calcular tasa de retención
-    total_clients = active_subscriptions.values('client').distinct().count()
-    retained_clients = active_subscriptions.filter(
-        created_at__lt=last_month
-    ).values('client').distinct().count()
-
-    retention_rate = (retained_clients / total_clients * 100) if total_clients > 0 else 0
-
-    # Obtener clientes activos y nuevos
-    active_clients = total_clients
-    new_clients = active_subscriptions.filter(
-        created_at__gte=last_month
-    ).values('client').distinct().count()
-
-    # Calcular valor promedio por cliente
-    avg_client_value = mrr / active_clients if active_clients > 0 else 0
-
-    # Datos para gráficos - usando PaymentEvent con status='paid'
-    monthly_data = []
-    monthly_labels = []
-    for i in range(6):
-        month_start = timezone.now() - timezone.timedelta(days=30 * i)
-        month_end = month_start - timezone.timedelta(days=30)
-        month_total = PaymentEvent.objects.filter(
-            status='paid',
-            paid_date__range=[month_end.date(), month_start.date()]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        monthly_data.append(float(month_total))
-        monthly_labels.append(month_end.strftime('%B'))
-
-    monthly_data.reverse()
-    monthly_labels.reverse()
-
-    # Distribución de pagos
-    monthly_count = active_subscriptions.filter(payment_type='monthly').count()
-    annual_count = active_subscriptions.filter(payment_type='annual').count()
-    payment_distribution = [monthly_count, annual_count]
-
-    # Identificar eventos de pago pendientes (vencidos o próximos)
-    today = date.today()
+    from datetime import date
+    from .metrics import cached_dashboard_metrics
 
     # Eventos de pago pendientes vencidos o que vencen hoy
-    pending_payment_events = PaymentEvent.objects.filter(
+    pending_payment_events = list(PaymentEvent.objects.filter(
         status='pending',
-        expected_date__lte=today
-    ).select_related('subscription', 'subscription__client', 'subscription__application')
+        expected_date__lte=date.today()
+    ).select_related('subscription', 'subscription__client', 'subscription__application'))
 
     return render(request, 'finance/dashboard.html', {
-        'total_subscriptions': total_subscriptions,
-        'active_subscriptions': active_count,
-        'mrr': mrr,
-        'mrr_change': mrr_change,
-        'retention_rate': round(retention_rate, 1),
-        'active_clients': active_clients,
-        'new_clients': new_clients,
-        'avg_client_value': avg_client_value,
-        'monthly_data': monthly_data,
-        'monthly_labels': monthly_labels,
-        'payment_distribution': payment_distribution,
+        **cached_dashboard_metrics(),
         'pending_payments': pending_payment_events
     })
 
 @login_required
-def payment_list(request):
-    """Lista de pagos con filtros"""
+def dashboard_metrics_data(request):
+    """Métricas del dashboard en JSON"""
+    from .metrics import cached_dashboard_metrics
+
+    metrics = cached_dashboard_metrics()
+    metrics['mrr'] = float(metrics['mrr'])
+    metrics['avg_client_value'] = float(metrics['avg_client_value'])
+    return JsonResponse(metrics)
+
+@login_required
+def revenue_snapshots_data(request):
+    """
+    Serie diaria de MRR, ARR y churn desde las fotografías (RevenueSnapshot) en JSON.
+    Parámetros: ?days= (90 por defecto, máximo 730) y ?application= (totales si se omite).
+    """
+    from datetime import timedelta
+    from .snapshots import snapshot_series
+
+    try:
+        days = max(1, min(int(request.GET.get('days', 90)), 730))
+    except ValueError:
+        days = 90
+    application_id = request.GET.get('application') or None
+
+    end = timezone.localdate()
+    series = snapshot_series(end - timedelta(days=days), end, application_id)
+
+    return JsonResponse({
+        'dates': [row['date'].isoformat() for row in series],
+        'mrr': [float(row['mrr']) for row in series],
+        'arr': [float(row['arr']) for row in series],
+        'active_subscriptions': [row['active_subscriptions'] for row in series],
+        'new_subscriptions': [row['new_subscriptions'] for row in series],
+        'churned_subscriptions': [row['churned_subscriptions'] for row in series],
+        'active_clients': [row['active_clients'] for row in series],
+    })
+
+def _filter_payments(params):
+    """Pagos filtrados por suscripción, estado y rango de fechas (lista y exportación)"""
     payments = Payment.objects.all()
 
     # Filtrar por suscripción
-    subscription_id = request.GET.get('subscription')
+    subscription_id = params.get('subscription')
     if subscription_id:
         payments = payments.filter(subscription_id=subscription_id)
 
     # Filtrar por estado
-    status = request.GET.get('status')
+    status = params.get('status')
     if status:
         payments = payments.filter(status=status)
 
     # Filtrar por fecha
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
     if start_date and end_date:
         payments = payments.filter(payment_date__range=[start_date, end_date])
 
+    return payments.order_by('-payment_date')
+
+PAYMENT_EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Suscripción', 'subscription__reference_id'),
+    ('Cliente', 'subscription__client__name'),
+    ('Aplicación', 'subscription__application__name'),
+    ('Monto', 'amount'),
+    ('Vencimiento', 'due_date'),
+    ('Fecha de Pago', 'payment_date'),
+    ('Estado', 'status', choice_label(Payment.STATUS_CHOICES)),
+    ('Método de Pago', 'payment_method__name'),
+    ('ID de Transacción', 'transaction_id'),
+]
+
+@login_required
+def payment_list(request):
+    """
+    Lista de pagos con filtros, paginada por cursor.
+    Con ?format=csv|xlsx exporta el listado filtrado.
+    """
+    payments = _filter_payments(request.GET)
+
+    file_format = export_format(request)
+    if file_format:
+        return export_response(payments, PAYMENT_EXPORT_COLUMNS, 'pagos', file_format)
+
+    page = paginate(
+        request, payments.select_related('subscription__client', 'subscription__application', 'payment_method'),
+        ['-payment_date', '-pk']
+    )
+
     return render(request, 'finance/payment_list.html', {
-        'payments': payments.order_by('-payment_date')
+        'payments': page.items,
+        'page': page
     })
 
 @login_required
@@ -336,18 +343,16 @@ def register_subscription_payment(request, subscription_id):
     NOTA: Esta función está deprecada. Usa la vista mark_payment_event_paid en forgeapp
     que maneja PaymentEvent en lugar de Payment.
     """
-    from forgeapp.models import PaymentEvent
     from datetime import date
 
-    subscription = get_object_or_404(Subscription, pk=subscription_id)
+    subscription = get_object_or_404(
+        Subscription.objects.select_related('next_payment_event'), pk=subscription_id
+    )
 
     try:
         with transaction.atomic():
-            # Obtener el evento de pago pendiente más antiguo
-            payment_event = PaymentEvent.objects.filter(
-                subscription=subscription,
-                status='pending'
-            ).order_by('expected_date').first()
+            # Evento de pago pendiente más antiguo, mantenido en la suscripción
+            payment_event = subscription.next_payment_event
 
             if not payment_event:
                 messages.error(request, 'No hay eventos de pago pendientes para esta suscripción')
@@ -365,14 +370,13 @@ def register_subscription_payment(request, subscription_id):
 
     return redirect('forgeapp:subscription_detail', pk=subscription_id)
 
-@login_required
-def monthly_report(request):
-    """Reporte mensual de ingresos y pagos"""
+def _monthly_report_events(params):
+    """Período del reporte mensual (por defecto el mes actual) y sus eventos de pago pagados"""
     from forgeapp.models import PaymentEvent
 
     # Filtros de fecha
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
 
     if not start_date or not end_date:
         # Por defecto, mostrar el mes actual
@@ -386,49 +390,95 @@ def monthly_report(request):
         status='paid'
     ).select_related('subscription__client', 'subscription__application')
 
-    # Calcular totales
-    total = payment_events.aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    return start_date, end_date, payment_events
+
+PAYMENT_EVENT_EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Suscripción', 'subscription__reference_id'),
+    ('Cliente', 'subscription__client__name'),
+    ('RUT', 'subscription__client__rut'),
+    ('Aplicación', 'subscription__application__name'),
+    ('Tipo de Pago', 'subscription__payment_type', choice_label(Subscription.PAYMENT_TYPE_CHOICES)),
+    ('Fecha Esperada', 'expected_date'),
+    ('Fecha de Pago', 'paid_date'),
+    ('Monto', 'amount'),
+    ('Notas', 'notes'),
+]
+
+@login_required
+def monthly_report(request):
+    """
+    Reporte mensual de ingresos y pagos.
+    Con ?format=csv|xlsx exporta los eventos de pago del período.
+    """
+    start_date, end_date, payment_events = _monthly_report_events(request.GET)
+
+    file_format = export_format(request)
+    if file_format:
+        return export_response(
+            payment_events.order_by('paid_date', 'pk'), PAYMENT_EVENT_EXPORT_COLUMNS,
+            f'eventos_pago_{start_date}_{end_date}', file_format
+        )
+
+    # Calcular totales y estadísticas en una sola consulta
+    stats = payment_events.aggregate(
+        total=Sum('amount'),
+        average=Avg('amount'),
+        count=Count('pk'),
+        clients=Count('subscription__client', distinct=True),
+        applications=Count('subscription__application', distinct=True)
+    )
 
     return render(request, 'finance/reports/monthly.html', {
-        'payment_events': payment_events,
-        'total': total,
+        'payment_events': payment_events.order_by('-paid_date'),
+        'total': stats['total'] or 0,
+        'stats': stats,
         'start_date': start_date,
         'end_date': end_date,
     })
 
 @login_required
 def annual_report(request):
-    """Reporte anual con tendencias y comparativas"""
-    from forgeapp.models import PaymentEvent
-
-    # Obtener año del reporte
-    year = int(request.GET.get('year', timezone.now().year))
-
-    # Calcular totales mensuales
-    monthly_totals = []
-    total_year = 0
-
-    for month in range(1, 13):
-        month_payment_events = PaymentEvent.objects.filter(
-            paid_date__year=year,
-            paid_date__month=month,
-            status='paid'
-        )
-        month_total = month_payment_events.aggregate(total=Sum('amount'))['total'] or 0
-        total_year += month_total
+    """
+    Reporte anual: ingresos por mes de uno o varios años lado a lado, con variación
+    respecto del año anterior. Parámetros: ?years= (repetible; por defecto el año actual y
+    el anterior), ?year= (un año y el anterior) y ?breakdown=application|client.
+    """
+    from finance.rollup import revenue_comparison, rollup_years
 
-        if month_total > 0:
-            monthly_totals.append({
-                'month': month,
-                'total': month_total
-            })
+    current_year = timezone.now().year
+    try:
+        years = [int(year) for year in request.GET.getlist('years') if year]
+        if not years and request.GET.get('year'):
+            year = int(request.GET['year'])
+            years = [year - 1, year]
+    except ValueError:
+        years = []
+    years = sorted(set(years or [current_year - 1, current_year]))[-MAX_COMPARISON_YEARS:]
+    breakdown = request.GET.get('breakdown') or None
+
+    # Una consulta agrupada sobre el resumen mensual de ingresos, sin importar cuántos años
+    comparison = cached(
+        'finance:annual_report', [PAYMENT_EVENTS, APPLICATIONS, CLIENTS],
+        lambda: revenue_comparison(years, breakdown),
+        '-'.join(map(str, years)), breakdown
+    )
+    available_years = cached('finance:rollup_years', [PAYMENT_EVENTS], rollup_years)
+
+    chart_datasets = [
+        {
+            'label': str(year),
+            'data': [float(row['cells'][position]['total']) for row in comparison['months']],
+        }
+        for position, year in enumerate(comparison['years'])
+    ]
 
     return render(request, 'finance/reports/annual.html', {
-        'year': year,
-        'monthly_totals': monthly_totals,
-        'total_year': total_year,
+        'comparison': comparison,
+        'chart_datasets': json.dumps(chart_datasets),
+        'selected_years': years,
+        'year_options': sorted(set(available_years) | set(years) | {current_year}, reverse=True),
+        'breakdown': breakdown,
     })
 
 @login_required
@@ -467,11 +517,181 @@ def cash_flow_report(request):
         'balance': balance,
     })
 
+def _forecast_months(request):
+    """Horizonte de la proyección desde ?months= (12 por defecto)"""
+    try:
+        return int(request.GET.get('months', 12))
+    except ValueError:
+        return 12
+
+def _cached_forecast(months):
+    """forecast_revenue() desde la caché versionada (una entrada por horizonte y día)"""
+    from .forecast import forecast_revenue
+
+    today = timezone.localdate()
+    return cached(
+        'finance:forecast', [SUBSCRIPTIONS, PAYMENT_EVENTS, APPLICATIONS],
+        lambda: forecast_revenue(months, today),
+        months, today
+    )
+
 @login_required
-def transaction_list(request):
-    """Lista de transacciones con filtros y totales"""
+def revenue_forecast(request):
+    """Proyección de ingresos por suscripciones para los próximos meses"""
+    from .forecast import MAX_HORIZON_MONTHS
+
+    forecast = _cached_forecast(_forecast_months(request))
+
+    return render(request, 'finance/reports/forecast.html', {
+        'forecast': forecast,
+        'month_rows': zip(forecast['months'], forecast['totals']),
+        'horizon': len(forecast['months']),
+        'horizon_options': [6, 12, 18, MAX_HORIZON_MONTHS],
+    })
+
+@login_required
+def revenue_forecast_data(request):
+    """Proyección de ingresos en JSON, agrupada por mes y aplicación"""
+    forecast = _cached_forecast(_forecast_months(request))
+
+    return JsonResponse({
+        'months': [month.strftime('%Y-%m') for month in forecast['months']],
+        'applications': [
+            {
+                'id': application['id'],
+                'name': application['name'],
+                'amounts': [float(amount) for amount in application['amounts']],
+                'total': float(application['total']),
+            }
+            for application in forecast['applications']
+        ],
+        'totals': [float(total) for total in forecast['totals']],
+        'total': float(forecast['total']),
+        'subscriptions': forecast['subscriptions'],
+    })
+
+@login_required
+def cohort_retention(request):
+    """
+    Retención de clientes por cohorte (mes de primera activación).
+    Con ?format=csv|xlsx descarga la matriz.
+    """
+    from .cohorts import cohort_matrix, MAX_COHORTS
+
+    try:
+        cohorts = max(1, min(int(request.GET.get('months', 12)), MAX_COHORTS))
+    except ValueError:
+        cohorts = 12
+    today = timezone.localdate()
+
+    matrix = cached(
+        'finance:cohorts', [SUBSCRIPTIONS, PAYMENT_EVENTS],
+        lambda: cohort_matrix(cohorts, today),
+        cohorts, today
+    )
+
+    file_format = export_format(request)
+    if file_format:
+        header = ['Cohorte', 'Clientes'] + [f'Mes {offset}' for offset in matrix['offsets']]
+        rows = (
+            [cohort['month'].strftime('%Y-%m'), cohort['size']]
+            + [round(rate, 1) if rate is not None else None for rate in cohort['rates']]
+            for cohort in matrix['cohorts']
+        )
+        return table_response(header, rows, 'retencion_cohortes', file_format)
+
+    return render(request, 'finance/reports/cohorts.html', {
+        'matrix': matrix,
+        'cohorts': cohorts,
+        'cohort_options': [6, 12, 24, MAX_COHORTS],
+    })
+
+@login_required
+def receivables_aging(request):
+    """
+    Antigüedad de cuentas por cobrar por cliente y aplicación.
+    Se lee del resumen ReceivableAging, por lo que no recorre el historial de PaymentEvent.
+    """
+    context = cached('finance:receivables_aging', [PAYMENT_EVENTS, CLIENTS, APPLICATIONS], _aging_context)
+    return render(request, 'finance/reports/aging.html', context)
+
+def _aging_context():
+    """Totales, agrupaciones por cliente y por aplicación del resumen ReceivableAging"""
+    buckets = ReceivableAging.BUCKET_FIELDS
+    rows = ReceivableAging.objects.select_related('client', 'application')
+
+    totals = rows.aggregate(pending_count=Sum('pending_count'), **{bucket: Sum(bucket) for bucket in buckets})
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['overdue'] = sum(totals[bucket] for bucket in buckets[1:])
+    totals['total'] = totals['current'] + totals['overdue']
+
+    def grouped(*fields):
+        return rows.values(*fields).annotate(
+            pending_count=Sum('pending_count'),
+            **{bucket: Sum(bucket) for bucket in buckets}
+        ).order_by(*fields)
+
+    by_client = list(grouped('client_id', 'client__name'))
+    by_application = list(grouped('application_id', 'application__name'))
+    for group in by_client + by_application:
+        group['overdue'] = sum(group[bucket] for bucket in buckets[1:])
+        group['total'] = group['current'] + group['overdue']
+
+    # Mayor deuda vencida primero
+    by_client.sort(key=lambda group: group['overdue'], reverse=True)
+    by_application.sort(key=lambda group: group['overdue'], reverse=True)
+
+    return {
+        'totals': totals,
+        'by_client': by_client,
+        'by_application': by_application,
+        'as_of': rows.aggregate(as_of=Max('as_of'))['as_of'],
+    }
+
+def _filter_transactions(params):
+    """Transacciones filtradas por tipo, categoría y rango de fechas (lista y exportación)"""
     transactions = Transaction.objects.all()
 
+    if params.get('type'):
+        transactions = transactions.filter(type=params['type'])
+
+    if params.get('category'):
+        transactions = transactions.filter(category__icontains=params['category'])
+
+    # Categoría exacta (enlaces de detalle del resumen por categoría)
+    if params.get('category_exact'):
+        transactions = transactions.filter(category=params['category_exact'])
+
+    # Cuenta de origen de los movimientos importados desde cartolas
+    if params.get('source_account'):
+        transactions = transactions.filter(source_account=params['source_account'])
+
+    if params.get('start_date') and params.get('end_date'):
+        transactions = transactions.filter(
+            date__range=[params['start_date'], params['end_date']]
+        )
+
+    return transactions
+
+TRANSACTION_EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Fecha', 'date'),
+    ('Tipo', 'type', choice_label(Transaction.TYPE_CHOICES)),
+    ('Categoría', 'category'),
+    ('Descripción', 'description'),
+    ('Monto', 'amount'),
+    ('Pago', 'payment_id'),
+    ('Cuenta de Origen', 'source_account'),
+    ('Notas', 'notes'),
+]
+
+@login_required
+def transaction_list(request):
+    """
+    Lista de transacciones con filtros y totales, paginada por cursor.
+    Con ?format=csv|xlsx exporta el listado filtrado.
+    """
+
     # Crear formulario de filtros
     class FilterForm(forms.Form):
         type = forms.ChoiceField(
@@ -493,17 +713,12 @@ def transaction_list(request):
         )
 
     form = FilterForm(request.GET)
+    transactions = _filter_transactions(request.GET)
 
-    # Aplicar filtros
-    if request.GET.get('type'):
-        transactions = transactions.filter(type=request.GET['type'])
-    
-    if request.GET.get('category'):
-        transactions = transactions.filter(category__icontains=request.GET['category'])
-    
-    if request.GET.get('start_date') and request.GET.get('end_date'):
-        transactions = transactions.filter(
-            date__range=[request.GET['start_date'], request.GET['end_date']]
+    file_format = export_format(request)
+    if file_format:
+        return export_response(
+            transactions.order_by('-date', '-pk'), TRANSACTION_EXPORT_COLUMNS, 'transacciones', file_format
         )
 
     # Calcular totales
@@ -519,8 +734,11 @@ def transaction_list(request):
     margin = total_income - total_expenses
     margin_percentage = (margin / total_income * 100) if total_income > 0 else 0
 
+    page = paginate(request, transactions, ['-date', '-pk'])
+
     return render(request, 'finance/transaction_list.html', {
-        'transactions': transactions.order_by('-date'),
+        'transactions': page.items,
+        'page': page,
         'form': form,
         'total_income': total_income,
         'total_expenses': total_expenses,
@@ -530,50 +748,50 @@ def transaction_list(request):
 
 @login_required
 def transaction_summary(request):
-    """Resumen anual de gastos e ingresos"""
+    """
+    Resumen anual de ingresos y egresos por categoría y mes.
+    Con ?format=csv|xlsx descarga la tabla dinámica.
+    """
+    from .pivot import transaction_pivot
+
     # Obtener año del reporte (por defecto el año actual)
-    year = int(request.GET.get('year', timezone.now().year))
-    
-    # Preparar datos mensuales
-    monthly_data = []
-    total_income = 0
-    total_expenses = 0
-    
-    for month in range(1, 13):
-        # Obtener transacciones del mes
-        month_transactions = Transaction.objects.filter(
-            date__year=year,
-            date__month=month
+    try:
+        year = int(request.GET.get('year', timezone.now().year))
+    except ValueError:
+        year = timezone.now().year
+
+    summary = cached('finance:transaction_summary', [TRANSACTIONS], lambda: transaction_pivot(year), year)
+
+    file_format = export_format(request)
+    if file_format:
+        header = ['Tipo', 'Categoría'] + [f'{year}-{month:02d}' for month in range(1, 13)] + ['Total']
+        rows = []
+        for section in summary['sections']:
+            for row in section['rows']:
+                rows.append(
+                    [section['label'], row['category']]
+                    + [cell['amount'] for cell in row['cells']]
+                    + [row['total']]
+                )
+            rows.append(
+                [section['label'], 'Total']
+                + [cell['amount'] for cell in section['totals']]
+                + [section['total']]
+            )
+        rows.append(
+            ['Balance', '']
+            + [month['balance'] for month in summary['monthly_data']]
+            + [summary['total_balance']]
         )
-        
-        # Calcular totales del mes
-        month_income = month_transactions.filter(type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        month_expenses = month_transactions.filter(type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Actualizar totales anuales
-        total_income += month_income
-        total_expenses += month_expenses
-        
-        # Agregar datos del mes
-        monthly_data.append({
-            'month': month,
-            'month': month,
-            'income': month_income,
-            'expenses': month_expenses,
-            'balance': month_income - month_expenses
-        })
+        return table_response(header, rows, f'resumen_transacciones_{year}', file_format)
+
+    years = {day.year for day in Transaction.objects.dates('date', 'year')}
+    years.add(year)
 
     return render(request, 'finance/transaction_summary.html', {
         'year': year,
-        'monthly_data': monthly_data,
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'total_balance': total_income - total_expenses
+        'years': sorted(years, reverse=True),
+        **summary
     })
 
 @login_required
@@ -612,6 +830,100 @@ def transaction_create(request):
         'transaction': None
     })
 
+@login_required
+def transaction_import(request):
+    """Importa los movimientos de una cartola bancaria (CSV u OFX) como transacciones"""
+    from .bank_import import StatementError, import_statement, open_statement, statement_rows
+    from .forms import BankStatementImportForm
+
+    form = BankStatementImportForm(request.POST or None, request.FILES or None)
+    if request.method == 'POST' and form.is_valid():
+        data = form.cleaned_data
+        stream = open_statement(data['file'])
+        try:
+            result = import_statement(
+                statement_rows(stream, data['file_format']),
+                data['account'],
+                income_category=data['income_category'],
+                expense_category=data['expense_category']
+            )
+        except StatementError as e:
+            for error in e.errors:
+                messages.error(request, error)
+        else:
+            messages.success(
+                request,
+                f"Cartola importada: {result['created']} movimientos nuevos, "
+                f"{result['duplicates']} ya registrados"
+                + (f", {result['manual']} ya ingresados a mano" if result['manual'] else '')
+                + (f", {result['skipped']} con monto cero omitidos" if result['skipped'] else '')
+            )
+            return redirect(f"{reverse('finance:transaction_list')}?{urlencode({'source_account': data['account']})}")
+
+    return render(request, 'finance/transaction_import.html', {'form': form})
+
+@login_required
+def reconciliation(request):
+    """
+    Conciliación de ingresos con eventos de pago pendientes: ejecuta la conciliación de un
+    rango de fechas (por defecto el mes actual) y muestra la cola de coincidencias por revisar.
+    """
+    from dateutil.relativedelta import relativedelta
+    from .forms import ReconciliationForm
+    from .reconciliation import reconcile
+
+    if request.method == 'POST':
+        form = ReconciliationForm(request.POST)
+        if form.is_valid():
+            result = reconcile(form.cleaned_data['start_date'], form.cleaned_data['end_date'])
+            messages.success(
+                request,
+                f"Conciliación terminada: {result['matched']} ingresos conciliados automáticamente, "
+                f"{result['review']} por revisar y {result['unmatched']} sin coincidencias "
+                f"de {result['transactions']} revisados"
+            )
+            return redirect('finance:reconciliation')
+    else:
+        first_day = timezone.localdate().replace(day=1)
+        form = ReconciliationForm(initial={
+            'start_date': first_day,
+            'end_date': first_day + relativedelta(months=1, days=-1),
+        })
+
+    matches = ReconciliationMatch.objects.filter(status='pending').select_related(
+        'transaction', 'payment_event__subscription__client', 'payment_event__subscription__application'
+    )
+    page = paginate(request, matches, ['-transaction__date', '-transaction_id', '-score'])
+
+    return render(request, 'finance/reconciliation.html', {
+        'form': form,
+        'matches': page.items,
+        'page': page,
+        'pending_count': matches.values('transaction').distinct().count(),
+        'reconciled_count': Transaction.objects.filter(payment_event__isnull=False).count(),
+    })
+
+@login_required
+def reconciliation_match_resolve(request, pk, action):
+    """Acepta o rechaza una coincidencia de la cola de revisión"""
+    from .reconciliation import accept_match, reject_match
+
+    match = get_object_or_404(ReconciliationMatch, pk=pk)
+    if request.method == 'POST':
+        if action == 'accept':
+            if accept_match(match):
+                messages.success(request, 'Coincidencia aceptada: el evento de pago quedó marcado como pagado')
+            else:
+                messages.warning(request, 'El ingreso ya estaba conciliado o el evento de pago ya no está pendiente')
+        elif reject_match(match):
+            messages.success(request, 'Coincidencia rechazada')
+
+    # Volver a la misma página de la cola (el cursor viaja en ?next=)
+    next_url = request.POST.get('next', '')
+    if next_url.startswith('?'):
+        return redirect(f"{reverse('finance:reconciliation')}{next_url}")
+    return redirect('finance:reconciliation')
+
 @login_required
 def transaction_update(request, pk):
     """Actualizar una transacción existente"""
@@ -648,5 +960,50 @@ def transaction_delete(request, pk):
         'transaction': transaction
     })
 
-# Add the missing import for Subscription
-from forgeapp.models import Subscription
+@login_required
+def job_runs(request):
+    """Panel de operaciones: historial y tendencia de duración de las tareas programadas"""
+    from collections import defaultdict
+    from datetime import timedelta
+
+    now = timezone.now()
+    last_week = now - timedelta(days=7)
+    last_month = now - timedelta(days=30)
+
+    # Resumen por tarea en una sola consulta agrupada
+    summary = list(JobRun.objects.values('job_name').annotate(
+        total_runs=Count('id'),
+        last_started=Max('started_at'),
+        errors_month=Count('id', filter=Q(status='error', started_at__gte=last_month)),
+        avg_week=Avg('duration_ms', filter=Q(status='success', started_at__gte=last_week)),
+        avg_month=Avg('duration_ms', filter=Q(status='success', started_at__gte=last_month)),
+        max_month=Max('duration_ms', filter=Q(started_at__gte=last_month)),
+        rows_updated_month=Sum('rows_updated', filter=Q(started_at__gte=last_month)),
+    ).order_by('job_name'))
+
+    # Variación de la duración promedio de la última semana respecto del último mes
+    for row in summary:
+        if row['avg_week'] and row['avg_month']:
+            row['trend'] = (row['avg_week'] - row['avg_month']) / row['avg_month'] * 100
+        else:
+            row['trend'] = None
+
+    # Serie de duraciones de los últimos 30 días para el gráfico
+    series = defaultdict(list)
+    for job_name, started_at, duration_ms in JobRun.objects.filter(
+        started_at__gte=last_month,
+        duration_ms__isnull=False
+    ).order_by('started_at').values_list('job_name', 'started_at', 'duration_ms'):
+        series[job_name].append({'x': int(started_at.timestamp() * 1000), 'y': duration_ms})
+
+    recent_runs = JobRun.objects.all()
+    job_name = request.GET.get('job')
+    if job_name:
+        recent_runs = recent_runs.filter(job_name=job_name)
+
+    return render(request, 'finance/ops/job_runs.html', {
+        'summary': summary,
+        'duration_series': dict(series),
+        'recent_runs': recent_runs[:50],
+        'selected_job': job_name,
+    })
@@ -1,6 +1,7 @@
 # forgeapp/admin.py
-from django.contrib import admin
-from .models import Application, Client, Subscription, ApplicationConfig, PaymentEvent
+from django.contrib import admin, messages
+from .models import Application, Client, Subscription, ApplicationConfig, PaymentEvent, ReferenceSequence
+from . import services
 
 class ApplicationConfigInline(admin.TabularInline):
     model = ApplicationConfig
@@ -23,24 +24,45 @@ class ClientAdmin(admin.ModelAdmin):
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
-    list_display = ('client', 'application', 'status', 'price', 'start_date', 'auto_renewal', 'get_current_period_end', 'get_grace_period_end')
+    list_display = ('client', 'application', 'status', 'price', 'start_date', 'auto_renewal', 'current_period_end', 'grace_period_end')
     search_fields = ('client__name', 'application__name', 'reference_id')
-    list_filter = ('status', 'payment_type', 'auto_renewal', 'start_date')
+    list_filter = ('status', 'payment_type', 'auto_renewal', 'start_date', 'current_period_end')
+    list_select_related = ('client', 'application')
+    readonly_fields = ('current_period_end', 'grace_period_end', 'next_payment_event', 'activated_at', 'churned_at')
     autocomplete_fields = ['client', 'application']
+    actions = ['activate_subscriptions', 'deactivate_subscriptions', 'cancel_subscriptions', 'renew_subscriptions']
 
-    def get_current_period_end(self, obj):
-        """Muestra la fecha de fin del período actual"""
-        if obj.current_period_end:
-            return obj.current_period_end.strftime('%d/%m/%Y')
-        return '-'
-    get_current_period_end.short_description = 'Próxima Renovación'
+    def _run_bulk_action(self, request, queryset, operation, verb):
+        selected = queryset.count()
+        changed = operation(queryset)
+        self.message_user(request, f"{changed} de {selected} suscripción(es) {verb}", messages.SUCCESS)
+        if changed < selected:
+            self.message_user(
+                request,
+                f"{selected - changed} suscripción(es) se omitieron por no estar en un estado válido para la transición",
+                messages.WARNING
+            )
 
-    def get_grace_period_end(self, obj):
-        """Muestra la fecha de fin del período de gracia"""
-        if obj.grace_period_end:
-            return obj.grace_period_end.strftime('%d/%m/%Y')
-        return '-'
-    get_grace_period_end.short_description = 'Fin Período de Gracia'
+    @admin.action(description='Activar suscripciones seleccionadas')
+    def activate_subscriptions(self, request, queryset):
+        self._run_bulk_action(request, queryset, services.bulk_activate, 'activadas')
+
+    @admin.action(description='Desactivar suscripciones seleccionadas')
+    def deactivate_subscriptions(self, request, queryset):
+        self._run_bulk_action(request, queryset, services.bulk_deactivate, 'desactivadas')
+
+    @admin.action(description='Cancelar suscripciones seleccionadas')
+    def cancel_subscriptions(self, request, queryset):
+        self._run_bulk_action(request, queryset, services.bulk_cancel, 'canceladas')
+
+    @admin.action(description='Renovar suscripciones seleccionadas')
+    def renew_subscriptions(self, request, queryset):
+        self._run_bulk_action(request, queryset, services.bulk_renew, 'renovadas')
+
+@admin.register(ReferenceSequence)
+class ReferenceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'last_value')
+    readonly_fields = ('prefix',)
 
 @admin.register(PaymentEvent)
 class PaymentEventAdmin(admin.ModelAdmin):
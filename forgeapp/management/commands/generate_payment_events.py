@@ -0,0 +1,58 @@
+# forgeapp/management/commands/generate_payment_events.py
+from django.core.management.base import BaseCommand
+import logging
+
+logger = logging.getLogger('forgeapp')
+
+
+class Command(BaseCommand):
+    help = 'Genera en bloque los eventos de pago pendientes del ciclo de facturación de las suscripciones activas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántos eventos se generarían sin realizar cambios',
+        )
+        parser.add_argument(
+            '--days-ahead',
+            type=int,
+            default=0,
+            help='Genera también los eventos cuya fecha esperada cae dentro de los próximos N días (por defecto 0)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Cantidad de eventos por cada INSERT (por defecto 500)',
+        )
+
+    def handle(self, *args, **options):
+        from forgeapp.services import generate_payment_events
+        from finance.telemetry import track_job
+
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY RUN - No se realizarán cambios'))
+            result = generate_payment_events(days_ahead=options['days_ahead'], dry_run=True)
+        else:
+            with track_job('generate_payment_events') as run:
+                result = generate_payment_events(
+                    days_ahead=options['days_ahead'],
+                    batch_size=options['batch_size']
+                )
+                run.rows_scanned = run.rows_updated = result['created']
+
+        if result['created'] == 0:
+            self.stdout.write(self.style.SUCCESS('No hay eventos de pago por generar'))
+            return
+
+        prefix = '[DRY RUN] ' if dry_run else ''
+        verb = 'se generarían' if dry_run else 'generados'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{prefix}{result['created']} evento(s) de pago {verb}: "
+                f"{result['advance']} pago(s) adelantado(s), {result['renewal']} renovación(es)"
+            )
+        )
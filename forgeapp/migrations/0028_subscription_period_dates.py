@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0027_client_optional_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='current_period_end',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='Próxima Renovación'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='grace_period_end',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='Fin Período de Gracia'),
+        ),
+    ]
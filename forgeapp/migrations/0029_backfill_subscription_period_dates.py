@@ -0,0 +1,43 @@
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from django.db import migrations
+
+BATCH_SIZE = 500
+GRACE_PERIOD_DAYS = 15
+
+
+def backfill_period_dates(apps, schema_editor):
+    """Calcula current_period_end y grace_period_end para las suscripciones existentes, en lotes"""
+    Subscription = apps.get_model('forgeapp', 'Subscription')
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Subscription.objects.filter(pk__gt=last_pk, start_date__isnull=False)
+            .only('pk', 'start_date', 'payment_type')
+            .order_by('pk')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+
+        for subscription in batch:
+            if subscription.payment_type == 'monthly':
+                period = relativedelta(months=1)
+            else:
+                period = relativedelta(years=1)
+            subscription.current_period_end = subscription.start_date + period
+            subscription.grace_period_end = subscription.current_period_end + timedelta(days=GRACE_PERIOD_DAYS)
+
+        Subscription.objects.bulk_update(batch, ['current_period_end', 'grace_period_end'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0028_subscription_period_dates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_period_dates, reverse_code=migrations.RunPython.noop),
+    ]
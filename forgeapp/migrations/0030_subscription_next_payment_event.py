@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0029_backfill_subscription_period_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='next_payment_event',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='forgeapp.paymentevent', verbose_name='Próximo Evento de Pago'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentevent',
+            index=models.Index(fields=['subscription', 'status', 'expected_date'], name='forgeapp_pe_sub_status_exp'),
+        ),
+    ]
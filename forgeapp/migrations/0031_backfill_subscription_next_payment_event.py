@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_next_payment_event(apps, schema_editor):
+    """Apunta cada suscripción a su evento de pago pendiente más próximo"""
+    Subscription = apps.get_model('forgeapp', 'Subscription')
+    PaymentEvent = apps.get_model('forgeapp', 'PaymentEvent')
+
+    next_pending = PaymentEvent.objects.filter(
+        subscription=OuterRef('pk'),
+        status='pending'
+    ).order_by('expected_date', 'pk').values('pk')[:1]
+
+    Subscription.objects.update(next_payment_event=Subquery(next_pending))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0030_subscription_next_payment_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_next_payment_event, reverse_code=migrations.RunPython.noop),
+    ]
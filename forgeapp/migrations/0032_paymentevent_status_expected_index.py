@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0031_backfill_subscription_next_payment_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentevent',
+            index=models.Index(fields=['status', 'expected_date'], name='forgeapp_pe_status_exp'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0032_paymentevent_status_expected_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True, verbose_name='Prefijo')),
+                ('last_value', models.PositiveBigIntegerField(default=0, verbose_name='Último Valor')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Referencia',
+                'verbose_name_plural': 'Secuencias de Referencia',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def seed_reference_sequences(apps, schema_editor):
+    """Inicializa los contadores ME/AN con el mayor número ya usado por cada prefijo"""
+    Subscription = apps.get_model('forgeapp', 'Subscription')
+    ReferenceSequence = apps.get_model('forgeapp', 'ReferenceSequence')
+
+    for prefix in ('ME', 'AN'):
+        numbers = [
+            int(reference_id[len(prefix):])
+            for reference_id in Subscription.objects.filter(
+                reference_id__startswith=prefix
+            ).values_list('reference_id', flat=True).iterator()
+            if reference_id[len(prefix):].isdigit()
+        ]
+        ReferenceSequence.objects.update_or_create(
+            prefix=prefix,
+            defaults={'last_value': max(numbers, default=0)}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0033_referencesequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_reference_sequences, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+def backfill_status_dates(apps, schema_editor):
+    """
+    Aproxima las fechas de activación y baja de las suscripciones existentes: se toma la
+    creación como activación y la última modificación como baja.
+    """
+    Subscription = apps.get_model('forgeapp', 'Subscription')
+    Subscription.objects.exclude(status='pending').update(activated_at=models.F('created_at'))
+    Subscription.objects.filter(status__in=['inactive', 'cancelled', 'expired']).update(churned_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0034_seed_referencesequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Fecha de Activación'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='churned_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Fecha de Baja'),
+        ),
+        migrations.RunPython(backfill_status_dates, reverse_code=migrations.RunPython.noop),
+    ]
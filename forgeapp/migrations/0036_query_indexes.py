@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0035_subscription_activated_churned'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date', 'status', 'start_time', 'is_blocked'], name='forgeapp_appt_date_status'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['created_at'], name='forgeapp_client_created'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['status', 'created_at'], name='forgeapp_msg_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at'], name='forgeapp_msg_created'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentevent',
+            index=models.Index(fields=['status', 'paid_date'], name='forgeapp_pe_status_paid'),
+        ),
+        migrations.AddIndex(
+            model_name='servicecontracttoken',
+            index=models.Index(fields=['client', 'status'], name='forgeapp_token_client_status'),
+        ),
+        migrations.AddIndex(
+            model_name='servicecontracttoken',
+            index=models.Index(fields=['expires_at'], name='forgeapp_token_expires'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['status', 'payment_type', 'created_at'], name='forgeapp_sub_status_type_crt'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['created_at'], name='forgeapp_sub_created'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forgeapp', '0037_client_filter_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['payment_type', 'current_period_end'], name='forgeapp_sub_type_renewal'),
+        ),
+    ]
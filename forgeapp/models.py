@@ -4,7 +4,7 @@ import base64
 import re
 import os
 import json
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from decimal import Decimal, ROUND_UP
@@ -139,6 +139,10 @@ class Client(models.Model):
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='forgeapp_client_created'),
+            models.Index(fields=['status', 'nationality', 'created_at'], name='forgeapp_client_status_nat'),
+        ]
 
     def save(self, *args, **kwargs):
         # Actualizar el campo name a partir de first_name y last_name
@@ -237,17 +241,42 @@ class PaymentEvent(models.Model):
         verbose_name = 'Evento de Pago'
         verbose_name_plural = 'Eventos de Pago'
         ordering = ['-expected_date']
+        indexes = [
+            models.Index(fields=['subscription', 'status', 'expected_date'], name='forgeapp_pe_sub_status_exp'),
+            models.Index(fields=['status', 'expected_date'], name='forgeapp_pe_status_exp'),
+            models.Index(fields=['status', 'paid_date'], name='forgeapp_pe_status_paid'),
+        ]
 
     def __str__(self):
         return f"Evento {self.subscription.reference_id} - {self.expected_date} ({self.get_status_display()})"
 
+    # Campos cuyo valor original se conserva para calcular diferencias en los signals
+    # (la antigüedad de cuentas por cobrar en finance/aging.py y el resumen de ingresos en
+    # finance/rollup.py)
+    TRACKED_FIELDS = ('subscription_id', 'status', 'expected_date', 'paid_date', 'amount')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        """Valores actuales de TRACKED_FIELDS (omite los campos diferidos)"""
+        deferred = self.get_deferred_fields()
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS if field not in deferred}
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = self.tracked_values()
+
     def mark_as_paid(self, paid_date=None):
         """
         Marca el evento como pagado y actualiza la suscripción.
         Si auto_renewal está activo, se genera automáticamente el siguiente evento mediante signals.
         """
         from datetime import date
-        from dateutil.relativedelta import relativedelta
+        from django.db import transaction
 
         if self.status == 'paid':
             logger.warning(f"Evento {self.id} ya está marcado como pagado")
@@ -257,23 +286,73 @@ class PaymentEvent(models.Model):
         if paid_date is None:
             paid_date = date.today()
 
-        self.status = 'paid'
-        self.paid_date = paid_date
-        self.save()
+        with transaction.atomic():
+            # La suscripción se actualiza antes de guardar el evento: el signal que genera el
+            # siguiente evento usa su current_period_end, que debe ser ya el del nuevo período
+            # (igual que forgeapp.services.bulk_mark_paid)
+            subscription = self.subscription
 
-        # Actualizar start_date de la suscripción para reflejar el nuevo período
-        subscription = self.subscription
+            # La nueva fecha de inicio es la fecha esperada de este pago
+            subscription.start_date = self.expected_date
+            subscription.save()
 
-        # Calcular nueva fecha de inicio basada en la fecha esperada de este evento
-        # La nueva fecha de inicio es la fecha esperada de este pago
-        subscription.start_date = self.expected_date
-        subscription.save()
+            self.status = 'paid'
+            self.paid_date = paid_date
+            self.save()
 
         logger.info(f"Evento {self.id} marcado como pagado. Suscripción {subscription.reference_id} actualizada")
 
         # El siguiente evento se genera automáticamente mediante signals si auto_renewal=True
         return True
 
+class ReferenceSequence(models.Model):
+    """
+    Contador por prefijo para los IDs de referencia de suscripciones.
+    Cada reserva incrementa last_value con un UPDATE atómico, por lo que creaciones
+    concurrentes nunca obtienen el mismo número.
+    """
+    prefix = models.CharField('Prefijo', max_length=10, unique=True)
+    last_value = models.PositiveBigIntegerField('Último Valor', default=0)
+
+    class Meta:
+        verbose_name = 'Secuencia de Referencia'
+        verbose_name_plural = 'Secuencias de Referencia'
+
+    def __str__(self):
+        return f"{self.prefix}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, prefix, count=1):
+        """
+        Reserva count valores consecutivos para prefix y retorna el primero.
+        El costo es el mismo para 1 o N valores: un UPDATE que incrementa y bloquea la fila
+        hasta el fin de la transacción, y un SELECT del nuevo valor.
+        """
+        if count < 1:
+            raise ValueError("La cantidad de IDs a reservar debe ser mayor a 0")
+
+        with transaction.atomic():
+            updated = cls.objects.filter(prefix=prefix).update(last_value=models.F('last_value') + count)
+            if not updated:
+                # Primera reserva del prefijo: continuar desde el mayor ID existente
+                cls.objects.get_or_create(prefix=prefix, defaults={'last_value': cls.initial_value(prefix)})
+                cls.objects.filter(prefix=prefix).update(last_value=models.F('last_value') + count)
+            last_value = cls.objects.filter(prefix=prefix).values_list('last_value', flat=True).get()
+
+        return last_value - count + 1
+
+    @staticmethod
+    def initial_value(prefix):
+        """Mayor número usado por las suscripciones existentes con el prefijo"""
+        numbers = [
+            int(reference_id[len(prefix):])
+            for reference_id in Subscription.objects.filter(
+                reference_id__startswith=prefix
+            ).values_list('reference_id', flat=True).iterator()
+            if reference_id[len(prefix):].isdigit()
+        ]
+        return max(numbers, default=0)
+
 class Subscription(models.Model):
     """Modelo para las suscripciones con máquina de estados"""
     STATUS_CHOICES = [
@@ -289,6 +368,15 @@ class Subscription(models.Model):
         ('annual', 'Anual'),
     ]
 
+    # Días de gracia después de la fecha de renovación antes de marcar como EXPIRED
+    GRACE_PERIOD_DAYS = 15
+
+    # Estados de origen permitidos para cada transición de la máquina de estados
+    ACTIVATABLE_STATUSES = ('pending',)
+    DEACTIVATABLE_STATUSES = ('active', 'expired')
+    CANCELLABLE_STATUSES = ('pending', 'active', 'inactive', 'expired')
+    RENEWABLE_STATUSES = ('inactive', 'cancelled', 'expired')
+
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='subscriptions')
     application = models.ForeignKey(Application, on_delete=models.CASCADE)
     status = models.CharField('Estado', max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -296,58 +384,96 @@ class Subscription(models.Model):
     payment_type = models.CharField('Tipo de Pago', max_length=20, choices=PAYMENT_TYPE_CHOICES, default='monthly')
     accept_marketing = models.BooleanField('Acepta Marketing', default=False)
 
-    @staticmethod
-    def generate_reference_id(payment_type, attempt=0):
-        """Genera un ID de referencia único basado en el tipo de pago"""
-        prefix = 'AN' if payment_type == 'annual' else 'ME'
-        
-        # Si es un reintento por colisión, usar un número aleatorio
-        if attempt > 0:
-            import random
-            new_num = random.randint(1, 999999)
+    # Prefijo de reference_id según el tipo de pago
+    REFERENCE_PREFIXES = {
+        'monthly': 'ME',
+        'annual': 'AN',
+    }
+
+    @classmethod
+    def reference_prefix(cls, payment_type):
+        return cls.REFERENCE_PREFIXES.get(payment_type, 'ME')
+
+    @classmethod
+    def reserve_reference_ids(cls, payment_type, count):
+        """
+        Reserva un bloque de count IDs de referencia consecutivos para el tipo de pago
+        (por ejemplo, para importaciones o creación masiva con bulk_create).
+        """
+        prefix = cls.reference_prefix(payment_type)
+        first = ReferenceSequence.reserve(prefix, count)
+        return [f"{prefix}{number:06d}" for number in range(first, first + count)]
+
+    @classmethod
+    def generate_reference_id(cls, payment_type):
+        """Genera el siguiente ID de referencia único para el tipo de pago (ME000001, AN000001, ...)"""
+        return cls.reserve_reference_ids(payment_type, 1)[0]
+
+    # Campos que identifican las filas de los resúmenes de finance (RevenueRollup y
+    # ReceivableAging). Su valor original se conserva para recalcular los resúmenes
+    # anteriores y nuevos cuando cambian (finance/signals.py)
+    TRACKED_FIELDS = ('client_id', 'application_id', 'payment_type')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in instance.__dict__:
+            instance._loaded_status = instance.status
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        """Valores actuales de TRACKED_FIELDS (omite los campos diferidos)"""
+        deferred = self.get_deferred_fields()
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS if field not in deferred}
+
+    def track_status_change(self):
+        """
+        Registra activated_at/churned_at si el estado entra o sale de ACTIVE respecto del
+        valor cargado desde la BD. Retorna los campos modificados.
+        """
+        if self._state.adding:
+            previous = None
+        elif hasattr(self, '_loaded_status'):
+            previous = self._loaded_status
         else:
-            # Obtener el último ID con este prefijo
-            last_sub = Subscription.objects.filter(
-                reference_id__startswith=prefix
-            ).order_by('-reference_id').first()
-            
-            if last_sub:
-                try:
-                    # Extraer el número del último ID
-                    last_num = int(last_sub.reference_id[2:])
-                    new_num = last_num + 1
-                except ValueError:
-                    new_num = 1
-            else:
-                new_num = 1
-        
-        # Formatear el nuevo ID (prefijo + 6 dígitos)
-        reference_id = f"{prefix}{new_num:06d}"
-        
-        # Verificar que sea único
-        if Subscription.objects.filter(reference_id=reference_id).exists():
-            if attempt < 3:  # Máximo 3 intentos
-                return Subscription.generate_reference_id(payment_type, attempt + 1)
-            raise ValueError("No se pudo generar un ID único después de múltiples intentos")
-            
-        return reference_id
+            # Estado no cargado desde la BD (campo diferido): no se puede saber si cambió
+            return set()
+        if previous == self.status:
+            return set()
+        if self.status == 'active':
+            self.activated_at = timezone.now()
+            return {'activated_at'}
+        if previous == 'active':
+            self.churned_at = timezone.now()
+            return {'churned_at'}
+        return set()
 
     def save(self, *args, **kwargs):
-        """Sobreescribe el método save para asegurar reference_id único"""
+        """Sobreescribe el método save para asegurar reference_id único y fechas de período sincronizadas"""
+        self.update_period_dates()
+        status_fields = self.track_status_change()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            update_fields = kwargs['update_fields'] = set(update_fields) | status_fields
+        if update_fields is not None and {'start_date', 'payment_type'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'current_period_end', 'grace_period_end'}
+        elif update_fields is None and not self._state.adding:
+            # next_payment_event solo lo escribe sync_next_payment_events(); un save() completo
+            # hecho con una instancia cargada antes de crear o pagar un evento no debe pisarlo
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'next_payment_event'
+            ]
+
         if not self.reference_id or self.reference_id == 'TEMP000000':
-            max_attempts = 3
-            attempt = 0
-            while attempt < max_attempts:
-                try:
-                    self.reference_id = self.generate_reference_id(self.payment_type)
-                    super().save(*args, **kwargs)
-                    return
-                except Exception as e:
-                    attempt += 1
-                    if attempt == max_attempts:
-                        raise ValueError("No se pudo guardar con un ID único después de múltiples intentos")
-        else:
-            super().save(*args, **kwargs)
+            self.reference_id = self.generate_reference_id(self.payment_type)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'reference_id'}
+
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        self._loaded_values = self.tracked_values()
     price = models.DecimalField('Precio', max_digits=10, decimal_places=2, validators=[
         MinValueValidator(1, message='El precio debe ser mayor a 0')
     ])
@@ -358,6 +484,29 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Última vez que la suscripción pasó a ACTIVE y última vez que dejó de estarlo. Se registran
+    # en save() (track_status_change) y en las operaciones masivas de forgeapp.services, y las
+    # usan las fotografías diarias de MRR/churn (finance/snapshots.py).
+    activated_at = models.DateTimeField('Fecha de Activación', null=True, blank=True, editable=False, db_index=True)
+    churned_at = models.DateTimeField('Fecha de Baja', null=True, blank=True, editable=False, db_index=True)
+
+    # Fechas derivadas de start_date y payment_type, persistidas para poder filtrar y ordenar en la BD.
+    # Se recalculan en save() mediante update_period_dates().
+    current_period_end = models.DateField('Próxima Renovación', null=True, blank=True, editable=False, db_index=True)
+    grace_period_end = models.DateField('Fin Período de Gracia', null=True, blank=True, editable=False, db_index=True)
+
+    # Evento de pago pendiente más próximo, mantenido por forgeapp.services.sync_next_payment_events()
+    # para consultar "qué está por cobrar" sin una subconsulta por fila.
+    next_payment_event = models.ForeignKey(
+        'PaymentEvent',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name='Próximo Evento de Pago'
+    )
+
     # Campos para detalles de items
     items_detail = models.JSONField('Detalles de Items', default=dict, blank=True)
     calculadora = models.ForeignKey(
@@ -372,40 +521,43 @@ class Subscription(models.Model):
         verbose_name = 'Suscripción'
         verbose_name_plural = 'Suscripciones'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'payment_type', 'created_at'], name='forgeapp_sub_status_type_crt'),
+            models.Index(fields=['created_at'], name='forgeapp_sub_created'),
+            models.Index(fields=['payment_type', 'current_period_end'], name='forgeapp_sub_type_renewal'),
+        ]
 
     def __str__(self):
         return f"{self.client.name} - {self.application.name} ({self.get_payment_type_display()})"
 
-    @property
-    def current_period_end(self):
-        """
-        Calcula dinámicamente la fecha de renovación basándose en start_date y payment_type.
-        Esta es la fecha esperada del próximo pago.
-        Retorna None si la suscripción no tiene fecha de inicio (está en PENDING).
-        """
+    @staticmethod
+    def period_delta(payment_type):
+        """Retorna la duración de un período de facturación según el tipo de pago"""
         from dateutil.relativedelta import relativedelta
 
-        if not self.start_date:
-            return None
-
-        if self.payment_type == 'monthly':
-            return self.start_date + relativedelta(months=1)
-        else:  # annual
-            return self.start_date + relativedelta(years=1)
+        if payment_type == 'monthly':
+            return relativedelta(months=1)
+        return relativedelta(years=1)  # annual
 
-    @property
-    def grace_period_end(self):
+    @classmethod
+    def compute_period_dates(cls, start_date, payment_type):
         """
-        Calcula la fecha de fin del período de gracia (15 días después de current_period_end).
-        Solo después de esta fecha la suscripción se marca como EXPIRED.
-        Retorna None si la suscripción no tiene fecha de inicio (está en PENDING).
+        Calcula (current_period_end, grace_period_end) para una fecha de inicio y tipo de pago.
+        current_period_end es la fecha esperada del próximo pago y grace_period_end es
+        GRACE_PERIOD_DAYS días después; solo pasada esa fecha la suscripción se marca como EXPIRED.
+        Retorna (None, None) si no hay fecha de inicio (suscripción en PENDING).
         """
-        from dateutil.relativedelta import relativedelta
+        if not start_date:
+            return None, None
 
-        if not self.current_period_end:
-            return None
+        current_period_end = start_date + cls.period_delta(payment_type)
+        return current_period_end, current_period_end + timedelta(days=cls.GRACE_PERIOD_DAYS)
 
-        return self.current_period_end + relativedelta(days=15)
+    def update_period_dates(self):
+        """Sincroniza current_period_end y grace_period_end con start_date y payment_type"""
+        self.current_period_end, self.grace_period_end = self.compute_period_dates(
+            self.start_date, self.payment_type
+        )
 
     @property
     def is_expired(self):
@@ -466,7 +618,7 @@ class Subscription(models.Model):
         """
         from datetime import date
 
-        if self.status != 'pending':
+        if self.status not in self.ACTIVATABLE_STATUSES:
             logger.warning(f"Intentando activar suscripción {self.reference_id} que no está en estado PENDING")
             return False
 
@@ -484,7 +636,7 @@ class Subscription(models.Model):
         Desactiva la suscripción y elimina eventos de pago pendientes.
         Transición: ACTIVE/EXPIRED -> INACTIVE
         """
-        if self.status not in ['active', 'expired']:
+        if self.status not in self.DEACTIVATABLE_STATUSES:
             logger.warning(f"Intentando desactivar suscripción {self.reference_id} desde estado {self.status}")
             return False
 
@@ -492,6 +644,7 @@ class Subscription(models.Model):
         pending_events = self.payment_events.filter(status='pending')
         count = pending_events.count()
         pending_events.delete()
+        self.next_payment_event = None
 
         self.status = 'inactive'
         self.save()
@@ -504,7 +657,7 @@ class Subscription(models.Model):
         Cancela la suscripción y elimina eventos de pago pendientes.
         Transición: ACTIVE/INACTIVE/EXPIRED -> CANCELLED
         """
-        if self.status == 'cancelled':
+        if self.status not in self.CANCELLABLE_STATUSES:
             logger.warning(f"Suscripción {self.reference_id} ya está cancelada")
             return False
 
@@ -512,6 +665,7 @@ class Subscription(models.Model):
         pending_events = self.payment_events.filter(status='pending')
         count = pending_events.count()
         pending_events.delete()
+        self.next_payment_event = None
 
         self.status = 'cancelled'
         self.cancelled_at = timezone.now().date()
@@ -525,7 +679,7 @@ class Subscription(models.Model):
         Renueva la suscripción actualizando start_date al momento actual y generando nuevo evento.
         Se usa cuando se reactiva una suscripción INACTIVE o CANCELLED.
         """
-        if self.status not in ['inactive', 'cancelled', 'expired']:
+        if self.status not in self.RENEWABLE_STATUSES:
             logger.warning(f"Intentando renovar suscripción {self.reference_id} desde estado {self.status}")
             return False
 
@@ -795,6 +949,10 @@ class ServiceContractToken(models.Model):
         verbose_name = 'Token de Contrato'
         verbose_name_plural = 'Tokens de Contratos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['client', 'status'], name='forgeapp_token_client_status'),
+            models.Index(fields=['expires_at'], name='forgeapp_token_expires'),
+        ]
 
     def __str__(self):
         return f"Token para {self.client.name} - {self.token[:8]}..."
@@ -867,6 +1025,9 @@ class Appointment(models.Model):
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
         ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['date', 'status', 'start_time', 'is_blocked'], name='forgeapp_appt_date_status'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.date} {self.start_time.strftime('%H:%M')}"
@@ -960,6 +1121,10 @@ class ContactMessage(models.Model):
         verbose_name = 'Mensaje de Contacto'
         verbose_name_plural = 'Mensajes de Contacto'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='forgeapp_msg_status_created'),
+            models.Index(fields=['created_at'], name='forgeapp_msg_created'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.email} ({self.get_status_display()})"
@@ -0,0 +1,435 @@
+# forgeapp/services.py
+"""
+Operaciones masivas sobre suscripciones.
+
+Estas funciones trabajan sobre conjuntos de filas con UPDATE en bloque en lugar de
+recorrer instancias y llamar a save() una por una, por lo que no disparan los signals
+post_save de cada suscripción: las que modifican filas invalidan la caché versionada
+(core/cache.py) explícitamente.
+"""
+import logging
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+from core import cache
+from .models import Subscription, PaymentEvent
+from .signals import bulk_operation, payment_events_changed
+
+logger = logging.getLogger('forgeapp')
+
+
+def sync_next_payment_events(subscription_ids=None):
+    """
+    Recalcula Subscription.next_payment_event (evento pendiente con fecha esperada más
+    próxima) con un único UPDATE correlacionado. Sin subscription_ids recalcula todas.
+    Retorna la cantidad de suscripciones actualizadas.
+    """
+    queryset = Subscription.objects.all()
+    if subscription_ids is not None:
+        queryset = queryset.filter(pk__in=list(subscription_ids))
+
+    next_pending = PaymentEvent.objects.filter(
+        subscription=OuterRef('pk'),
+        status='pending'
+    ).order_by('expected_date', 'pk').values('pk')[:1]
+
+    updated = queryset.update(next_payment_event=Subquery(next_pending))
+    cache.bump(cache.SUBSCRIPTIONS)
+    return updated
+
+
+def expired_subscriptions(today=None):
+    """
+    QuerySet de suscripciones activas que ya superaron el período de gracia.
+    Equivale a evaluar Subscription.is_expired fila por fila, pero se resuelve como un
+    rango sobre la columna indexada grace_period_end.
+    """
+    today = today or date.today()
+    return Subscription.objects.filter(status='active', grace_period_end__lt=today)
+
+
+def expire_subscriptions(today=None, dry_run=False, batch_size=500):
+    """
+    Marca como EXPIRED las suscripciones activas que superaron el período de gracia.
+
+    Los cambios se aplican con UPDATE en lotes de batch_size ids, cada uno en su propia
+    transacción corta, para no bloquear el conjunto completo de suscripciones activas.
+    Con dry_run=True solo se cuenta el resultado de la misma consulta.
+
+    Retorna la cantidad de suscripciones marcadas (o que se marcarían) como expiradas.
+    """
+    queryset = expired_subscriptions(today)
+
+    if dry_run:
+        return queryset.count()
+
+    updated = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            now = timezone.now()
+            updated += Subscription.objects.filter(pk__in=ids, status='active').update(
+                status='expired',
+                churned_at=now,
+                updated_at=now
+            )
+
+    if updated:
+        cache.bump(cache.SUBSCRIPTIONS)
+        logger.info(f"Se marcaron {updated} suscripciones como expiradas")
+    return updated
+
+
+def billing_candidates(today=None, days_ahead=0):
+    """
+    QuerySet de suscripciones activas que necesitan un nuevo evento de pago.
+
+    Replica las reglas de los signals de forgeapp/signals.py:
+    - Si el período actual (start_date) aún no tiene un evento pagado, falta el pago
+      adelantado de ese período y la fecha esperada es start_date.
+    - Si el período actual ya está pagado y la suscripción tiene auto_renewal, corresponde
+      el evento del siguiente período con fecha esperada current_period_end.
+
+    Solo se consideran suscripciones sin evento pendiente (next_payment_event vacío) cuya
+    fecha esperada cae dentro de los próximos days_ahead días. Cada fila trae anotado period_paid.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days_ahead)
+
+    period_paid = PaymentEvent.objects.filter(
+        subscription=OuterRef('pk'),
+        status='paid',
+        expected_date=OuterRef('start_date')
+    )
+
+    return Subscription.objects.filter(
+        status='active',
+        start_date__isnull=False,
+        next_payment_event__isnull=True
+    ).annotate(
+        period_paid=Exists(period_paid)
+    ).filter(
+        Q(period_paid=False, start_date__lte=horizon) |
+        Q(period_paid=True, auto_renewal=True, current_period_end__lte=horizon)
+    )
+
+
+def generate_payment_events(today=None, days_ahead=0, dry_run=False, batch_size=500):
+    """
+    Genera en bloque el siguiente evento de pago de cada suscripción de billing_candidates().
+
+    Los eventos se insertan con bulk_create dentro de una sola transacción, por lo que no se
+    ejecutan los signals post_save de PaymentEvent. La operación es idempotente: una vez
+    creado el evento pendiente, la suscripción deja de ser candidata en la siguiente ejecución.
+
+    Al terminar se envía forgeapp.signals.payment_events_changed con las suscripciones afectadas.
+
+    Retorna un dict con 'created' (eventos creados, o que se crearían con dry_run=True),
+    'advance' (pagos adelantados del período actual) y 'renewal' (eventos del siguiente período).
+    """
+    if not dry_run:
+        # Corregir punteros que quedaron apuntando a eventos ya pagados por cambios hechos
+        # con UPDATE en bloque (para que esas suscripciones vuelvan a ser candidatas) o vacíos
+        # en suscripciones que aún tienen eventos pendientes (para no duplicarlos)
+        has_pending = PaymentEvent.objects.filter(subscription=OuterRef('pk'), status='pending')
+        stale = list(
+            Subscription.objects.filter(
+                Q(next_payment_event__status='paid') |
+                Q(Exists(has_pending), next_payment_event__isnull=True)
+            ).values_list('pk', flat=True)
+        )
+        if stale:
+            sync_next_payment_events(stale)
+
+    queryset = billing_candidates(today, days_ahead)
+
+    if dry_run:
+        counts = queryset.aggregate(
+            advance=Count('pk', filter=Q(period_paid=False)),
+            renewal=Count('pk', filter=Q(period_paid=True))
+        )
+        return {'created': counts['advance'] + counts['renewal'], **counts}
+
+    with transaction.atomic():
+        # Bloquear las suscripciones candidatas evita duplicados si otro proceso
+        # genera eventos (o registra un pago) al mismo tiempo
+        rows = list(
+            queryset.select_for_update().values_list(
+                'pk', 'start_date', 'current_period_end', 'price', 'period_paid'
+            )
+        )
+
+        events = [
+            PaymentEvent(
+                subscription_id=pk,
+                expected_date=current_period_end if paid else start_date,
+                amount=price,
+                status='pending',
+                notes=(
+                    'Evento generado automáticamente por el ciclo de facturación'
+                    if paid else
+                    'Evento generado automáticamente por el ciclo de facturación (pago adelantado)'
+                )
+            )
+            for pk, start_date, current_period_end, price, paid in rows
+        ]
+        PaymentEvent.objects.bulk_create(events, batch_size=batch_size)
+        if events:
+            subscription_ids = [row[0] for row in rows]
+            sync_next_payment_events(subscription_ids)
+            payment_events_changed.send(sender=PaymentEvent, subscription_ids=subscription_ids, statuses=('pending',))
+
+    renewal = sum(1 for row in rows if row[4])
+    if events:
+        logger.info(f"Se generaron {len(events)} eventos de pago en bloque ({renewal} renovaciones)")
+    return {'created': len(events), 'advance': len(events) - renewal, 'renewal': renewal}
+
+
+def _subscription_queryset(subscriptions):
+    """Acepta un QuerySet de Subscription o una lista de ids"""
+    if hasattr(subscriptions, 'model'):
+        return subscriptions
+    return Subscription.objects.filter(pk__in=list(subscriptions))
+
+
+def _period_date_values(start_date):
+    """
+    Valores para UPDATE de start_date y de las columnas de período, resueltos con
+    Case sobre payment_type para no tener que cargar cada instancia.
+    """
+    values = {'start_date': start_date}
+    for index, field in enumerate(('current_period_end', 'grace_period_end')):
+        values[field] = Case(
+            *[
+                When(payment_type=payment_type, then=Value(
+                    Subscription.compute_period_dates(start_date, payment_type)[index]
+                ))
+                for payment_type, _ in Subscription.PAYMENT_TYPE_CHOICES
+            ],
+            output_field=Subscription._meta.get_field(field)
+        )
+    return values
+
+
+def _apply_transition(subscriptions, from_statuses, values, delete_pending=False,
+                      create_first_event=False, batch_size=500):
+    """
+    Aplica una transición de estado en lotes de batch_size suscripciones.
+
+    Por lote se ejecuta un número fijo de consultas: selección (con bloqueo) de ids,
+    DELETE de eventos pendientes, UPDATE de la suscripción y, al activar, SELECT + INSERT
+    del primer evento de pago y UPDATE de next_payment_event. Las filas cuyo estado no está en from_statuses se ignoran,
+    igual que en los métodos del modelo. Cada lote termina enviando payment_events_changed.
+    Retorna la cantidad de suscripciones modificadas.
+    """
+    queryset = _subscription_queryset(subscriptions).filter(status__in=from_statuses)
+    changed = 0
+
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.select_for_update().order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            if delete_pending:
+                with bulk_operation():
+                    PaymentEvent.objects.filter(subscription_id__in=ids, status='pending').delete()
+
+            changed += Subscription.objects.filter(pk__in=ids).update(
+                updated_at=timezone.now(),
+                **values
+            )
+            cache.bump(cache.SUBSCRIPTIONS)
+
+            if create_first_event:
+                # Primer pago adelantado, con fecha esperada start_date (ver signals.py)
+                rows = Subscription.objects.filter(pk__in=ids, next_payment_event__isnull=True).values_list(
+                    'pk', 'start_date', 'price'
+                )
+                PaymentEvent.objects.bulk_create([
+                    PaymentEvent(
+                        subscription_id=pk,
+                        expected_date=start_date,
+                        amount=price,
+                        status='pending',
+                        notes='Evento generado automáticamente al activar suscripción (pago adelantado)'
+                    )
+                    for pk, start_date, price in rows
+                ])
+                sync_next_payment_events(ids)
+
+            if delete_pending or create_first_event:
+                payment_events_changed.send(sender=PaymentEvent, subscription_ids=ids, statuses=('pending',))
+
+    return changed
+
+
+def _churn_value():
+    """
+    churned_at para una transición masiva que sale de ACTIVE: solo cambia en las filas que
+    estaban activas. Debe ir antes que status en el UPDATE (MySQL evalúa las asignaciones
+    en orden y vería el estado nuevo).
+    """
+    return Case(When(status='active', then=Value(timezone.now())), default=F('churned_at'))
+
+
+def bulk_activate(subscriptions, batch_size=500):
+    """
+    Activa en bloque las suscripciones en PENDING (ver Subscription.activate).
+    Fija start_date al día actual y genera el primer evento de pago de cada una.
+    """
+    count = _apply_transition(
+        subscriptions,
+        Subscription.ACTIVATABLE_STATUSES,
+        {'status': 'active', 'activated_at': timezone.now(), **_period_date_values(date.today())},
+        create_first_event=True,
+        batch_size=batch_size
+    )
+    logger.info(f"Activación masiva: {count} suscripciones activadas")
+    return count
+
+
+def bulk_deactivate(subscriptions, batch_size=500):
+    """
+    Desactiva en bloque las suscripciones ACTIVE/EXPIRED (ver Subscription.deactivate).
+    Elimina sus eventos de pago pendientes.
+    """
+    count = _apply_transition(
+        subscriptions,
+        Subscription.DEACTIVATABLE_STATUSES,
+        {'churned_at': _churn_value(), 'status': 'inactive'},
+        delete_pending=True,
+        batch_size=batch_size
+    )
+    logger.info(f"Desactivación masiva: {count} suscripciones desactivadas")
+    return count
+
+
+def bulk_cancel(subscriptions, batch_size=500):
+    """
+    Cancela en bloque las suscripciones que no estén canceladas (ver Subscription.cancel).
+    Elimina sus eventos de pago pendientes y registra cancelled_at.
+    """
+    count = _apply_transition(
+        subscriptions,
+        Subscription.CANCELLABLE_STATUSES,
+        {'churned_at': _churn_value(), 'status': 'cancelled', 'cancelled_at': timezone.now().date()},
+        delete_pending=True,
+        batch_size=batch_size
+    )
+    logger.info(f"Cancelación masiva: {count} suscripciones canceladas")
+    return count
+
+
+def bulk_renew(subscriptions, batch_size=500):
+    """
+    Renueva en bloque las suscripciones INACTIVE/CANCELLED/EXPIRED (ver Subscription.renew).
+    Fija start_date al día actual, limpia cancelled_at y genera el nuevo evento de pago.
+    """
+    count = _apply_transition(
+        subscriptions,
+        Subscription.RENEWABLE_STATUSES,
+        {'status': 'active', 'activated_at': timezone.now(), 'cancelled_at': None, **_period_date_values(date.today())},
+        create_first_event=True,
+        batch_size=batch_size
+    )
+    logger.info(f"Renovación masiva: {count} suscripciones renovadas")
+    return count
+
+
+def bulk_mark_paid(payments, batch_size=500):
+    """
+    Marca en bloque eventos de pago pendientes como pagados, con el mismo resultado que
+    PaymentEvent.mark_as_paid evento por evento: la suscripción empieza su nuevo período
+    en la fecha esperada del evento pagado y, si tiene auto_renewal y no le queda otro
+    evento pendiente, se genera el siguiente en el nuevo current_period_end.
+
+    payments es una lista de pares (id de evento, fecha de pago). Por lote se ejecuta un
+    número fijo de consultas: selección (con bloqueo) de los eventos aún pendientes, UPDATE
+    de los eventos, un UPDATE de las suscripciones (fecha de inicio y período resueltos con
+    Case por suscripción; si se pagan varios eventos de una misma suscripción manda el de
+    fecha esperada más reciente), UPDATE de next_payment_event y SELECT + INSERT del
+    siguiente evento de las suscripciones con auto_renewal que quedaron sin evento
+    pendiente. Los eventos que ya no están pendientes se ignoran. Cada lote termina
+    enviando payment_events_changed.
+
+    Retorna la lista de ids de eventos marcados como pagados.
+    """
+    paid_dates = dict(payments)
+    pending_ids = list(paid_dates)
+    marked = []
+
+    for offset in range(0, len(pending_ids), batch_size):
+        batch = pending_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            rows = list(
+                PaymentEvent.objects.select_for_update().filter(pk__in=batch, status='pending')
+                .order_by('pk').values_list('pk', 'subscription_id', 'expected_date', 'subscription__payment_type')
+            )
+            if not rows:
+                continue
+
+            now = timezone.now()
+            PaymentEvent.objects.filter(pk__in=[row[0] for row in rows]).update(
+                status='paid',
+                paid_date=Case(
+                    *[When(pk=row[0], then=Value(paid_dates[row[0]])) for row in rows],
+                    output_field=PaymentEvent._meta.get_field('paid_date')
+                ),
+                updated_at=now
+            )
+
+            # El nuevo período de cada suscripción empieza en la fecha esperada del evento pagado
+            start_dates = {}
+            payment_types = {}
+            for _, subscription_id, expected_date, payment_type in rows:
+                start_dates[subscription_id] = max(expected_date, start_dates.get(subscription_id, expected_date))
+                payment_types[subscription_id] = payment_type
+            periods = {
+                subscription_id: (start_date, *Subscription.compute_period_dates(start_date, payment_types[subscription_id]))
+                for subscription_id, start_date in start_dates.items()
+            }
+            Subscription.objects.filter(pk__in=list(periods)).update(
+                updated_at=now,
+                **{
+                    field: Case(
+                        *[When(pk=pk, then=Value(dates[index])) for pk, dates in periods.items()],
+                        output_field=Subscription._meta.get_field(field)
+                    )
+                    for index, field in enumerate(('start_date', 'current_period_end', 'grace_period_end'))
+                }
+            )
+
+            subscription_ids = list(start_dates)
+            sync_next_payment_events(subscription_ids)
+
+            # Siguiente evento del nuevo período (ver generate_next_payment_event_on_paid)
+            renewals = Subscription.objects.filter(
+                pk__in=subscription_ids, auto_renewal=True, next_payment_event__isnull=True
+            ).values_list('pk', 'current_period_end', 'price')
+            events = PaymentEvent.objects.bulk_create([
+                PaymentEvent(
+                    subscription_id=pk,
+                    expected_date=current_period_end,
+                    amount=price,
+                    status='pending',
+                    notes='Evento generado automáticamente tras pago anterior'
+                )
+                for pk, current_period_end, price in renewals
+            ])
+            if events:
+                sync_next_payment_events([event.subscription_id for event in events])
+
+            payment_events_changed.send(
+                sender=PaymentEvent, subscription_ids=subscription_ids, statuses=('paid', 'pending')
+            )
+            marked.extend(row[0] for row in rows)
+
+    if marked:
+        logger.info(f"Se marcaron {len(marked)} eventos de pago como pagados en bloque")
+    return marked
@@ -1,11 +1,73 @@
 # forgeapp/signals.py
 import logging
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from .models import Subscription, PaymentEvent
+import threading
+from contextlib import contextmanager
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from core import cache
+from .models import Subscription, PaymentEvent, Client, Application
 
 logger = logging.getLogger('forgeapp')
 
+# Enviado por forgeapp.services después de crear o eliminar eventos de pago en bloque
+# (bulk_create o DELETE por QuerySet), con subscription_ids de las suscripciones afectadas y,
+# opcionalmente, statuses con los estados de los eventos tocados (None si no se conocen).
+payment_events_changed = Signal()
+
+_bulk_state = threading.local()
+
+
+@contextmanager
+def bulk_operation():
+    """
+    Marca el bloque como operación masiva. Los receivers que actualizan datos derivados
+    fila por fila (post_save/post_delete) deben omitirse dentro del bloque, ya que al
+    terminar se envía payment_events_changed para recalcularlos por lote.
+    """
+    _bulk_state.depth = getattr(_bulk_state, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _bulk_state.depth -= 1
+
+
+def in_bulk_operation():
+    return getattr(_bulk_state, 'depth', 0) > 0
+
+
+@receiver(post_save, sender=PaymentEvent)
+def sync_next_payment_event(sender, instance, **kwargs):
+    """
+    Mantiene Subscription.next_payment_event al crear o modificar un evento de pago.
+    Se registra antes que generate_next_payment_event_on_paid para que este vea el
+    puntero ya actualizado.
+    """
+    from .services import sync_next_payment_events
+
+    sync_next_payment_events([instance.subscription_id])
+
+    # Reflejar el cambio en la instancia de suscripción en memoria, si ya estaba cargada
+    if PaymentEvent.subscription.is_cached(instance):
+        subscription = instance.subscription
+        subscription.next_payment_event_id = Subscription.objects.filter(
+            pk=subscription.pk
+        ).values_list('next_payment_event', flat=True).first()
+
+@receiver(post_delete, sender=PaymentEvent)
+def sync_next_payment_event_on_delete(sender, instance, **kwargs):
+    """
+    Al eliminar el evento al que apunta Subscription.next_payment_event, SET_NULL deja el
+    puntero vacío aunque la suscripción tenga otros eventos pendientes: se recalcula para
+    que billing_candidates no la tome como suscripción sin evento. Las operaciones masivas
+    recalculan los punteros al terminar.
+    """
+    if in_bulk_operation():
+        return
+
+    from .services import sync_next_payment_events
+
+    sync_next_payment_events([instance.subscription_id])
+
 @receiver(post_save, sender=Subscription)
 def generate_payment_event_on_activation(sender, instance, created, **kwargs):
     """
@@ -22,9 +84,13 @@ def generate_payment_event_on_activation(sender, instance, created, **kwargs):
     if instance.status != 'active':
         return
 
+    # Un save() parcial que no toca el estado no puede haber activado la suscripción
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'status' not in update_fields:
+        return
+
     # Verificar si ya existe un evento pendiente
-    has_pending = instance.payment_events.filter(status='pending').exists()
-    if has_pending:
+    if instance.next_payment_event_id:
         logger.debug(f"Suscripción {instance.reference_id} ya tiene evento pendiente, no se genera nuevo")
         return
 
@@ -65,8 +131,7 @@ def generate_next_payment_event_on_paid(sender, instance, created, **kwargs):
         return
 
     # Verificar que no exista ya un evento pendiente
-    has_pending = subscription.payment_events.filter(status='pending').exists()
-    if has_pending:
+    if subscription.next_payment_event_id:
         logger.debug(f"Suscripción {subscription.reference_id} ya tiene evento pendiente, no se genera siguiente")
         return
 
@@ -81,3 +146,25 @@ def generate_next_payment_event_on_paid(sender, instance, created, **kwargs):
     )
 
     logger.info(f"Siguiente evento de pago generado para suscripción {subscription.reference_id}: {next_event.id} con fecha {next_event.expected_date}")
+
+
+# Invalidación de la caché versionada (core/cache.py)
+@receiver([post_save, post_delete], sender=Subscription)
+def bump_subscriptions_cache(sender, **kwargs):
+    cache.bump(cache.SUBSCRIPTIONS)
+
+@receiver([post_save, post_delete], sender=PaymentEvent)
+def bump_payment_events_cache(sender, **kwargs):
+    cache.bump(cache.PAYMENT_EVENTS)
+
+@receiver(payment_events_changed)
+def bump_payment_events_cache_on_bulk_change(sender, **kwargs):
+    cache.bump(cache.PAYMENT_EVENTS, cache.SUBSCRIPTIONS)
+
+@receiver([post_save, post_delete], sender=Client)
+def bump_clients_cache(sender, **kwargs):
+    cache.bump(cache.CLIENTS)
+
+@receiver([post_save, post_delete], sender=Application)
+def bump_applications_cache(sender, **kwargs):
+    cache.bump(cache.APPLICATIONS)
@@ -0,0 +1,146 @@
+"""
+Estadísticas por fila para los listados de forgeapp.
+
+Cada estadística es una subconsulta correlacionada que se agrega como anotación al
+queryset del listado, de modo que una página completa se obtiene con una sola consulta
+y su costo crece con el tamaño de la página, no con el total de registros. Las
+subconsultas usan los índices por cliente/suscripción de Subscription y PaymentEvent.
+
+La tendencia de MRR por aplicación se lee de las fotografías diarias (RevenueSnapshot)
+con una sola consulta agrupada por aplicación y mes.
+"""
+from decimal import Decimal
+from django.db.models import (
+    Avg, BooleanField, Count, DateField, DecimalField, DurationField, ExpressionWrapper, F,
+    IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from finance.metrics import month_starts
+from finance.snapshots import monthly_price
+from .models import PaymentEvent, Subscription
+
+def _scalar(queryset, group, aggregate, output_field):
+    """Subconsulta con un único valor agregado de queryset, agrupado por group"""
+    return Subquery(
+        queryset.order_by().values(group).annotate(value=aggregate).values('value')[:1],
+        output_field=output_field
+    )
+
+def _count(queryset, group):
+    return Coalesce(_scalar(queryset, group, Count('pk'), IntegerField()), 0)
+
+def _amount(queryset, group, expression):
+    field = DecimalField(max_digits=12, decimal_places=2)
+    return Coalesce(_scalar(queryset, group, Sum(expression), field), Value(Decimal('0')), output_field=field)
+
+def client_stats(queryset):
+    """
+    Anota en cada cliente:
+
+    - total_subscriptions y active_subscriptions
+    - monthly_value: valor mensualizado de las suscripciones activas
+    - last_payment_date: fecha del último evento de pago pagado
+    - pending_amount: monto de los eventos de pago pendientes
+    """
+    subscriptions = Subscription.objects.filter(client=OuterRef('pk'))
+    events = PaymentEvent.objects.filter(subscription__client=OuterRef('pk'))
+
+    return queryset.annotate(
+        total_subscriptions=_count(subscriptions, 'client'),
+        active_subscriptions=_count(subscriptions.filter(status='active'), 'client'),
+        monthly_value=_amount(subscriptions.filter(status='active'), 'client', monthly_price()),
+        last_payment_date=_scalar(events.filter(status='paid'), 'subscription__client', Max('paid_date'), DateField()),
+        pending_amount=_amount(events.filter(status='pending'), 'subscription__client', 'amount'),
+    )
+
+def application_stats(queryset, today=None):
+    """
+    Anota en cada aplicación:
+
+    - total_subscriptions, active_subscriptions y churned_subscriptions (dadas de baja:
+      con fecha de baja y fuera de ACTIVE)
+    - mrr: valor mensualizado de las suscripciones activas
+    - avg_price: precio mensualizado promedio de las suscripciones activas
+    - pending_amount y overdue_amount: eventos de pago pendientes, en total y vencidos
+    """
+    today = today or timezone.localdate()
+    subscriptions = Subscription.objects.filter(application=OuterRef('pk'))
+    active = subscriptions.filter(status='active')
+    pending = PaymentEvent.objects.filter(subscription__application=OuterRef('pk'), status='pending')
+
+    return queryset.annotate(
+        total_subscriptions=_count(subscriptions, 'application'),
+        active_subscriptions=_count(active, 'application'),
+        churned_subscriptions=_count(
+            subscriptions.filter(churned_at__isnull=False).exclude(status='active'), 'application'
+        ),
+        mrr=_amount(active, 'application', monthly_price()),
+        avg_price=_scalar(
+            active, 'application', Avg(monthly_price()), DecimalField(max_digits=12, decimal_places=2)
+        ),
+        pending_amount=_amount(pending, 'subscription__application', 'amount'),
+        overdue_amount=_amount(pending.filter(expected_date__lt=today), 'subscription__application', 'amount'),
+    )
+
+def subscription_flags(queryset, today=None):
+    """
+    Anota en cada suscripción su situación respecto de la renovación, con las mismas reglas
+    que las propiedades de Subscription pero calculadas en la consulta:
+
+    - days_to_renewal: current_period_end - hoy, como timedelta (None si está en PENDING)
+    - in_grace: activa, con la renovación vencida y dentro del período de gracia
+    - is_expired_calc: activa y con el período de gracia vencido (Subscription.is_expired)
+    """
+    today = today or timezone.localdate()
+    return queryset.annotate(
+        days_to_renewal=ExpressionWrapper(
+            F('current_period_end') - Value(today, output_field=DateField()),
+            output_field=DurationField()
+        ),
+        in_grace=ExpressionWrapper(
+            Q(status='active', current_period_end__lt=today, grace_period_end__gte=today),
+            output_field=BooleanField()
+        ),
+        is_expired_calc=ExpressionWrapper(
+            Q(status='active', grace_period_end__lt=today),
+            output_field=BooleanField()
+        ),
+    )
+
+def application_trend(months=12, today=None):
+    """
+    Tendencia mensual por aplicación de los últimos `months` meses, desde las fotografías
+    diarias en una sola consulta agrupada. Por mes se toma el MRR promedio de las
+    fotografías del mes y la suma de altas y bajas.
+
+    Retorna {'months': [date, ...], 'applications': {application_id: {'mrr', 'new',
+    'churned'}}}, con una lista por métrica alineada con months (0 si no hay fotografías).
+    """
+    from finance.models import RevenueSnapshot
+
+    today = today or timezone.localdate()
+    starts = month_starts(today, months)
+    position = {start: i for i, start in enumerate(starts)}
+
+    rows = (
+        RevenueSnapshot.objects.filter(application__isnull=False, date__gte=starts[0], date__lte=today)
+        .annotate(month=TruncMonth('date'))
+        .values('application_id', 'month')
+        .annotate(mrr=Avg('mrr'), new=Sum('new_subscriptions'), churned=Sum('churned_subscriptions'))
+        .order_by()
+    )
+
+    applications = {}
+    for row in rows:
+        series = applications.setdefault(row['application_id'], {
+            'mrr': [Decimal('0')] * months,
+            'new': [0] * months,
+            'churned': [0] * months,
+        })
+        i = position[row['month']]
+        series['mrr'][i] = Decimal(row['mrr']).quantize(Decimal('0.01'))
+        series['new'][i] = row['new']
+        series['churned'][i] = row['churned']
+
+    return {'months': starts, 'applications': applications}
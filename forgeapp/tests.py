@@ -1,3 +1,537 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from finance.models import RevenueSnapshot
+from .models import Application, Client, PaymentEvent, ReferenceSequence, Subscription
+from .services import (
+    bulk_activate, bulk_cancel, bulk_deactivate, bulk_renew, expire_subscriptions, expired_subscriptions,
+    generate_payment_events, sync_next_payment_events
+)
+from .signals import bulk_operation
+from .stats import application_stats, application_trend, client_stats, subscription_flags
 
-# Create your tests here.
+
+def create_subscription(application, number, **fields):
+    """Suscripción de prueba con un cliente propio"""
+    client = Client.objects.create(first_name='Cliente', last_name=str(number), email=f'cliente{number}@example.com')
+    fields.setdefault('price', Decimal('10000'))
+    return Subscription.objects.create(client=client, application=application, **fields)
+
+
+class ExpireSubscriptionsTests(TestCase):
+    """expire_subscriptions marca EXPIRED solo las activas con el período de gracia vencido"""
+
+    def setUp(self):
+        self.today = date.today()
+        application = Application.objects.create(name='App', description='Prueba')
+        # Mensual: período de un mes más 15 días de gracia
+        self.overdue = [
+            create_subscription(application, i, status='active', start_date=self.today - timedelta(days=60))
+            for i in range(3)
+        ]
+        self.in_grace = create_subscription(application, 3, status='active', start_date=self.today - timedelta(days=35))
+        self.inactive = create_subscription(application, 4, status='inactive', start_date=self.today - timedelta(days=90))
+
+    def statuses(self):
+        return dict(Subscription.objects.values_list('pk', 'status'))
+
+    def test_dry_run_counts_without_changes(self):
+        before = self.statuses()
+
+        self.assertEqual(expire_subscriptions(self.today, dry_run=True), 3)
+        self.assertEqual(self.statuses(), before)
+
+    def test_expires_only_overdue_active_subscriptions_in_batches(self):
+        self.assertEqual(expire_subscriptions(self.today, batch_size=2), 3)
+
+        statuses = self.statuses()
+        for subscription in self.overdue:
+            self.assertEqual(statuses[subscription.pk], 'expired')
+        self.assertEqual(statuses[self.in_grace.pk], 'active')
+        self.assertEqual(statuses[self.inactive.pk], 'inactive')
+        self.assertFalse(
+            Subscription.objects.filter(status='expired', churned_at__isnull=True).exists()
+        )
+        self.assertFalse(expired_subscriptions(self.today).exists())
+
+    def test_matches_is_expired_property(self):
+        expected = {subscription.pk for subscription in Subscription.objects.all() if subscription.is_expired}
+
+        self.assertEqual(set(expired_subscriptions().values_list('pk', flat=True)), expected)
+
+
+class PeriodDatesTests(TestCase):
+    """current_period_end y grace_period_end se persisten desde start_date y payment_type"""
+
+    def setUp(self):
+        self.application = Application.objects.create(name='App', description='Prueba')
+
+    def test_dates_follow_payment_type(self):
+        monthly = create_subscription(self.application, 1, status='active', start_date=date(2026, 1, 31))
+        annual = create_subscription(
+            self.application, 2, status='active', start_date=date(2026, 1, 31), payment_type='annual'
+        )
+
+        self.assertEqual(
+            Subscription.objects.values_list('current_period_end', 'grace_period_end').get(pk=monthly.pk),
+            (date(2026, 2, 28), date(2026, 3, 15))
+        )
+        self.assertEqual(
+            Subscription.objects.values_list('current_period_end', 'grace_period_end').get(pk=annual.pk),
+            (date(2027, 1, 31), date(2027, 2, 15))
+        )
+
+    def test_pending_subscription_has_no_period(self):
+        subscription = create_subscription(self.application, 1)
+
+        self.assertIsNone(subscription.current_period_end)
+        self.assertIsNone(subscription.grace_period_end)
+
+    def test_partial_save_updates_period_columns(self):
+        subscription = create_subscription(self.application, 1, status='active', start_date=date(2026, 3, 1))
+
+        subscription.payment_type = 'annual'
+        subscription.save(update_fields=['payment_type'])
+
+        self.assertEqual(
+            Subscription.objects.values_list('current_period_end', flat=True).get(pk=subscription.pk),
+            date(2027, 3, 1)
+        )
+
+
+class GeneratePaymentEventsTests(TestCase):
+    """generate_payment_events crea en bloque el evento que le falta a cada suscripción"""
+
+    def setUp(self):
+        self.today = date.today()
+        application = Application.objects.create(name='App', description='Prueba')
+        self.unbilled = create_subscription(application, 1, status='active', start_date=self.today - timedelta(days=3))
+        self.renewing = create_subscription(application, 2, status='active', start_date=self.today - timedelta(days=31))
+        self.not_renewing = create_subscription(
+            application, 3, status='active', start_date=self.today - timedelta(days=31), auto_renewal=False
+        )
+        # Cambios hechos por UPDATE/DELETE en bloque, sin los signals que crean eventos
+        with bulk_operation():
+            PaymentEvent.objects.filter(subscription=self.unbilled).delete()
+        PaymentEvent.objects.filter(subscription__in=[self.renewing, self.not_renewing]).update(
+            status='paid', paid_date=self.today
+        )
+
+    def events(self, subscription, status='pending'):
+        return list(PaymentEvent.objects.filter(subscription=subscription, status=status).values_list(
+            'expected_date', flat=True
+        ))
+
+    def test_dry_run_counts_without_creating(self):
+        result = generate_payment_events(today=self.today, dry_run=True)
+
+        # El evento pagado de renewing sigue siendo su puntero hasta la ejecución real
+        self.assertEqual(result, {'created': 1, 'advance': 1, 'renewal': 0})
+        self.assertEqual(PaymentEvent.objects.filter(status='pending').count(), 0)
+
+    def test_creates_advance_and_renewal_events_once(self):
+        result = generate_payment_events(today=self.today)
+
+        self.assertEqual(result, {'created': 2, 'advance': 1, 'renewal': 1})
+        self.assertEqual(self.events(self.unbilled), [self.unbilled.start_date])
+        self.assertEqual(self.events(self.renewing), [self.renewing.current_period_end])
+        self.assertEqual(self.events(self.not_renewing), [])
+
+        self.renewing.refresh_from_db()
+        self.assertEqual(self.renewing.next_payment_event.expected_date, self.renewing.current_period_end)
+
+        # Idempotente: las suscripciones ya tienen evento pendiente
+        self.assertEqual(generate_payment_events(today=self.today)['created'], 0)
+
+    def test_horizon_limits_candidates(self):
+        later = create_subscription(
+            Application.objects.get(), 4, status='active', start_date=self.today + timedelta(days=10)
+        )
+        with bulk_operation():
+            PaymentEvent.objects.filter(subscription=later).delete()
+
+        self.assertEqual(self.events(later), [])
+        generate_payment_events(today=self.today)
+        self.assertEqual(self.events(later), [])
+
+        generate_payment_events(today=self.today, days_ahead=10)
+        self.assertEqual(self.events(later), [later.start_date])
+
+
+class BulkLifecycleTests(TestCase):
+    """Las transiciones masivas dejan el mismo estado que los métodos del modelo"""
+
+    FIELDS = ('status', 'start_date', 'current_period_end', 'grace_period_end', 'cancelled_at')
+
+    def setUp(self):
+        self.application = Application.objects.create(name='App', description='Prueba')
+        self.numbers = iter(range(1000))
+
+    def pair(self, **fields):
+        """Dos suscripciones iguales: una para el método del modelo y otra para la operación masiva"""
+        return [create_subscription(self.application, next(self.numbers), **fields) for _ in range(2)]
+
+    def state(self, subscription):
+        subscription.refresh_from_db()
+        pending = list(subscription.payment_events.filter(status='pending').values_list('expected_date', flat=True))
+        next_event = subscription.next_payment_event.expected_date if subscription.next_payment_event else None
+        return [getattr(subscription, field) for field in self.FIELDS] + [pending, next_event]
+
+    def assertSameTransition(self, method, bulk, **fields):
+        single, batch = self.pair(**fields)
+        getattr(Subscription.objects.get(pk=single.pk), method)()
+        bulk([batch.pk])
+        self.assertEqual(self.state(single), self.state(batch))
+
+    def test_transitions_match_model_methods(self):
+        start = date.today() - timedelta(days=10)
+        self.assertSameTransition('activate', bulk_activate)
+        self.assertSameTransition('deactivate', bulk_deactivate, status='active', start_date=start)
+        self.assertSameTransition('cancel', bulk_cancel, status='active', start_date=start)
+        self.assertSameTransition('renew', bulk_renew, status='inactive', start_date=start)
+        self.assertSameTransition('renew', bulk_renew, status='cancelled', start_date=start)
+
+    def test_invalid_source_statuses_are_ignored(self):
+        active = create_subscription(self.application, 1, status='active', start_date=date.today())
+        cancelled = create_subscription(self.application, 2, status='cancelled', start_date=date.today())
+
+        self.assertEqual(bulk_activate([active.pk]), 0)
+        self.assertEqual(bulk_renew(Subscription.objects.filter(pk=active.pk)), 0)
+        self.assertEqual(bulk_cancel([cancelled.pk]), 0)
+        self.assertEqual(Subscription.objects.get(pk=active.pk).status, 'active')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def activate(count):
+            ids = [create_subscription(self.application, next(self.numbers)).pk for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                bulk_activate(ids)
+            return len(queries)
+
+        self.assertEqual(activate(2), activate(8))
+
+
+class NextPaymentEventTests(TestCase):
+    """Subscription.next_payment_event apunta al evento pendiente más próximo"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.application = Application.objects.create(name='App', description='Prueba')
+        self.subscription = create_subscription(
+            self.application, 1, status='active', start_date=self.today
+        )
+
+    def pointer(self):
+        return Subscription.objects.values_list('next_payment_event', flat=True).get(pk=self.subscription.pk)
+
+    def pending(self):
+        return PaymentEvent.objects.filter(subscription=self.subscription, status='pending')
+
+    def test_pointer_follows_earliest_pending_event(self):
+        first = self.pending().get()
+        self.assertEqual(self.pointer(), first.pk)
+
+        earlier = PaymentEvent.objects.create(
+            subscription=self.subscription,
+            expected_date=self.today - timedelta(days=5),
+            amount=Decimal('10000'),
+            status='pending'
+        )
+        self.assertEqual(self.pointer(), earlier.pk)
+
+    def test_paying_moves_pointer_to_generated_event(self):
+        self.pending().get().mark_as_paid(self.today)
+
+        renewal = self.pending().get()
+        self.assertEqual(renewal.expected_date, Subscription.objects.get(pk=self.subscription.pk).current_period_end)
+        self.assertEqual(self.pointer(), renewal.pk)
+
+    def test_pointer_is_cleared_without_pending_events(self):
+        Subscription.objects.filter(pk=self.subscription.pk).update(auto_renewal=False)
+
+        PaymentEvent.objects.get(pk=self.pointer()).mark_as_paid(self.today)
+
+        self.assertIsNone(self.pointer())
+
+    def test_full_sync_repairs_pointers(self):
+        event = self.pending().get()
+        Subscription.objects.update(next_payment_event=None)
+
+        sync_next_payment_events()
+
+        self.assertEqual(self.pointer(), event.pk)
+
+    def test_deleting_pointed_event_moves_pointer_to_next_pending(self):
+        first = self.pending().get()
+        later = PaymentEvent.objects.create(
+            subscription=self.subscription,
+            expected_date=self.today + timedelta(days=40),
+            amount=Decimal('10000'),
+            status='pending'
+        )
+        self.assertEqual(self.pointer(), first.pk)
+
+        first.delete()
+
+        self.assertEqual(self.pointer(), later.pk)
+
+    def test_generate_payment_events_does_not_duplicate_after_delete(self):
+        PaymentEvent.objects.create(
+            subscription=self.subscription,
+            expected_date=self.today + timedelta(days=40),
+            amount=Decimal('10000'),
+            status='pending'
+        )
+        PaymentEvent.objects.get(pk=self.pointer()).delete()
+
+        result = generate_payment_events(today=self.today, days_ahead=60)
+
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(self.pending().count(), 1)
+
+    def test_generate_payment_events_resyncs_null_pointer_with_pending_events(self):
+        # Puntero vaciado por un cambio hecho con UPDATE en bloque
+        Subscription.objects.filter(pk=self.subscription.pk).update(next_payment_event=None)
+
+        result = generate_payment_events(today=self.today, days_ahead=60)
+
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(self.pointer(), self.pending().get().pk)
+
+
+class ReferenceIdTests(TestCase):
+    """IDs de referencia desde el contador por prefijo (ReferenceSequence)"""
+
+    def setUp(self):
+        self.application = Application.objects.create(name='App', description='Prueba')
+
+    def test_ids_are_consecutive_per_payment_type(self):
+        references = [
+            create_subscription(self.application, i, payment_type=payment_type).reference_id
+            for i, payment_type in enumerate(['monthly', 'annual', 'monthly'])
+        ]
+
+        self.assertEqual(references, ['ME000001', 'AN000001', 'ME000002'])
+
+    def test_block_reservation(self):
+        create_subscription(self.application, 1)
+
+        self.assertEqual(
+            Subscription.reserve_reference_ids('monthly', 3),
+            ['ME000002', 'ME000003', 'ME000004']
+        )
+        self.assertEqual(create_subscription(self.application, 2).reference_id, 'ME000005')
+
+    def test_first_reservation_continues_from_existing_ids(self):
+        subscription = create_subscription(self.application, 1, reference_id='AN000041')
+        self.assertEqual(subscription.reference_id, 'AN000041')
+        ReferenceSequence.objects.all().delete()
+
+        self.assertEqual(Subscription.generate_reference_id('annual'), 'AN000042')
+
+    def test_reserve_requires_positive_count(self):
+        with self.assertRaises(ValueError):
+            ReferenceSequence.reserve('ME', 0)
+
+
+class ClientStatsTests(TestCase):
+    """Estadísticas anotadas en el directorio de clientes (forgeapp.stats.client_stats)"""
+
+    def setUp(self):
+        application = Application.objects.create(name='App', description='Prueba')
+        self.ana = Client.objects.create(
+            first_name='Ana', last_name='Pérez', email='ana@example.com', rut='12345678-5', company='Forja Ltda'
+        )
+        self.luis = Client.objects.create(first_name='Luis', last_name='Soto', email='luis@example.com', status='inactive')
+        start = date.today() - timedelta(days=10)
+        monthly, annual, cancelled = [
+            Subscription.objects.create(
+                client=self.ana, application=application, price=Decimal(price),
+                payment_type=payment_type, status=status, start_date=start
+            )
+            for price, payment_type, status in [
+                ('10000', 'monthly', 'active'), ('12000', 'annual', 'active'), ('10000', 'monthly', 'cancelled')
+            ]
+        ]
+        PaymentEvent.objects.all().delete()
+        for subscription, day, status in [
+            (monthly, date(2026, 3, 1), 'paid'), (annual, date(2026, 5, 1), 'paid'), (cancelled, None, 'pending')
+        ]:
+            PaymentEvent.objects.create(
+                subscription=subscription, expected_date=day or date.today(), paid_date=day,
+                amount=Decimal('5000'), status=status
+            )
+
+    def test_annotations_in_one_query(self):
+        fields = ('total_subscriptions', 'active_subscriptions', 'monthly_value', 'last_payment_date', 'pending_amount')
+
+        with self.assertNumQueries(1):
+            stats = {client.pk: client for client in client_stats(Client.objects.all())}
+
+        self.assertEqual(
+            tuple(getattr(stats[self.ana.pk], field) for field in fields),
+            (3, 2, Decimal('11000'), date(2026, 5, 1), Decimal('5000'))
+        )
+        self.assertEqual(
+            tuple(getattr(stats[self.luis.pk], field) for field in fields),
+            (0, 0, Decimal('0'), None, Decimal('0'))
+        )
+
+    def test_search_and_filters(self):
+        self.client.force_login(User.objects.create_user('ops'))
+
+        def names(**params):
+            response = self.client.get(reverse('forgeapp:client_list'), params)
+            return [client.name for client in response.context['clients']]
+
+        self.assertEqual(names(q='12.345.678'), ['Ana Pérez'])
+        self.assertEqual(names(q='ana forja'), ['Ana Pérez'])
+        self.assertEqual(names(q='ana soto'), [])
+        self.assertEqual(names(status='inactive'), ['Luis Soto'])
+        self.assertEqual(names(), ['Luis Soto', 'Ana Pérez'])
+
+
+class ApplicationStatsTests(TestCase):
+    """Analítica por aplicación (forgeapp.stats.application_stats y application_trend)"""
+
+    def setUp(self):
+        self.today = date.today()
+        self.forge, self.empty = [
+            Application.objects.create(name=name, description='Prueba') for name in ('Forja', 'Vacía')
+        ]
+        subscriptions = [
+            create_subscription(
+                self.forge, i, price=Decimal(price), payment_type=payment_type, status='active',
+                start_date=self.today - timedelta(days=10)
+            )
+            for i, (price, payment_type) in enumerate([('10000', 'monthly'), ('12000', 'annual'), ('10000', 'monthly')])
+        ]
+        bulk_cancel([subscriptions[2].pk])
+        PaymentEvent.objects.all().delete()
+        for days, amount in [(-5, '5000'), (5, '3000')]:
+            PaymentEvent.objects.create(
+                subscription=subscriptions[0], expected_date=self.today + timedelta(days=days),
+                amount=Decimal(amount), status='pending'
+            )
+
+    def test_annotations(self):
+        fields = (
+            'total_subscriptions', 'active_subscriptions', 'churned_subscriptions', 'mrr', 'avg_price',
+            'pending_amount', 'overdue_amount'
+        )
+
+        with self.assertNumQueries(1):
+            stats = {application.pk: application for application in application_stats(Application.objects.all())}
+
+        self.assertEqual(
+            tuple(getattr(stats[self.forge.pk], field) for field in fields),
+            (3, 2, 1, Decimal('11000'), Decimal('5500'), Decimal('8000'), Decimal('5000'))
+        )
+        self.assertEqual(
+            tuple(getattr(stats[self.empty.pk], field) for field in fields),
+            (0, 0, 0, Decimal('0'), None, Decimal('0'), Decimal('0'))
+        )
+
+    def test_trend_groups_snapshots_by_month(self):
+        for day, application, mrr, new, churned in [
+            (date(2026, 3, 31), self.forge, '999', 9, 9),
+            (date(2026, 5, 10), self.forge, '10000', 1, 0),
+            (date(2026, 5, 20), self.forge, '11000', 1, 1),
+            (date(2026, 5, 20), None, '11000', 1, 1),
+            (date(2026, 6, 1), self.forge, '12000', 0, 0),
+            (date(2026, 6, 16), self.forge, '99999', 9, 9),
+        ]:
+            RevenueSnapshot.objects.create(
+                date=day, application=application, mrr=Decimal(mrr),
+                new_subscriptions=new, churned_subscriptions=churned
+            )
+
+        trend = application_trend(3, date(2026, 6, 15))
+
+        self.assertEqual(trend['months'], [date(2026, 4, 1), date(2026, 5, 1), date(2026, 6, 1)])
+        self.assertEqual(trend['applications'], {
+            self.forge.pk: {
+                'mrr': [Decimal('0'), Decimal('10500.00'), Decimal('12000.00')],
+                'new': [0, 2, 0],
+                'churned': [0, 1, 0],
+            },
+        })
+
+    def test_analytics_page(self):
+        self.client.force_login(User.objects.create_user('ops'))
+
+        response = self.client.get(reverse('forgeapp:application_analytics'), {'months': 6})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([application.name for application in response.context['applications']], ['Forja', 'Vacía'])
+        self.assertEqual(response.context['totals']['mrr'], Decimal('11000'))
+        self.assertEqual(len(response.context['chart']['months']), 6)
+
+
+class SubscriptionFlagsTests(TestCase):
+    """Marcas de renovación calculadas en la consulta y filtros de subscription_list"""
+
+    def setUp(self):
+        self.today = date.today()
+        application = Application.objects.create(name='App', description='Prueba')
+        self.expired, self.in_grace, self.upcoming, self.pending, self.marked_expired, self.annual = [
+            create_subscription(
+                application, i, status=status, payment_type=payment_type, price=Decimal(price),
+                start_date=self.today - timedelta(days=days) if days is not None else None
+            )
+            for i, (status, payment_type, price, days) in enumerate([
+                ('active', 'monthly', '10000', 60),
+                ('active', 'monthly', '10000', 35),
+                ('active', 'monthly', '5000', 10),
+                ('pending', 'monthly', '10000', None),
+                ('expired', 'monthly', '10000', 60),
+                ('active', 'annual', '120000', 10),
+            ])
+        ]
+
+    def test_flags_match_model_properties(self):
+        subscriptions = list(subscription_flags(Subscription.objects.all(), self.today))
+
+        for subscription in subscriptions:
+            days = subscription.days_to_renewal.days if subscription.days_to_renewal is not None else None
+            self.assertEqual(days, subscription.days_until_renewal)
+            self.assertEqual(subscription.is_expired_calc, subscription.is_expired)
+            self.assertEqual(
+                subscription.in_grace,
+                subscription.status == 'active'
+                and subscription.days_in_grace_period is not None
+                and not subscription.is_expired
+            )
+        self.assertEqual(
+            {subscription.pk for subscription in subscriptions if subscription.in_grace}, {self.in_grace.pk}
+        )
+        self.assertEqual(
+            {subscription.pk for subscription in subscriptions if subscription.is_expired_calc}, {self.expired.pk}
+        )
+
+    def listed(self, **params):
+        response = self.client.get(reverse('forgeapp:subscription_list'), params)
+        return [subscription.pk for subscription in response.context['subscriptions']]
+
+    def test_filters_and_sorting(self):
+        self.client.force_login(User.objects.create_user('ops'))
+
+        self.assertEqual(self.listed(grace=1), [self.in_grace.pk])
+        self.assertEqual(self.listed(renewal='30'), [self.upcoming.pk])
+        self.assertEqual(self.listed(status='active', payment_type='annual'), [self.annual.pk])
+        self.assertEqual(self.listed(client=self.expired.client_id), [self.expired.pk])
+        # EXPIRED primero, luego las más recientes
+        self.assertEqual(self.listed()[:2], [self.marked_expired.pk, self.annual.pk])
+        self.assertEqual(self.listed(sort='-price')[0], self.annual.pk)
+        self.assertEqual(self.listed(sort='price')[0], self.upcoming.pk)
+
+    def test_export_uses_the_same_filters(self):
+        self.client.force_login(User.objects.create_user('ops'))
+
+        response = self.client.get(reverse('forgeapp:subscription_list'), {'grace': 1, 'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], [self.in_grace.reference_id])
@@ -15,6 +15,7 @@ urlpatterns = [
     # Applications URLs
     path('applications/', views.application_list, name='application_list'),
     path('applications/create/', views.application_create, name='application_create'),
+    path('applications/analytics/', views.application_analytics, name='application_analytics'),
     path('applications/<int:pk>/', views.application_detail, name='application_detail'),
     path('applications/<int:pk>/update/', views.application_update, name='application_update'),
     path('applications/<int:pk>/delete/', views.application_delete, name='application_delete'),
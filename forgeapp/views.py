@@ -10,10 +10,14 @@ from django.http import JsonResponse
 import logging
 import os
 import calendar
+from core.cache import cached, CLIENTS, SUBSCRIPTIONS, APPLICATIONS, SNAPSHOTS
+from core.exports import choice_label, export_format, export_response
+from core.pagination import paginate
 from .models import (
     Subscription, Calculadora, ItemCalculo, Payment, PaymentEvent,
     Application, ApplicationConfig, Client, ServiceContractToken, ContactMessage, Appointment
 )
+from .stats import application_stats, application_trend, client_stats, subscription_flags
 from .forms import (
     SubscriptionForm, CalculadoraForm, ItemCalculoForm,
     ApplicationForm, ApplicationConfigForm, ClientForm
@@ -93,19 +97,19 @@ def contact_form(request):
 @login_required
 def dashboard(request):
     """Vista del panel de control"""
-    # Obtener estadísticas
-    total_clients = Client.objects.count()
-    active_subscriptions = Subscription.objects.filter(status='active').count()
-    total_applications = Application.objects.count()
+    # Obtener estadísticas (caché versionada, se invalida al cambiar clientes, suscripciones o aplicaciones)
+    counters = cached('forgeapp:dashboard_counters', [CLIENTS, SUBSCRIPTIONS, APPLICATIONS], lambda: {
+        'total_clients': Client.objects.count(),
+        'active_subscriptions': Subscription.objects.filter(status='active').count(),
+        'total_applications': Application.objects.count(),
+    })
     
     # Obtener datos recientes
     recent_clients = Client.objects.order_by('-created_at')[:5]
     recent_subscriptions = Subscription.objects.order_by('-created_at')[:5]
     
     return render(request, 'forgeapp/dashboard.html', {
-        'total_clients': total_clients,
-        'active_subscriptions': active_subscriptions,
-        'total_applications': total_applications,
+        **counters,
         'recent_clients': recent_clients,
         'recent_subscriptions': recent_subscriptions
     })
@@ -113,33 +117,75 @@ def dashboard(request):
 # Application views
 @login_required
 def application_list(request):
-    """Lista de aplicaciones"""
-    applications = Application.objects.all()
-    
-    # Añadir estadísticas a cada aplicación
-    for app in applications:
-        app.total_subscriptions = Subscription.objects.filter(application=app).count()
-        app.active_subscriptions = Subscription.objects.filter(application=app, status='active').count()
-        app.total_revenue = Subscription.objects.filter(application=app, status='active', payment_type='monthly').aggregate(models.Sum('price'))['price__sum'] or 0
-    
+    """Lista de aplicaciones con sus estadísticas anotadas (forgeapp.stats.application_stats)"""
+    applications = application_stats(Application.objects.select_related('owner'))
+
     return render(request, 'forgeapp/application_list.html', {'applications': applications})
 
 @login_required
 def application_detail(request, pk):
-    """Detalle de una aplicación"""
-    application = get_object_or_404(Application, pk=pk)
-    
-    # Obtener estadísticas
-    application.total_subscriptions = Subscription.objects.filter(application=application).count()
-    application.active_subscriptions = Subscription.objects.filter(application=application, status='active').count()
-    application.total_revenue = Subscription.objects.filter(application=application, status='active', payment_type='monthly').aggregate(models.Sum('price'))['price__sum'] or 0
-    
-    # Obtener suscripciones
-    subscriptions = Subscription.objects.filter(application=application).order_by('-created_at')
-    
+    """Detalle de una aplicación con sus suscripciones paginadas por cursor"""
+    application = get_object_or_404(application_stats(Application.objects.select_related('owner')), pk=pk)
+
+    subscriptions = Subscription.objects.filter(application=application).select_related('client')
+    page = paginate(request, subscriptions, ['-created_at', '-pk'])
+
     return render(request, 'forgeapp/application_detail.html', {
         'application': application,
-        'subscriptions': subscriptions
+        'subscriptions': page.items,
+        'page': page,
+    })
+
+ANALYTICS_MONTH_OPTIONS = [6, 12, 24]
+
+@login_required
+def application_analytics(request):
+    """
+    Analítica del portafolio de aplicaciones: MRR, suscripciones activas y dadas de baja,
+    precio promedio y cuentas por cobrar de cada aplicación (una consulta anotada), más la
+    tendencia mensual de MRR, altas y bajas desde las fotografías diarias (una consulta
+    agrupada, cacheada). Parámetro: ?months= (12 por defecto).
+    """
+    try:
+        months = int(request.GET.get('months', 12))
+    except ValueError:
+        months = 12
+    if months not in ANALYTICS_MONTH_OPTIONS:
+        months = 12
+
+    today = timezone.localdate()
+    applications = list(application_stats(Application.objects.all(), today).order_by('-mrr', 'name'))
+    trend = cached(
+        'forgeapp:application_trend', [SNAPSHOTS],
+        lambda: application_trend(months, today),
+        months, today
+    )
+
+    totals = {
+        field: sum(getattr(application, field) for application in applications)
+        for field in ('mrr', 'active_subscriptions', 'churned_subscriptions', 'pending_amount', 'overdue_amount')
+    }
+
+    empty = {'mrr': [0] * months, 'new': [0] * months, 'churned': [0] * months}
+    chart = {
+        'months': [month.strftime('%Y-%m') for month in trend['months']],
+        'applications': [],
+    }
+    for application in applications:
+        series = trend['applications'].get(application.pk, empty)
+        application.trend_new = sum(series['new'])
+        application.trend_churned = sum(series['churned'])
+        chart['applications'].append({
+            'name': application.name,
+            'mrr': [float(value) for value in series['mrr']],
+        })
+
+    return render(request, 'forgeapp/application_analytics.html', {
+        'applications': applications,
+        'totals': totals,
+        'chart': chart,
+        'months': months,
+        'month_options': ANALYTICS_MONTH_OPTIONS,
     })
 
 @login_required
@@ -245,33 +291,90 @@ def application_config_delete(request, config_pk):
     })
 
 # Client views
+CLIENT_EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('RUT', 'rut'),
+    ('Nombre', 'name'),
+    ('Correo', 'email'),
+    ('Teléfono', 'phone'),
+    ('Empresa', 'company'),
+    ('RUT Empresa', 'company_rut'),
+    ('Cargo', 'position'),
+    ('Estado', 'status', choice_label(Client.STATUS_CHOICES)),
+    ('Contrato', 'contract_status', choice_label(Client.CONTRACT_STATUS_CHOICES)),
+    ('Acepta Marketing', 'accept_marketing'),
+    ('Suscripciones', 'total_subscriptions'),
+    ('Suscripciones Activas', 'active_subscriptions'),
+    ('Valor Mensual', 'monthly_value'),
+    ('Último Pago', 'last_payment_date'),
+    ('Monto Pendiente', 'pending_amount'),
+    ('Fecha de Registro', 'created_at'),
+]
+
+def _filter_clients(params):
+    """
+    Clientes filtrados por búsqueda, estado y nacionalidad (lista y exportación).
+
+    La búsqueda (?q=) se separa en palabras y cada palabra debe aparecer en el nombre, RUT,
+    correo o empresa; en los RUT se ignoran los puntos (12.345.678-9 encuentra 12345678-9).
+    """
+    clients = Client.objects.all()
+
+    for term in params.get('q', '').split()[:5]:
+        rut = term.replace('.', '')
+        clients = clients.filter(
+            models.Q(name__icontains=term) | models.Q(email__icontains=term) |
+            models.Q(company__icontains=term) | models.Q(rut__icontains=rut) |
+            models.Q(company_rut__icontains=rut)
+        )
+
+    if params.get('status'):
+        clients = clients.filter(status=params['status'])
+
+    if params.get('nationality'):
+        clients = clients.filter(nationality=params['nationality'])
+
+    return clients
+
 @login_required
 def client_list(request):
-    """Lista de clientes"""
-    clients = Client.objects.all()
-    
-    # Añadir estadísticas a cada cliente
-    for client in clients:
-        client.total_subscriptions = Subscription.objects.filter(client=client).count()
-        client.active_subscriptions = Subscription.objects.filter(client=client, status='active').count()
-    
-    return render(request, 'forgeapp/client_list.html', {'clients': clients})
+    """
+    Directorio de clientes con búsqueda y filtros, paginado por cursor. Las estadísticas de
+    cada cliente se anotan en la misma consulta de la página (forgeapp.stats.client_stats).
+    Con ?format=csv|xlsx exporta el listado filtrado.
+    """
+    clients = _filter_clients(request.GET)
+
+    file_format = export_format(request)
+    if file_format:
+        return export_response(
+            client_stats(clients).order_by('name', 'pk'), CLIENT_EXPORT_COLUMNS, 'clientes', file_format
+        )
+
+    page = paginate(request, client_stats(clients), ['-created_at', '-pk'])
+
+    filtered = any(request.GET.get(key) for key in ('q', 'status', 'nationality'))
+    if filtered:
+        client_count = clients.count()
+    else:
+        client_count = cached('forgeapp:client_count', [CLIENTS], Client.objects.count)
+
+    return render(request, 'forgeapp/client_list.html', {
+        'clients': page.items,
+        'page': page,
+        'client_count': client_count,
+        'filtered': filtered,
+        'status_choices': Client.STATUS_CHOICES,
+        'nationality_choices': Client.NATIONALITY_CHOICES,
+    })
 
 @login_required
 def client_detail(request, pk):
     """Detalle de un cliente"""
-    client = get_object_or_404(Client, pk=pk)
+    client = get_object_or_404(client_stats(Client.objects.all()), pk=pk)
 
-    # Obtener suscripciones
-    subscriptions = Subscription.objects.filter(client=client).order_by('-created_at')
+    subscriptions = Subscription.objects.filter(client=client).select_related('application', 'client').order_by('-created_at')
 
-    # Calcular estadísticas
-    client.total_subscriptions = subscriptions.count()
-    client.active_subscriptions = subscriptions.filter(status='active').count()
-
-    # Calcular valor total mensual
-    client.total_value = subscriptions.filter(status='active', payment_type='monthly').aggregate(models.Sum('price'))['price__sum'] or 0
-    
     return render(request, 'forgeapp/client_detail.html', {
         'client': client,
         'subscriptions': subscriptions
@@ -325,11 +428,15 @@ def client_payment_history(request, pk):
     
     # Ajustado para usar finance_payments en lugar de payments
     from finance.models import Payment as FinancePayment
-    payments = FinancePayment.objects.filter(subscription__client=client).order_by('-payment_date')
-    
+    payments = FinancePayment.objects.filter(subscription__client=client).select_related(
+        'subscription__application', 'payment_method'
+    )
+    page = paginate(request, payments, ['-payment_date', '-pk'])
+
     return render(request, 'forgeapp/client_payment_history.html', {
         'client': client,
-        'payments': payments
+        'payments': page.items,
+        'page': page
     })
 
 @login_required
@@ -916,31 +1023,155 @@ def accept_service_contract(request, token):
     return redirect('forgeapp:view_service_contract', token=token)
 
 # Subscription views
+SUBSCRIPTION_EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Referencia', 'reference_id'),
+    ('Cliente', 'client__name'),
+    ('RUT', 'client__rut'),
+    ('Aplicación', 'application__name'),
+    ('Estado', 'status', choice_label(Subscription.STATUS_CHOICES)),
+    ('Tipo de Pago', 'payment_type', choice_label(Subscription.PAYMENT_TYPE_CHOICES)),
+    ('Precio', 'price'),
+    ('Fecha de Inicio', 'start_date'),
+    ('Próxima Renovación', 'current_period_end'),
+    ('Próximo Pago', 'next_payment_event__expected_date'),
+    ('Autorenovación', 'auto_renewal'),
+    ('Fecha de Cancelación', 'cancelled_at'),
+]
+
+# Ventanas de renovación del filtro ?renewal= (días desde hoy, o el mes calendario siguiente)
+RENEWAL_WINDOWS = [
+    ('7', 'Próximos 7 días'),
+    ('30', 'Próximos 30 días'),
+    ('90', 'Próximos 90 días'),
+    ('next_month', 'Próximo mes'),
+]
+
+# Columnas ordenables (?sort=, con '-' para orden descendente): campos del cursor de paginación
+SUBSCRIPTION_SORTS = {
+    'reference': ['reference_id', 'pk'],
+    'client': ['client__name', 'pk'],
+    'price': ['price', 'pk'],
+    'renewal': ['current_period_end', 'pk'],
+    'created': ['created_at', 'pk'],
+}
+
+SUBSCRIPTION_FILTERS = ('status', 'payment_type', 'application', 'client', 'renewal', 'grace')
+
+def renewal_range(window, today):
+    """(desde, hasta) de una ventana de RENEWAL_WINDOWS, ambos incluidos, o None si no es válida"""
+    if window == 'next_month':
+        start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return start, start.replace(day=calendar.monthrange(start.year, start.month)[1])
+    if window in dict(RENEWAL_WINDOWS):
+        return today, today + timedelta(days=int(window))
+    return None
+
+def _filter_subscriptions(params, today):
+    """
+    Suscripciones filtradas por estado, tipo de pago, aplicación, cliente, ventana de
+    renovación y período de gracia (lista y exportación). Cada filtro usa un índice:
+    (status, payment_type, created_at), (payment_type, current_period_end), las claves
+    foráneas y current_period_end / grace_period_end.
+    """
+    subscriptions = Subscription.objects.all()
+
+    if params.get('status'):
+        subscriptions = subscriptions.filter(status=params['status'])
+
+    if params.get('payment_type'):
+        subscriptions = subscriptions.filter(payment_type=params['payment_type'])
+
+    if params.get('application', '').isdigit():
+        subscriptions = subscriptions.filter(application_id=params['application'])
+
+    if params.get('client', '').isdigit():
+        subscriptions = subscriptions.filter(client_id=params['client'])
+
+    window = renewal_range(params.get('renewal'), today)
+    if window:
+        subscriptions = subscriptions.filter(current_period_end__range=window)
+
+    if params.get('grace'):
+        subscriptions = subscriptions.filter(
+            status='active', current_period_end__lt=today, grace_period_end__gte=today
+        )
+
+    return subscriptions
+
+def _sort_links(request, sort):
+    """URL de cada columna ordenable: ascendente, o descendente si ya está ordenada ascendente"""
+    links = {}
+    for key in SUBSCRIPTION_SORTS:
+        query = request.GET.copy()
+        for param in ('after', 'before', 'format'):
+            query.pop(param, None)
+        query['sort'] = f'-{key}' if sort == key else key
+        links[key] = f'?{query.urlencode()}'
+    return links
+
 @login_required
 def subscription_list(request):
-    """Lista de suscripciones ordenadas con EXPIRED primero"""
-    from datetime import date
-    from django.db.models import Case, When, Value, IntegerField
+    """
+    Lista de suscripciones con filtros y columnas ordenables, paginada por cursor. Por
+    defecto se ordena con EXPIRED primero. Los días a la renovación y las marcas de período
+    de gracia y vencimiento se calculan en la consulta (forgeapp.stats.subscription_flags).
+    Con ?format=csv|xlsx exporta el listado filtrado con el mismo orden.
+    """
+    from django.db.models import Case, IntegerField, Value, When
 
-    today = date.today()
+    today = timezone.localdate()
+    subscriptions = matching = _filter_subscriptions(request.GET, today)
 
-    # Ordenar con EXPIRED primero usando anotación
-    # EXPIRED tiene prioridad 0, los demás tienen prioridad 1
-    subscriptions = Subscription.objects.all().select_related('client', 'application').annotate(
-        order_priority=Case(
-            When(status='expired', then=Value(0)),
-            default=Value(1),
-            output_field=IntegerField(),
+    sort = request.GET.get('sort', '')
+    if sort.lstrip('-') in SUBSCRIPTION_SORTS:
+        ordering = [f'-{field}' if sort.startswith('-') else field for field in SUBSCRIPTION_SORTS[sort.lstrip('-')]]
+    else:
+        # EXPIRED tiene prioridad 0, los demás tienen prioridad 1
+        sort = ''
+        subscriptions = subscriptions.annotate(
+            order_priority=Case(
+                When(status='expired', then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
         )
-    ).order_by('order_priority', '-created_at')
+        ordering = ['order_priority', '-created_at', '-pk']
+
+    file_format = export_format(request)
+    if file_format:
+        return export_response(
+            subscriptions.order_by(*ordering), SUBSCRIPTION_EXPORT_COLUMNS, 'suscripciones', file_format
+        )
+
+    subscriptions = subscription_flags(
+        subscriptions.select_related('client', 'application', 'next_payment_event'), today
+    )
+    page = paginate(request, subscriptions, ordering)
+
+    filtered = any(request.GET.get(key) for key in SUBSCRIPTION_FILTERS)
+    if filtered:
+        subscription_count = matching.count()
+    else:
+        subscription_count = cached('forgeapp:subscription_count', [SUBSCRIPTIONS], Subscription.objects.count)
 
-    # Agregar flag is_expired calculado dinámicamente para cada suscripción
-    for subscription in subscriptions:
-        subscription.is_expired_calc = subscription.is_expired
+    client = None
+    if request.GET.get('client', '').isdigit():
+        client = Client.objects.filter(pk=request.GET['client']).only('pk', 'name').first()
 
     return render(request, 'forgeapp/subscription_list.html', {
-        'subscriptions': subscriptions,
-        'today': today
+        'subscriptions': page.items,
+        'page': page,
+        'subscription_count': subscription_count,
+        'filtered': filtered,
+        'today': today,
+        'sort': sort,
+        'sort_links': _sort_links(request, sort),
+        'filter_client': client,
+        'applications': Application.objects.order_by('name').values_list('pk', 'name'),
+        'status_choices': Subscription.STATUS_CHOICES,
+        'payment_type_choices': Subscription.PAYMENT_TYPE_CHOICES,
+        'renewal_windows': RENEWAL_WINDOWS,
     })
 
 @login_required
@@ -1136,8 +1367,8 @@ def mark_payment_event_paid(request, subscription_pk, event_pk):
 # Calculadora views
 @login_required
 def calculadora_list(request):
-    calculadoras = Calculadora.objects.all()
-    return render(request, 'forgeapp/calculadora_list.html', {'calculadoras': calculadoras})
+    page = paginate(request, Calculadora.objects.all(), ['-created_at', '-pk'])
+    return render(request, 'forgeapp/calculadora_list.html', {'calculadoras': page.items, 'page': page})
 
 @login_required
 def calculadora_detail(request, pk):
@@ -1564,8 +1795,11 @@ def message_list(request):
     read_count = ContactMessage.objects.filter(status='read').count()
     archived_count = ContactMessage.objects.filter(status='archived').count()
 
+    page = paginate(request, contact_messages, ['-created_at', '-pk'])
+
     return render(request, 'forgeapp/message_list.html', {
-        'messages_list': contact_messages,
+        'messages_list': page.items,
+        'page': page,
         'status_filter': status_filter,
         'new_count': new_count,
         'read_count': read_count,